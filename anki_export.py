@@ -0,0 +1,156 @@
+"""
+anki_export.py
+--------------
+Fast deck export shared by ``flashcard_gen`` and ``prompt_cards``.
+
+* Note models are built once per process (``basic_model`` / ``qa_model``),
+  not once per deck.
+* Notes go into the package's collection with ``executemany`` in blocks
+  of ``NOTE_BATCH`` instead of one ``genanki.Note`` object and two INSERTs
+  each, so memory stays flat however many cards there are.
+* The ``.apkg`` zip is written to any path or binary file object —
+  ``apkg_bytes`` returns it in memory for the service, no temp deck file.
+* ``write_deck_files`` writes ``.cards.json``, ``.cards.txt`` and ``.apkg``
+  in a single pass over the cards.
+
+Typical usage
+-------------
+>>> data = apkg_bytes(notes_for(cards), "Hearsay", deck_id=1234, model=qa_model())
+>>> paths = write_deck_files(cards, "deposition", deck_id=1234)
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import functools, io, itertools, json, os, pathlib, sqlite3, tempfile, time, zipfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+NOTE_BATCH = 5000             # notes per executemany block
+
+Note = Tuple[Optional[str], List[str]]      # (guid or None, field values)
+
+# ── 2. Models (built once) ─────────────────────────────────────────────────
+
+@functools.lru_cache(maxsize=None)
+def basic_model():
+    """Front/Back model of the document decks (``flashcard_gen``)."""
+    import genanki
+    return genanki.Model(
+        1537156452, "Basic",
+        fields=[{"name": "Front"}, {"name": "Back"}],
+        templates=[{"name": "Card",
+                    "qfmt": "{{Front}}",
+                    "afmt": "{{Back}}<hr id=answer>"}],
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def qa_model():
+    """Question/Answer model of the topic decks (``prompt_cards``)."""
+    import genanki
+    return genanki.Model(
+        1537156451, "Flashcard Model",
+        fields=[{"name": "Question"}, {"name": "Answer"}],
+        templates=[{"name": "Card 1",
+                    "qfmt": "{{Question}}",
+                    "afmt": '{{FrontSide}}<hr id="answer">{{Answer}}'}],
+    )
+
+# ── 3. Package writer ──────────────────────────────────────────────────────
+
+def write_apkg(notes: Iterable[Note], deck_name: str, deck_id: int, model, out) -> int:
+    """Write an ``.apkg`` with one card per note to ``out`` (path or binary
+    file object); return the note count.  ``notes`` is consumed lazily."""
+    import genanki
+    from genanki.apkg_col import APKG_COL
+    from genanki.apkg_schema import APKG_SCHEMA
+
+    fd, db_path = tempfile.mkstemp(suffix=".anki2")
+    os.close(fd)
+    try:
+        db = sqlite3.connect(db_path)
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        cur = db.cursor()
+        now = time.time()
+        ids = itertools.count(int(now * 1000))
+        cur.executescript(APKG_SCHEMA)
+        cur.executescript(APKG_COL)
+        deck = genanki.Deck(deck_id, deck_name)
+        deck.add_model(model)
+        deck.write_to_db(cur, now, ids)         # deck + model JSON, no notes yet
+
+        n, mod = 0, int(now)
+        it = iter(notes)
+        while True:
+            block = list(itertools.islice(it, NOTE_BATCH))
+            if not block:
+                break
+            note_rows, card_rows = [], []
+            for guid, fields in block:
+                nid = next(ids)
+                note_rows.append((nid, guid or genanki.guid_for(*fields), model.model_id, mod,
+                                  -1, "  ", "\x1f".join(fields), fields[0], 0, 0, ""))
+                card_rows.append((next(ids), nid, deck_id, 0, mod, -1,
+                                  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, ""))
+            cur.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", note_rows)
+            cur.executemany("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                            card_rows)
+            n += len(block)
+        db.commit()
+        db.close()
+
+        with zipfile.ZipFile(out, "w") as z:
+            z.write(db_path, "collection.anki2")
+            z.writestr("media", "{}")
+        return n
+    finally:
+        os.unlink(db_path)
+
+
+def apkg_bytes(notes: Iterable[Note], deck_name: str, deck_id: int, model) -> bytes:
+    """The ``.apkg`` as bytes (no output file)."""
+    buf = io.BytesIO()
+    write_apkg(notes, deck_name, deck_id, model, buf)
+    return buf.getvalue()
+
+# ── 4. Document decks: JSON + TXT + APKG in one pass ───────────────────────
+
+def _mc_ready(card: dict) -> bool:
+    # skip malformed card if GPT failed to supply two distractors
+    return len(card.get("distractors", [])) >= 2
+
+
+def write_deck_files(cards: Iterable[dict], deck_name: str, deck_id: int,
+                     out_dir=None) -> Tuple[pathlib.Path, pathlib.Path, pathlib.Path]:
+    """Write ``<deck>.cards.json``, ``.cards.txt`` and ``.apkg`` while
+    iterating ``cards`` once; return the three paths."""
+    import genanki
+    base = pathlib.Path(out_dir or ".") / deck_name.replace(" ", "_")
+    json_path = base.with_name(base.name + ".cards.json")
+    txt_path = base.with_name(base.name + ".cards.txt")
+    apkg_path = base.with_name(base.name + ".apkg")
+
+    with open(json_path, "w", encoding="utf-8") as fj, \
+         open(txt_path, "w", encoding="utf-8") as ft:
+
+        def notes() -> Iterator[Note]:
+            first = True
+            for c in cards:
+                # same layout as json.dumps(cards, indent=2), one card at a time
+                body = json.dumps(c, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                fj.write(("[\n  " if first else ",\n  ") + body)
+                ft.write(("" if first else "\n") +
+                         "Q: " + c["front"] + "\n" +
+                         "A: " + c["back"] + "\n" +
+                         "CTX: " + c.get("context", "") + "\n" +
+                         "EXCERPT: " + c.get("excerpt", "")[:200] + "\n" +
+                         "-" * 40)
+                first = False
+                if _mc_ready(c):
+                    # a stable guid lets Anki update the note in place on re-import
+                    yield (genanki.guid_for(c["id"]) if "id" in c else None,
+                           [c["front"], c["back"]])
+            fj.write("[]" if first else "\n]")
+
+        write_apkg(notes(), deck_name[:90], deck_id, basic_model(), apkg_path)
+    return json_path, txt_path, apkg_path
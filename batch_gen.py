@@ -0,0 +1,168 @@
+"""
+batch_gen.py
+------------
+Offline card generation through the OpenAI Batch API (half price, separate
+rate-limit pool, results within 24 h).  All ``_cards_from_chunk`` requests go
+into one JSONL input file, which is uploaded and submitted as a single batch;
+the result file is then streamed back line by line.
+
+The job id and status are persisted to a small JSON state file (the pipeline
+keeps it next to ``<doc>.chunks.sqlite``), so a killed process simply picks up
+polling the same batch on the next run instead of submitting a new one.
+
+Typical usage
+-------------
+>>> for i, cards in iter_batch_cards(chunks, 3, "deposition.batch.json"):
+...     print(i, len(cards))
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import json, pathlib, time
+from typing import Iterator, List, Optional, Tuple
+
+from cache import DiskCache, make_key
+from chunker import chunk_hash
+import flashcard_gen as fg
+import metrics
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+# ── 2. State file helpers ──────────────────────────────────────────────────
+
+def _load_state(path: pathlib.Path, fingerprint: str) -> dict:
+    if path.exists():
+        state = json.loads(path.read_text(encoding="utf-8"))
+        if state.get("fingerprint") == fingerprint:
+            return state
+        metrics.say(f"[batch_gen] {path.name} belongs to a different chunk set — starting a new batch")
+    return {"fingerprint": fingerprint}
+
+
+def _save_state(path: pathlib.Path, state: dict) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    tmp.replace(path)                                  # atomic on POSIX + Windows
+
+# ── 3. Submit / poll / collect ─────────────────────────────────────────────
+
+def _submit(chunks: List[str], max_cards: int, state_path: pathlib.Path, state: dict) -> None:
+    """Write the batch-input JSONL, upload it and create the batch job."""
+    input_path = state_path.with_suffix(".input.jsonl")
+    with open(input_path, "w", encoding="utf-8") as fh:
+        for i, ch in enumerate(chunks):
+            fh.write(json.dumps({"custom_id": f"chunk-{i}", "method": "POST",
+                                 "url": ENDPOINT, "body": fg._chat_request(ch, max_cards)},
+                                ensure_ascii=False) + "\n")
+
+    with open(input_path, "rb") as fh:
+        uploaded = fg.get_client().files.create(file=fh, purpose="batch")
+    batch = fg.get_client().batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT,
+                                     completion_window="24h")
+    state.update(input_file_id=uploaded.id, batch_id=batch.id, status=batch.status,
+                 submitted_at=time.time(), requests=len(chunks))
+    _save_state(state_path, state)
+    metrics.say(f"[batch_gen] Submitted {len(chunks)} request(s) as batch {batch.id}")
+
+
+def _poll(state_path: pathlib.Path, state: dict, poll_interval: float):
+    """Block until the batch reaches a terminal status; return the Batch object."""
+    while True:
+        batch = fg.get_client().batches.retrieve(state["batch_id"])
+        counts = batch.request_counts
+        if batch.status != state.get("status"):
+            metrics.say(f"[batch_gen] Batch {batch.id}: {batch.status}"
+                        + (f" ({counts.completed}/{counts.total} done)" if counts else ""))
+        state.update(status=batch.status, output_file_id=batch.output_file_id,
+                     error_file_id=batch.error_file_id)
+        _save_state(state_path, state)
+        if batch.status in TERMINAL:
+            return batch
+        time.sleep(poll_interval)
+
+
+def _iter_results(file_id: str) -> Iterator[dict]:
+    """Stream a result/error JSONL file without loading it whole."""
+    with fg.get_client().files.with_streaming_response.content(file_id) as resp:
+        for line in resp.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_batch_cards(chunks: List[str], max_cards: int, state_path, *,
+                     cache: Optional[DiskCache] = None,
+                     refresh: bool = False,
+                     poll_interval: float = 30.0,
+                     report: Optional[dict] = None) -> Iterator[Tuple[int, List[dict]]]:
+    """Yield ``(chunk_index, cards)`` like ``flashcard_gen.iter_chunk_cards``.
+
+    Cached chunks are yielded straight away; the rest go out as one batch.
+    Chunks the batch could not answer are *not* yielded, and the next run
+    submits them in a new batch instead of re-reading this one (a journaled
+    build retries only those on ``--resume``).  ``refresh`` never reuses
+    the output of a finished batch.
+    """
+    state_path = pathlib.Path(state_path)
+    pending: List[int] = []
+    for i, ch in enumerate(chunks):
+        cached = None if cache is None or refresh else cache.get(fg._cache_key(ch, max_cards))
+        if cached is not None:
+            metrics.count("card_cache_hits")
+            yield i, cached
+        else:
+            pending.append(i)
+    if not pending:
+        return
+
+    fingerprint = make_key([chunk_hash(chunks[i]) for i in pending],
+                           fg.MODEL, fg.SYSTEM_PROMPT, max_cards, fg.MAX_TOKENS)
+    state = _load_state(state_path, fingerprint)
+    if refresh and state.get("status") in TERMINAL:
+        state = {"fingerprint": fingerprint}           # --refresh never re-reads old output
+    if state.get("batch_id"):
+        metrics.say(f"[batch_gen] Resuming batch {state['batch_id']} ({state.get('status')})")
+    else:
+        _submit([chunks[i] for i in pending], max_cards, state_path, state)
+
+    batch = _poll(state_path, state, poll_interval)
+    if batch.status == "failed" or not batch.output_file_id:
+        errors = getattr(batch, "errors", None)
+        state.pop("batch_id", None)                    # next run submits afresh
+        _save_state(state_path, state)
+        raise RuntimeError(f"Batch {batch.id} ended as {batch.status!r}: {errors}")
+
+    answered, usable = set(), 0
+    for rec in _iter_results(batch.output_file_id):
+        j = int(rec["custom_id"].split("-", 1)[1])
+        i = pending[j]
+        answered.add(j)
+        response = rec.get("response") or {}
+        if response.get("status_code") != 200:
+            metrics.say(f"[batch_gen] ⚠️  chunk #{i + 1} failed: {rec.get('error') or response}")
+            continue                                   # not journaled → retried on --resume
+        body = response["body"]
+        metrics.api_call("batch", body.get("model", fg.MODEL), None, body.get("usage"),
+                         ref=chunk_hash(chunks[i])[:16], batch=True)
+        content = body["choices"][0]["message"]["content"]
+        # salvage + validation as in the live path; repairs would need a live
+        # call per chunk, so invalid cards are just dropped here
+        cards, _, _, stats = fg._accept_cards(content, chunks[i], max_cards)
+        stats["kept"] = len(cards)
+        if report is not None:
+            report[fg.chunk_hash(chunks[i])] = stats
+        if not fg._cacheable(cards, stats):
+            continue                                   # unusable reply: retried on --resume
+        if cache is not None:
+            cache.put(fg._cache_key(chunks[i], max_cards), cards)
+        usable += 1
+        yield i, cards
+
+    missing = len(pending) - len(answered)
+    if missing:
+        metrics.say(f"[batch_gen] ⚠️  {missing} request(s) missing from output "
+                    f"(batch {batch.status}); see error file {state.get('error_file_id')}")
+    if usable < len(pending):
+        # the failed chunks go out in a new batch next run, not this output again
+        state.pop("batch_id", None)
+        _save_state(state_path, state)
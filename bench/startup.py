@@ -0,0 +1,82 @@
+# bench/startup.py — cold-start import benchmark
+"""
+Measures how long a *fresh* interpreter takes to import the entry points,
+and which heavy libraries each import drags in.  Every sample runs in a new
+subprocess, so nothing is warm except the OS file cache.
+
+    python bench/startup.py                # table
+    python bench/startup.py --json out.json --repeat 15
+
+The ``eager baseline`` row reproduces what the old import chain paid
+(tokenizer built, OpenAI client constructed, PDF/DOCX/OCR libs imported)
+so the game-only paths can be compared against it directly.
+"""
+from __future__ import annotations
+import argparse, json, pathlib, statistics, subprocess, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+HEAVY = ["tiktoken", "openai", "genanki", "fitz", "docx", "pytesseract", "PIL", "numpy"]
+
+SCENARIOS = {
+    "eager baseline": (
+        "import tiktoken, openai, genanki, fitz, docx, pytesseract, PIL.Image\n"
+        "tiktoken.encoding_for_model('gpt-4o-mini')\n"
+        "openai.OpenAI(api_key='x')"),
+    "pipeline (quick-play)": "import pipeline",
+    "game1_cli": "import game1_cli",
+    "game2_cli": "import game2_cli",
+    "flashcard_gen": "import flashcard_gen",
+    "driver": "import driver",
+}
+
+_PROBE = ("\nimport sys, json\n"
+          "print(json.dumps([m for m in {heavy!r} if m in sys.modules]))")
+
+
+def sample(code: str) -> tuple[float, list[str]]:
+    """Wall time of one cold ``python -c code`` run, plus heavy modules loaded."""
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code + _PROBE.format(heavy=HEAVY)],
+                         cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if out.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{out.stderr}")
+    return elapsed, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int) -> dict:
+    base = statistics.median(sample("pass")[0] for _ in range(repeat))
+    results = {"interpreter_ms": round(base * 1000, 1), "scenarios": {}}
+    for name, code in SCENARIOS.items():
+        try:
+            runs = [sample(code) for _ in range(repeat)]
+        except RuntimeError as e:                 # e.g. an optional lib missing
+            results["scenarios"][name] = {"error": str(e).splitlines()[-1]}
+            continue
+        times = [t for t, _ in runs]
+        results["scenarios"][name] = {
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "import_ms": round((statistics.median(times) - base) * 1000, 1),
+            "heavy_modules": runs[-1][1],
+        }
+    return results
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Cold-start import benchmark")
+    cli.add_argument("--repeat", type=int, default=7)
+    cli.add_argument("--json", type=pathlib.Path, help="Also write results here")
+    args = cli.parse_args()
+
+    res = run(args.repeat)
+    print(f"bare interpreter: {res['interpreter_ms']} ms\n")
+    print(f"{'scenario':24} {'import ms':>10} {'median ms':>10}  heavy modules loaded")
+    for name, r in res["scenarios"].items():
+        if "error" in r:
+            print(f"{name:24} {'—':>10} {'—':>10}  {r['error']}")
+        else:
+            print(f"{name:24} {r['import_ms']:>10} {r['median_ms']:>10}  "
+                  f"{', '.join(r['heavy_modules']) or '-'}")
+    if args.json:
+        args.json.write_text(json.dumps(res, indent=2))
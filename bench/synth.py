@@ -0,0 +1,122 @@
+# bench/synth.py — synthetic deposition transcripts for benchmarks
+"""
+Deterministic fake deposition transcripts: a caption page, appearances,
+then numbered Q/A testimony about people, dates and equipment, with
+objections, exhibits and recesses mixed in — the same boilerplate / fact
+mix the real inputs have.  Written as TXT, DOCX or PDF with an exact page
+count; the same ``seed`` always gives the same text.
+
+    python bench/synth.py --pages 100 --out /tmp/depo100.pdf
+    python bench/synth.py --pages 1000 --out /tmp/depo1000.docx --seed 7
+"""
+from __future__ import annotations
+import argparse, pathlib, random
+from typing import Iterator, List
+
+LINES_PER_PAGE = 25
+
+_NAMES = ["Mr. Alvarez", "Ms. Becker", "Dr. Chen", "Mr. Duarte", "Ms. Okafor", "Mr. Patel"]
+_THINGS = ["the hydraulic pump", "the pressure valve", "the forklift", "the conveyor belt",
+           "the safety interlock", "the backup generator", "the loading crane", "the gauge"]
+_ACTIONS = ["inspected", "repaired", "shut down", "restarted", "reported", "replaced",
+            "photographed", "tested", "ignored", "logged"]
+_PLACES = ["Bay 3", "the north dock", "the control room", "Warehouse B", "the yard"]
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+           "September", "October", "November", "December"]
+_BOILER = ["MR. {lawyer}: Objection. Form.", "MR. {lawyer}: Objection, foundation.",
+           "(Exhibit {n} marked for identification.)", "(Recess taken.)",
+           "THE WITNESS: Can you repeat the question?", "MR. {lawyer}: You can answer."]
+
+
+def _question(r: random.Random) -> str:
+    return r.choice([
+        f"Q. When did you first see {r.choice(_THINGS)} at {r.choice(_PLACES)}?",
+        f"Q. Who {r.choice(_ACTIONS)} {r.choice(_THINGS)} that morning?",
+        f"Q. Did {r.choice(_NAMES)} tell you the {r.choice(_THINGS)[4:]} was unsafe?",
+        f"Q. What happened after {r.choice(_NAMES)} {r.choice(_ACTIONS)} it?",
+    ])
+
+
+def _answer(r: random.Random) -> str:
+    return r.choice([
+        f"A. On {r.choice(_MONTHS)} {r.randint(1, 28)}, {r.randint(2015, 2023)}, around "
+        f"{r.randint(1, 12)}:{r.randint(0, 59):02d}, I {r.choice(_ACTIONS)} {r.choice(_THINGS)}.",
+        f"A. {r.choice(_NAMES)} {r.choice(_ACTIONS)} {r.choice(_THINGS)} at {r.choice(_PLACES)}, "
+        f"and it was leaking about {r.randint(2, 40)} gallons an hour.",
+        "A. I don't recall.",
+        f"A. Yes. The reading was {r.randint(50, 400)} psi, well over the limit of "
+        f"{r.randint(40, 120)}.",
+        f"A. No, {r.choice(_NAMES)} said it had been {r.choice(_ACTIONS)} the week before.",
+    ])
+
+
+def _caption(r: random.Random, case_no: int) -> List[str]:
+    return ["UNITED STATES DISTRICT COURT", "DISTRICT OF NOWHERE", "",
+            f"{r.choice(_NAMES).split()[-1].upper()}, Plaintiff,", "v.",
+            f"ACME LOGISTICS, INC., Defendant.        Case No. {case_no}", "",
+            "DEPOSITION OF THE WITNESS", f"Taken on {r.choice(_MONTHS)} {r.randint(1, 28)}, 2024",
+            "", "APPEARANCES:", f"For Plaintiff: {r.choice(_NAMES)}",
+            f"For Defendant: {r.choice(_NAMES)}", "Court Reporter: J. Smith, CSR"]
+
+
+def transcript_pages(pages: int, seed: int = 0) -> Iterator[str]:
+    """Yield ``pages`` pages of ``LINES_PER_PAGE`` numbered transcript lines."""
+    r = random.Random(seed)
+    lines = iter(())
+    exhibit = 0
+
+    def testimony() -> Iterator[str]:
+        nonlocal exhibit
+        while True:
+            if r.random() < 0.12:
+                exhibit += 1
+                yield r.choice(_BOILER).format(lawyer=r.choice(_NAMES)[4:].upper(), n=exhibit)
+            yield _question(r)
+            yield _answer(r)
+
+    for page in range(1, pages + 1):
+        if page == 1:
+            body = _caption(r, r.randint(1000, 9999))
+            lines = testimony()
+        else:
+            body = []
+        while len(body) < LINES_PER_PAGE:
+            body.append(next(lines))
+        yield "\n".join(f"{i:>2}  {text}" for i, text in enumerate(body, 1)) + f"\n\nPage {page}"
+
+
+def make_document(path, pages: int, seed: int = 0) -> pathlib.Path:
+    """Write a ``pages``-page transcript as ``.txt``, ``.docx`` or ``.pdf``."""
+    path = pathlib.Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".txt":
+        path.write_text("\n\n".join(transcript_pages(pages, seed)), encoding="utf-8")
+    elif suffix == ".docx":
+        import docx
+        doc = docx.Document()
+        for k, page in enumerate(transcript_pages(pages, seed)):
+            for line in page.split("\n"):
+                doc.add_paragraph(line)
+            if k < pages - 1:
+                doc.add_page_break()
+        doc.save(path)
+    elif suffix == ".pdf":
+        import fitz
+        pdf = fitz.open()
+        for page in transcript_pages(pages, seed):
+            p = pdf.new_page()                  # A4/Letter-ish default
+            p.insert_text((54, 60), page, fontsize=9, lineheight=2.0)
+        pdf.save(path, garbage=0, deflate=True)
+        pdf.close()
+    else:
+        raise ValueError(f"unsupported format: {suffix}")
+    return path
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Write a synthetic deposition transcript")
+    cli.add_argument("--pages", type=int, default=100)
+    cli.add_argument("--seed", type=int, default=0)
+    cli.add_argument("--out", type=pathlib.Path, required=True, help=".txt, .docx or .pdf")
+    args = cli.parse_args()
+    print(make_document(args.out, args.pages, args.seed))
@@ -0,0 +1,247 @@
+# bench/throughput.py — offline throughput / latency / memory benchmark
+"""
+Repeatable end-to-end benchmarks that never touch the network: the LLM and
+embedding calls go to ``fake_openai.FakeClient`` (in-process, configurable
+latency / 429 rate / malformed-reply rate) and the inputs are synthetic
+depositions from ``bench/synth.py`` at several page counts.
+
+Each (case, size) runs in a fresh subprocess inside a scratch directory,
+so peak RSS is that case's own and no cache or store leaks between runs.
+
+    python bench/throughput.py                           # all cases, 10/100/1000 pages
+    python bench/throughput.py --cases chunk,build_deck --pages 100 --json now.json
+    python bench/throughput.py --latency 0.5 --rate-429 0.05 --rate-bad 0.1
+    python bench/throughput.py --json now.json --compare before.json
+
+Cases
+-----
+extract_txt / extract_docx / extract_pdf  ``ingest.extract_text``
+chunk        ``chunker.make_chunks`` (700 tokens)
+build_deck   chunks → cards → JSON/TXT/APKG (``flashcard_gen.build_deck``, no cache)
+apkg         ``anki_export.write_deck_files`` for three cards per chunk
+embed        ``chunker.embed_chunks`` (no vector store)
+prompt       ``prompt_cards.deck_for_topic`` (fresh topic each repeat)
+
+The JSON records the git commit, settings and, per case, wall-time
+percentiles over ``--repeat`` runs, throughput, API latency percentiles
+(from ``metrics``) and peak RSS — diff two files with ``--compare``.
+"""
+from __future__ import annotations
+import argparse, json, os, pathlib, platform, resource, statistics, subprocess, sys, tempfile, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CASES = ["extract_txt", "extract_docx", "extract_pdf", "chunk", "build_deck",
+         "apkg", "embed", "prompt"]
+CHUNK_TOKENS = 700
+CARDS_PER_CHUNK = 3
+
+# ── Child side: one case, one size ────────────────────────────────────────
+
+def _doc(data: pathlib.Path, pages: int, fmt: str) -> pathlib.Path:
+    return data / f"depo{pages}.{fmt}"
+
+
+def _chunks(data: pathlib.Path, pages: int):
+    from chunker import make_chunks
+    from ingest import extract_text
+    return make_chunks(extract_text(_doc(data, pages, "txt"), workers=0), CHUNK_TOKENS)
+
+
+def _fake_client(settings: dict):
+    import fake_openai
+    return fake_openai.FakeClient(**settings)
+
+
+def run_case(case: str, pages: int, data: pathlib.Path, settings: dict, repeat: int) -> dict:
+    """Run ``case`` ``repeat`` times; return timings and per-case counts."""
+    import metrics
+    work: dict = {}
+
+    if case.startswith("extract_"):
+        from ingest import extract_text
+        path = _doc(data, pages, case.split("_", 1)[1])
+        step = lambda k: work.update(chars=len(extract_text(path)))
+        units = {"pages": pages}
+    elif case == "chunk":
+        from chunker import get_encoder, make_chunks
+        from ingest import extract_text
+        text = extract_text(_doc(data, pages, "txt"), workers=0)
+        get_encoder()                                   # tokenizer load is not chunking
+        step = lambda k: work.update(chunks=len(make_chunks(text, CHUNK_TOKENS)))
+        units = {"pages": pages, "chars": len(text)}
+    elif case == "build_deck":
+        import flashcard_gen
+        chunks = _chunks(data, pages)
+        flashcard_gen.set_client(_fake_client(settings))
+
+        def step(k):
+            deck = flashcard_gen.build_deck(chunks, f"bench{k}", CARDS_PER_CHUNK,
+                                            concurrency=settings["concurrency"],
+                                            use_cache=False)
+            work.update(cards=len(json.loads(deck.with_suffix(".cards.json").read_text())))
+        units = {"pages": pages, "chunks": len(chunks)}
+    elif case == "apkg":
+        import fake_openai
+        from anki_export import write_deck_files
+        cards = [dict(c, id=f"{i}-{j}") for i, ch in enumerate(_chunks(data, pages))
+                 for j, c in enumerate(fake_openai.fake_cards(ch, CARDS_PER_CHUNK))]
+        step = lambda k: write_deck_files(cards, f"bench{k}", 1234)
+        units = {"cards": len(cards)}
+    elif case == "embed":
+        import flashcard_gen
+        from chunker import embed_chunks
+        chunks = _chunks(data, pages)
+        flashcard_gen.set_client(_fake_client(settings))
+        step = lambda k: embed_chunks(chunks, concurrency=settings["concurrency"])
+        units = {"chunks": len(chunks)}
+    elif case == "prompt":
+        import prompt_cards
+        prompt_cards.set_client(_fake_client(settings))
+        prompt_cards.DECK_CACHE_PATH = pathlib.Path("prompt_decks.sqlite")
+        n = max(1, pages // 10)                         # topics per repeat scale with size
+        step = lambda k: [prompt_cards.deck_for_topic(f"topic {k}-{i}", 10) for i in range(n)]
+        units = {"topics": n}
+    else:
+        raise SystemExit(f"unknown case {case!r}")
+
+    times = []
+    for k in range(repeat):
+        metrics.reset()
+        t0 = time.perf_counter()
+        step(k)
+        times.append(time.perf_counter() - t0)
+    api = metrics.snapshot()["api"]                     # last repeat's requests
+
+    times.sort()
+    med = statistics.median(times)
+    return {
+        "case": case, "pages": pages,
+        "seconds": {"p50": round(med, 4), "p95": round(times[min(len(times) - 1,
+                                                                 round(0.95 * (len(times) - 1)))], 4),
+                    "min": round(times[0], 4), "max": round(times[-1], 4)},
+        "throughput": {f"{u}_per_s": round(v / med, 2) for u, v in {**units, **work}.items()
+                       if isinstance(v, (int, float)) and med > 0},
+        "counts": {**units, **work},
+        "api": {kind: {"calls": a["calls"], "retries": a["retries"], "latency": a["latency"]}
+                for kind, a in api.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _peak_rss_mb() -> float:
+    # Linux keeps ru_maxrss across exec (it would report the parent's peak);
+    # VmHWM belongs to this address space only
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                 / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+# ── Parent side ───────────────────────────────────────────────────────────
+
+def _commit() -> str | None:
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                         capture_output=True, text=True)
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                           capture_output=True, text=True).stdout.strip()
+    return (out.stdout.strip() + ("-dirty" if dirty else "")) if out.returncode == 0 else None
+
+
+def prepare_data(data: pathlib.Path, sizes, cases) -> None:
+    """Write the synthetic documents the chosen cases need (kept between runs)."""
+    from synth import make_document
+    data.mkdir(parents=True, exist_ok=True)
+    fmts = {"txt"} | {c.split("_", 1)[1] for c in cases if c.startswith("extract_")}
+    for pages in sizes:
+        for fmt in sorted(fmts):
+            path = _doc(data, pages, fmt)
+            if not path.exists():
+                print(f"[bench] writing {path.name} …")
+                make_document(path, pages)
+
+
+def run(cases, sizes, settings: dict, repeat: int, data: pathlib.Path) -> dict:
+    prepare_data(data, sizes, cases)
+    results = []
+    for case in cases:
+        for pages in sizes:
+            with tempfile.TemporaryDirectory(prefix="bench-") as work:
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--child", case, str(pages), "--data", str(data),
+                     "--settings", json.dumps(settings), "--repeat", str(repeat)],
+                    cwd=work, capture_output=True, text=True,
+                    env={**os.environ, "PYTHONPATH": os.pathsep.join(
+                        filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))})
+            if proc.returncode != 0:
+                err = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+                results.append({"case": case, "pages": pages, "error": err})
+                print(f"[bench] {case:12} {pages:>5}p  ERROR {err}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(r)
+            print(f"[bench] {case:12} {pages:>5}p  p50 {r['seconds']['p50']:>8.3f}s  "
+                  f"{r['peak_rss_mb']:>7.1f} MB  "
+                  + "  ".join(f"{k} {v}" for k, v in r["throughput"].items()))
+    return {"commit": _commit(), "python": platform.python_version(),
+            "platform": platform.platform(), "created": time.time(),
+            "settings": settings, "repeat": repeat, "results": results}
+
+
+def compare(now: dict, before: dict) -> None:
+    """Print p50 time and peak-RSS ratios (now / before) per case and size."""
+    old = {(r["case"], r["pages"]): r for r in before["results"] if "error" not in r}
+    print(f"\n{'case':12} {'pages':>5} {'p50 before':>11} {'p50 now':>9} {'ratio':>6} {'RSS ratio':>9}"
+          f"   ({before.get('commit')} → {now.get('commit')})")
+    for r in now["results"]:
+        o = old.get((r["case"], r["pages"]))
+        if o is None or "error" in r:
+            continue
+        a, b = o["seconds"]["p50"], r["seconds"]["p50"]
+        print(f"{r['case']:12} {r['pages']:>5} {a:>11.3f} {b:>9.3f} {b / a if a else 0:>6.2f} "
+              f"{r['peak_rss_mb'] / o['peak_rss_mb'] if o['peak_rss_mb'] else 0:>9.2f}")
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    cli.add_argument("--cases", default=",".join(CASES),
+                     help=f"Comma-separated subset of: {', '.join(CASES)}")
+    cli.add_argument("--pages", default="10,100,1000", help="Document sizes (comma-separated)")
+    cli.add_argument("--repeat", type=int, default=3)
+    cli.add_argument("--latency", type=float, default=0.05, help="Fake API latency (s)")
+    cli.add_argument("--jitter", type=float, default=0.02)
+    cli.add_argument("--rate-429", type=float, default=0.0, help="Fraction of calls throttled")
+    cli.add_argument("--rate-bad", type=float, default=0.0,
+                     help="Fraction of replies truncated / with a malformed card")
+    cli.add_argument("--concurrency", type=int, default=8)
+    cli.add_argument("--data", type=pathlib.Path,
+                     default=pathlib.Path(tempfile.gettempdir()) / "flashcard-bench-data",
+                     help="Where synthetic documents are kept")
+    cli.add_argument("--json", type=pathlib.Path, help="Write results here")
+    cli.add_argument("--compare", type=pathlib.Path, help="Earlier --json output to diff against")
+    cli.add_argument("--child", nargs=2, metavar=("CASE", "PAGES"), help=argparse.SUPPRESS)
+    cli.add_argument("--settings", help=argparse.SUPPRESS)
+    args = cli.parse_args()
+
+    if args.child:
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):    # keep stdout for the JSON line
+            res = run_case(args.child[0], int(args.child[1]), args.data,
+                           json.loads(args.settings), args.repeat)
+        print(json.dumps(res))
+        sys.exit()
+
+    settings = {"latency": args.latency, "jitter": args.jitter, "rate_429": args.rate_429,
+                "rate_bad": args.rate_bad, "concurrency": args.concurrency}
+    res = run([c.strip() for c in args.cases.split(",") if c.strip()],
+              [int(p) for p in args.pages.split(",")], settings, args.repeat, args.data)
+    if args.json:
+        args.json.write_text(json.dumps(res, indent=2))
+    if args.compare:
+        compare(res, json.loads(args.compare.read_text()))
@@ -0,0 +1,229 @@
+"""
+bulk_build.py
+-------------
+Non-interactive deck builds for many documents at once (a production set
+of hundreds of PDFs / DOCX / scans).
+
+* Extraction + chunking run in a process pool (``--procs``), one document
+  per worker, each reusing its ``.chunks.sqlite`` store when unchanged.
+* As soon as a document is chunked its deck build starts (up to ``--docs``
+  at a time), so extraction of later files overlaps generation of earlier
+  ones.
+* Every build shares **one** rate limiter (``--rpm`` / ``--tpm``), one
+  request pool (``--concurrency`` requests in flight across *all*
+  documents) and one response cache — the account limits hold no matter
+  how many documents are in progress.
+* A failed document is recorded and skipped; the rest carry on.
+
+Outputs go to ``<out>/<doc>/`` (deck, JSON, TXT, journal, manifest …),
+plus ``<out>/summary.json`` (per-document status, chunk / card counts,
+timings) and ``<out>/metrics.json``.  Re-running the same command only pays
+for documents or chunks that changed.
+
+Typical usage
+-------------
+    python bulk_build.py depositions/ --out decks --concurrency 32 --tpm 2000000
+    python bulk_build.py "prod/**/*.pdf" --procs 8 --cards 4
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import argparse, glob, json, multiprocessing, os, pathlib, threading, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import metrics
+from ingest import IMAGE_SUFFIXES
+
+SUFFIXES = {".pdf", ".docx", ".doc", ".txt"} | IMAGE_SUFFIXES
+SUMMARY_NAME = "summary.json"
+
+# ── 2. Inputs ──────────────────────────────────────────────────────────────
+
+def find_documents(inputs: Iterable[str]) -> List[pathlib.Path]:
+    """Files named by ``inputs`` (files, directories searched recursively,
+    or glob patterns), supported types only, each once, in sorted order."""
+    found: Dict[pathlib.Path, None] = {}
+    for item in inputs:
+        p = pathlib.Path(item)
+        if p.is_dir():
+            paths = p.rglob("*")
+        elif p.exists():
+            paths = [p]
+        else:
+            paths = map(pathlib.Path, glob.glob(item, recursive=True))
+        for f in sorted(paths):
+            if f.is_file() and f.suffix.lower() in SUFFIXES:
+                found.setdefault(f.resolve())
+    return list(found)
+
+
+def _deck_names(paths: List[pathlib.Path]) -> Dict[pathlib.Path, str]:
+    # same stem in two folders → depo, depo_2, …
+    names, taken = {}, set()
+    for p in paths:
+        name, k = p.stem.replace(" ", "_"), 2
+        while name.lower() in taken:
+            name, k = f"{p.stem.replace(' ', '_')}_{k}", k + 1
+        taken.add(name.lower())
+        names[p] = name
+    return names
+
+# ── 3. Workers ─────────────────────────────────────────────────────────────
+
+def _extract(path: str, store_path: str, max_tokens: int, overlap: int, ocr_dpi: int):
+    """Process-pool task: chunk one document (in-process, no nested pool)."""
+    from driver import run_extraction
+    t0 = time.perf_counter()
+    chunks = run_extraction(pathlib.Path(path), max_tokens=max_tokens, workers=0,
+                            ocr_dpi=ocr_dpi, overlap=overlap, store_path=store_path)
+    return chunks, time.perf_counter() - t0
+
+
+def _build(chunks: List[str], name: str, out_dir: pathlib.Path, args, shared: dict) -> dict:
+    from flashcard_gen import build_deck
+    if args.select or args.min_score is not None:
+        from select_chunks import select_chunks
+        keep = select_chunks(chunks, top_k=args.select, min_score=args.min_score)
+        chunks = [chunks[i] for i in keep]
+    t0 = time.perf_counter()
+    deck = build_deck(chunks, name, args.cards,
+                      refresh=args.refresh, pack=args.pack_tokens if args.pack else None,
+                      dedup=args.dedup_threshold if args.dedup else None,
+                      manifest=out_dir / (name + ".manifest.json"),
+                      out_dir=out_dir, **shared)
+    cards = json.loads(deck.with_suffix(".cards.json").read_text(encoding="utf-8"))
+    return {"deck": str(deck), "chunks": len(chunks), "cards": len(cards),
+            "build_seconds": round(time.perf_counter() - t0, 3)}
+
+# ── 4. Driver ──────────────────────────────────────────────────────────────
+
+def bulk_build(paths: List[pathlib.Path], out: pathlib.Path, args) -> dict:
+    """Build a deck per document; return (and write) the summary."""
+    from cache import DiskCache
+    from flashcard_gen import CACHE_MAX_BYTES, CACHE_PATH
+    from ratelimit import RateLimiter
+
+    out.mkdir(parents=True, exist_ok=True)
+    names = _deck_names(paths)
+    rows: Dict[pathlib.Path, dict] = {p: {"file": str(p), "deck_name": names[p],
+                                          "status": "queued"} for p in paths}
+    lock = threading.Lock()
+    t_start = time.perf_counter()
+
+    cache = None if args.no_cache else DiskCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES)
+    requests = ThreadPoolExecutor(max_workers=max(1, args.concurrency),
+                                  thread_name_prefix="cardgen")
+    shared = {"limiter": RateLimiter(rpm=args.rpm, tpm=args.tpm), "use_cache": cache is not None,
+              "cache": cache, "executor": requests}
+
+    def build(p: pathlib.Path, chunks: List[str]) -> None:
+        try:
+            status, result = "done", _build(chunks, names[p], out / names[p], args, shared)
+        except Exception as e:
+            status, result = "failed", {"error": f"{type(e).__name__}: {e}"}
+            print(f"[bulk_build] ❌  {p.name}: {e}")
+        with lock:
+            rows[p].update(status=status, **result)
+            done = sum(r["status"] in {"done", "failed"} for r in rows.values())
+        print(f"[bulk_build] {done}/{len(paths)} document(s) finished ({p.name}: {status})")
+
+    # spawn, not fork: the parent already runs threads (request pool, builders)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, args.procs), mp_context=ctx) as procs, \
+         ThreadPoolExecutor(max_workers=max(1, args.docs), thread_name_prefix="deck") as decks:
+        extracting = {}
+        for p in paths:
+            d = out / names[p]
+            d.mkdir(exist_ok=True)
+            extracting[procs.submit(_extract, str(p), str(d / (names[p] + ".chunks.sqlite")),
+                                    args.tokens, args.overlap, args.ocr_dpi)] = p
+        for fut in as_completed(extracting):
+            p = extracting[fut]
+            try:
+                chunks, seconds = fut.result()
+            except Exception as e:
+                with lock:
+                    rows[p].update(status="failed", error=f"extract: {type(e).__name__}: {e}")
+                print(f"[bulk_build] ❌  {p.name}: extraction failed: {e}")
+                continue
+            metrics.add_time("extract_workers", seconds)    # summed over processes
+            with lock:
+                rows[p].update(status="building", extract_seconds=round(seconds, 3))
+            decks.submit(build, p, chunks)
+    requests.shutdown(wait=True)
+    if cache is not None:
+        cache.close()
+
+    docs = [rows[p] for p in paths]
+    summary = {
+        "documents": len(docs),
+        "done": sum(r["status"] == "done" for r in docs),
+        "failed": sum(r["status"] == "failed" for r in docs),
+        "chunks": sum(r.get("chunks", 0) for r in docs),
+        "cards": sum(r.get("cards", 0) for r in docs),
+        "wall_seconds": round(time.perf_counter() - t_start, 3),
+        "docs": docs,
+    }
+    (out / SUMMARY_NAME).write_text(json.dumps(summary, ensure_ascii=False, indent=2),
+                                    encoding="utf-8")
+    print(f"[bulk_build] {summary['done']}/{summary['documents']} deck(s) built, "
+          f"{summary['failed']} failed, {summary['cards']} card(s) in "
+          f"{summary['wall_seconds']:.0f}s → {out / SUMMARY_NAME}")
+    metrics.write_report(out / "metrics.json", documents=len(docs))
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    cli = argparse.ArgumentParser(description="Build Anki decks for many documents at once")
+    cli.add_argument("inputs", nargs="+",
+                     help="Files, directories (searched recursively) or glob patterns")
+    cli.add_argument("--out", type=pathlib.Path, default=pathlib.Path("decks"),
+                     help="Output directory (default ./decks)")
+    cli.add_argument("--procs", type=int, default=os.cpu_count() or 1,
+                     help="Extraction/OCR processes (default: one per core)")
+    cli.add_argument("--docs", type=int, default=4,
+                     help="Decks generated at the same time (default 4)")
+    cli.add_argument("--concurrency", type=int, default=16,
+                     help="API requests in flight across all documents (default 16)")
+    cli.add_argument("--rpm", type=float, default=None,
+                     help="Max OpenAI requests per minute, all documents together")
+    cli.add_argument("--tpm", type=float, default=None,
+                     help="Max OpenAI tokens per minute, all documents together")
+    cli.add_argument("--tokens", type=int, default=700,
+                     help="Max tokens per chunk (default 700)")
+    cli.add_argument("--overlap", type=int, default=0,
+                     help="Tokens repeated from the previous chunk (default 0)")
+    cli.add_argument("--cards", type=int, default=3,
+                     help="Max cards per chunk (default 3)")
+    cli.add_argument("--ocr-dpi", type=int, default=300,
+                     help="DPI for OCR of scanned PDF pages (0 = no OCR fallback)")
+    cli.add_argument("--no-cache", action="store_true",
+                     help="Bypass the on-disk LLM response cache")
+    cli.add_argument("--refresh", action="store_true",
+                     help="Regenerate every chunk and overwrite cached responses")
+    cli.add_argument("--pack", action="store_true",
+                     help="Send several chunks per request")
+    cli.add_argument("--pack-tokens", type=int, default=6000, metavar="TOKENS",
+                     help="Chunk tokens per --pack request (default 6000)")
+    cli.add_argument("--dedup", action="store_true",
+                     help="Merge near-duplicate cards within each deck")
+    cli.add_argument("--dedup-threshold", type=float, default=0.6, metavar="THRESHOLD",
+                     help="Similarity at which --dedup merges two cards (default 0.6)")
+    cli.add_argument("--select", type=int, default=None, metavar="K",
+                     help="Send only the K most substantive chunks of each document")
+    cli.add_argument("--min-score", type=float, default=None,
+                     help="Skip chunks scoring below this (0‑1)")
+    args = cli.parse_args(argv)
+
+    paths = find_documents(args.inputs)
+    if not paths:
+        print("[bulk_build] No supported documents found.")
+        return 1
+    print(f"[bulk_build] {len(paths)} document(s) → {args.out}")
+    summary = bulk_build(paths, args.out, args)
+    return 0 if not summary["failed"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
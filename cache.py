@@ -0,0 +1,129 @@
+"""
+cache.py
+--------
+Small persistent key → JSON cache on top of SQLite (stdlib only).  Entries are
+content-addressed by the caller (see ``make_key``), capped by total size and
+evicted least-recently-used first.  One instance may be shared between
+threads, and several processes may open the same file: the database runs
+in WAL mode with a busy timeout, and the total size lives in the database
+(kept by triggers), so every process enforces the same byte cap.
+
+Typical usage
+-------------
+>>> c = DiskCache(".flashcard_cache/cards.sqlite", max_bytes=200 << 20)
+>>> key = make_key(chunk, "gpt-4o-mini", SYSTEM_PROMPT, 3, 900)
+>>> cards = c.get(key)
+>>> if cards is None:
+...     cards = call_the_api()
+...     c.put(key, cards)
+>>> c.stats()   # {'hits': .., 'misses': .., 'entries': .., 'bytes': ..}
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import hashlib, json, pathlib, sqlite3, threading, time
+from typing import Any, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key       TEXT PRIMARY KEY,
+    value     TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used);
+CREATE TABLE IF NOT EXISTS totals (
+    id    INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM entries));
+CREATE TRIGGER IF NOT EXISTS entries_ins AFTER INSERT ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS entries_upd AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS entries_del AFTER DELETE ON entries
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END;
+"""
+BUSY_TIMEOUT = 30.0           # seconds a writer waits for another process's lock
+
+# ── 2. Key helper ──────────────────────────────────────────────────────────
+
+def make_key(*parts: Any) -> str:
+    """SHA-256 over the JSON encoding of ``parts`` (order matters)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ── 3. Cache ───────────────────────────────────────────────────────────────
+
+class DiskCache:
+    """SQLite-backed LRU cache with a byte-size cap and hit/miss counters."""
+
+    def __init__(self, path, max_bytes: int = 256 << 20):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        # autocommit; writes take the lock up front with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("BEGIN IMMEDIATE;" + _SCHEMA + "COMMIT;")
+
+    def _total(self) -> int:
+        return self._db.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        if size > self.max_bytes:
+            return                                  # would evict everything else
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO entries(key, value, size, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                    "size = excluded.size, last_used = excluded.last_used",
+                    (key, raw, size, time.time()))
+                self._evict()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _evict(self) -> None:
+        """Drop least-recently-used rows until we are back under ``max_bytes``."""
+        total = self._total()
+        while total > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self._total()
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": entries, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
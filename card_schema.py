@@ -0,0 +1,139 @@
+"""
+card_schema.py
+--------------
+Validation, salvage and light repair of model-generated cards, so a reply
+with one bad card (or a reply cut off mid-JSON) no longer costs the whole
+chunk.
+
+* ``extract_cards`` – the ``cards`` list of a reply; if the JSON is broken
+  (e.g. truncated at ``max_tokens``), every *complete* card object before
+  the break is still recovered.
+* ``clean_card``    – local fixes that need no API call: trimmed strings,
+  context tag normalised, duplicate / answer-equal distractors removed.
+* ``ExcerptIndex``  – checks that an excerpt really occurs in its chunk:
+  normalised substring first, then word-trigram overlap for quotes the
+  model lightly cleaned up.
+* ``validate``      – splits cards into valid ones and ``(card, problems)``
+  pairs that ``flashcard_gen`` sends back for a small repair call.
+
+Typical usage
+-------------
+>>> raw, broken = extract_cards(content)
+>>> valid, invalid = validate(raw, chunk)
+>>> invalid[0][1]
+['excerpt not found in chunk']
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import json, re
+from typing import List, Tuple
+
+SCHEMA_VERSION = 1            # bump when the rules below change (part of the card cache key)
+CONTEXTS = {"event", "equipment", "party-fact", "timeline", "admission", "other"}
+MIN_DISTRACTORS = 2
+FUZZY_MIN = 0.8               # share of excerpt word-trigrams that must be in the chunk
+
+_DASHES = re.compile(r"[‐-―−]")
+_NON_WORD = re.compile(r"[^\w]+")
+
+# ── 2. Salvage ─────────────────────────────────────────────────────────────
+
+def extract_cards(content: str) -> Tuple[list, bool]:
+    """``(cards, broken)`` — ``broken`` means the JSON did not parse and
+    ``cards`` holds only the complete objects recovered before the break."""
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        return _salvage(content or ""), True
+    cards = data.get("cards") if isinstance(data, dict) else data
+    return (cards if isinstance(cards, list) else []), False
+
+
+def _salvage(content: str) -> list:
+    m = re.search(r'"cards"\s*:\s*\[', content)
+    if m is None:
+        return []
+    dec, pos, out = json.JSONDecoder(), m.end(), []
+    while True:
+        while pos < len(content) and content[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(content) or content[pos] != "{":
+            return out
+        try:
+            obj, pos = dec.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            return out                          # the torn card at the end
+        out.append(obj)
+
+# ── 3. Checks ──────────────────────────────────────────────────────────────
+
+def _norm(text: str) -> str:
+    text = _DASHES.sub("-", text.lower()).replace("’", "'").replace("“", '"')
+    return " ".join(_NON_WORD.sub(" ", text.replace("”", '"')).split())
+
+
+class ExcerptIndex:
+    """Fast "does this excerpt come from the chunk?" test for one chunk."""
+
+    def __init__(self, chunk: str):
+        self.text = _norm(chunk)
+        words = self.text.split()
+        self.grams = set(zip(words, words[1:], words[2:]))
+
+    def contains(self, excerpt: str) -> bool:
+        norm = _norm(excerpt)
+        if not norm:
+            return False
+        if norm in self.text:
+            return True
+        words = norm.split()
+        grams = list(zip(words, words[1:], words[2:]))
+        if not grams:
+            return False
+        return sum(g in self.grams for g in grams) / len(grams) >= FUZZY_MIN
+
+
+def clean_card(card: dict) -> dict:
+    """Local, free fixes; returns a new dict."""
+    c = {k: v.strip() if isinstance(v, str) else v for k, v in card.items()}
+    ctx = _DASHES.sub("-", str(c.get("context", "")).strip().lower())
+    c["context"] = ctx if ctx in CONTEXTS else "other"
+    back = _norm(str(c.get("back", "")))
+    seen, distractors = set(), []
+    for d in c.get("distractors") or []:
+        if isinstance(d, str) and d.strip() and _norm(d) != back and _norm(d) not in seen:
+            seen.add(_norm(d))
+            distractors.append(d.strip())
+    c["distractors"] = distractors
+    return c
+
+
+def problems(card: dict, index: ExcerptIndex) -> List[str]:
+    """What is wrong with an already cleaned card (empty list = valid)."""
+    out = []
+    for field in ("front", "back"):
+        if not isinstance(card.get(field), str) or not card[field]:
+            out.append(f"missing {field}")
+    if len(card.get("distractors", [])) < MIN_DISTRACTORS:
+        out.append(f"needs {MIN_DISTRACTORS} distinct wrong distractors")
+    excerpt = card.get("excerpt")
+    if not isinstance(excerpt, str) or not index.contains(excerpt):
+        out.append("excerpt not found in chunk")
+    return out
+
+
+def validate(cards: list, chunk: str) -> Tuple[List[dict], List[Tuple[dict, List[str]]]]:
+    """``(valid, invalid)``; invalid entries carry their list of problems."""
+    index = ExcerptIndex(chunk)
+    valid, invalid = [], []
+    for card in cards:
+        if not isinstance(card, dict):
+            continue
+        c = clean_card(card)
+        issues = problems(c, index)
+        if issues:
+            invalid.append((c, issues))
+        else:
+            valid.append(c)
+    return valid, invalid
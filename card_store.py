@@ -0,0 +1,280 @@
+"""
+card_store.py
+-------------
+One SQLite database for everything the games (and ``pipeline`` builds)
+persist: decks and their cards, per-card stats (kept / tossed in Game 1,
+right / wrong in Game 2) and play sessions.  Replaces re-parsing
+``.cards.json`` on every launch and rewriting all of ``user_profile.json``
+after every round.
+
+* WAL journal + ``synchronous=NORMAL`` — readers never block the writer,
+  and a commit is one append to the log, not a rewrite.
+* Stats are upserted as deltas in one transaction per round, so a save
+  costs O(cards touched), whatever the size of the profile.
+* SM-2 review state per card (``scheduler.py``) sits in an indexed table.
+* A ``.cards.json`` is imported once; later loads skip the file entirely
+  and read its rows straight from the database (one query, one parse)
+  until the file's size or mtime changes.
+
+``import_profile`` / ``export_profile`` and ``export_json`` convert to and
+from the old JSON files.
+
+Typical usage
+-------------
+>>> store = CardStore()
+>>> cards = store.load_json_deck("deposition.cards.json")
+>>> store.add_stats({cards[0]["id"]: {"kept": 1}})
+>>> store.stats([cards[0]["id"]])
+{'3f9a…-0': {'kept': 1, 'tossed': 0, 'right': 0, 'wrong': 0}}
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import json, pathlib, sqlite3, threading, time
+from typing import Dict, Iterable, List, Optional
+
+STORE_PATH = pathlib.Path("flashcards.sqlite")
+STAT_FIELDS = ("kept", "tossed", "right", "wrong")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id       INTEGER PRIMARY KEY,
+    source   TEXT UNIQUE NOT NULL,      -- resolved path of the .cards.json
+    name     TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size     INTEGER
+);
+CREATE TABLE IF NOT EXISTS cards (
+    deck_id INTEGER NOT NULL REFERENCES decks(id) ON DELETE CASCADE,
+    pos     INTEGER NOT NULL,
+    card_id TEXT NOT NULL,
+    data    TEXT NOT NULL,              -- the card dict as JSON
+    PRIMARY KEY (deck_id, pos)
+);
+CREATE INDEX IF NOT EXISTS cards_by_id ON cards(card_id);
+CREATE TABLE IF NOT EXISTS card_stats (
+    card_id   TEXT PRIMARY KEY,
+    kept      INTEGER NOT NULL DEFAULT 0,
+    tossed    INTEGER NOT NULL DEFAULT 0,
+    right     INTEGER NOT NULL DEFAULT 0,
+    wrong     INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS reviews (         -- spaced-repetition state, see scheduler.py
+    card_id  TEXT PRIMARY KEY,
+    ease     REAL NOT NULL,
+    interval REAL NOT NULL,
+    reps     INTEGER NOT NULL,
+    lapses   INTEGER NOT NULL,
+    due      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_due ON reviews(due);
+CREATE TABLE IF NOT EXISTS sessions (
+    id       INTEGER PRIMARY KEY,
+    game     TEXT NOT NULL,
+    deck     TEXT,
+    started  REAL NOT NULL,
+    ended    REAL,
+    summary  TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# ── 2. Store ───────────────────────────────────────────────────────────────
+
+class CardStore:
+    """Cards, per-card stats and sessions in one WAL-mode SQLite file."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_SCHEMA)
+
+    # ── decks & cards ──────────────────────────────────────────────────────
+    def import_cards(self, source, cards: List[dict], name: Optional[str] = None) -> int:
+        """Replace the deck stored for ``source`` with ``cards`` (one transaction).
+
+        Cards without an ``id`` get ``c<position>``, as ``load_cards`` always did.
+        """
+        p = pathlib.Path(source)
+        st = p.stat() if p.exists() else None
+        rows = []
+        for i, c in enumerate(cards):
+            c.setdefault("id", f"c{i}")
+            rows.append((i, c["id"], json.dumps(c, ensure_ascii=False)))
+        with self._lock, self._db:
+            deck = self._deck_row(p, name, st)
+            self._db.execute("DELETE FROM cards WHERE deck_id = ?", (deck,))
+            self._db.executemany("INSERT INTO cards(deck_id, pos, card_id, data) "
+                                 "VALUES (?, ?, ?, ?)", ((deck, *r) for r in rows))
+        return len(rows)
+
+    def _deck_row(self, p: pathlib.Path, name: Optional[str], st) -> int:
+        source = str(p.resolve())
+        self._db.execute(
+            "INSERT INTO decks(source, name, mtime_ns, size) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(source) DO UPDATE SET name = excluded.name, "
+            "mtime_ns = excluded.mtime_ns, size = excluded.size",
+            (source, name or _deck_name(p), st and st.st_mtime_ns, st and st.st_size))
+        return self._db.execute("SELECT id FROM decks WHERE source = ?", (source,)).fetchone()[0]
+
+    def cards(self, source) -> Optional[List[dict]]:
+        """Cards of the deck imported from ``source``, or ``None`` if unknown."""
+        with self._lock:
+            row = self._db.execute("SELECT id FROM decks WHERE source = ?",
+                                   (str(pathlib.Path(source).resolve()),)).fetchone()
+            if row is None:
+                return None
+            return self._deck_cards(row[0])
+
+    def _deck_cards(self, deck: int) -> List[dict]:
+        rows = self._db.execute("SELECT data FROM cards WHERE deck_id = ? ORDER BY pos",
+                                (deck,)).fetchall()
+        # one parse of the joined rows instead of one json.loads per card
+        return json.loads("[" + ",".join(d for (d,) in rows) + "]")
+
+    def is_current(self, source) -> bool:
+        """True if ``source`` is unchanged since it was last imported."""
+        return self._current_deck(pathlib.Path(source)) is not None
+
+    def _current_deck(self, p: pathlib.Path) -> Optional[int]:
+        """Deck id of ``p`` if its size / mtime still match the import."""
+        try:
+            st = p.stat()
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT id, mtime_ns, size FROM decks WHERE source = ?",
+                                   (str(p.resolve()),)).fetchone()
+        if row is None or row[1:] != (st.st_mtime_ns, st.st_size):
+            return None
+        return row[0]
+
+    def load_json_deck(self, json_file) -> List[dict]:
+        """Cards of a ``.cards.json``; the file is only read and parsed if it
+        changed (size / mtime), otherwise the stored deck is returned."""
+        p = pathlib.Path(json_file)
+        deck = self._current_deck(p)
+        if deck is not None:
+            with self._lock:
+                return self._deck_cards(deck)
+        cards = json.loads(p.read_text(encoding="utf-8"))
+        self.import_cards(p, cards)
+        return cards
+
+    def export_json(self, source, out_path) -> int:
+        """Write the stored deck for ``source`` back out as ``.cards.json``."""
+        cards = self.cards(source) or []
+        pathlib.Path(out_path).write_text(json.dumps(cards, ensure_ascii=False, indent=2),
+                                          encoding="utf-8")
+        return len(cards)
+
+    # ── per-card stats ─────────────────────────────────────────────────────
+    def add_stats(self, deltas: Dict[str, Dict[str, int]]) -> None:
+        """Add counter deltas, e.g. ``{card_id: {"kept": 1}}``, in one transaction."""
+        now = time.time()
+        rows = [(cid, *(int(d.get(f, 0)) for f in STAT_FIELDS), now)
+                for cid, d in deltas.items()]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO card_stats(card_id, kept, tossed, right, wrong, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(card_id) DO UPDATE SET "
+                "kept = kept + excluded.kept, tossed = tossed + excluded.tossed, "
+                "right = right + excluded.right, wrong = wrong + excluded.wrong, "
+                "last_seen = excluded.last_seen", rows)
+
+    def stats(self, card_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """Counters for ``card_ids`` (zeros for cards never seen)."""
+        ids = list(dict.fromkeys(card_ids))
+        out = {cid: dict.fromkeys(STAT_FIELDS, 0) for cid in ids}
+        with self._lock:
+            for k in range(0, len(ids), 500):          # stay under SQLite's bind limit
+                part = ids[k:k + 500]
+                q = ("SELECT card_id, kept, tossed, right, wrong FROM card_stats "
+                     f"WHERE card_id IN ({','.join('?' * len(part))})")
+                for cid, *vals in self._db.execute(q, part):
+                    out[cid] = dict(zip(STAT_FIELDS, vals))
+        return out
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._db.execute("SELECT COALESCE(SUM(kept), 0), COALESCE(SUM(tossed), 0), "
+                                   "COALESCE(SUM(right), 0), COALESCE(SUM(wrong), 0) "
+                                   "FROM card_stats").fetchone()
+        return dict(zip(STAT_FIELDS, row))
+
+    # ── review scheduling ──────────────────────────────────────────────────
+    def reviews(self, card_ids: Iterable[str]) -> Dict[str, tuple]:
+        """``card_id → (ease, interval, reps, lapses, due)`` for reviewed cards."""
+        ids = list(dict.fromkeys(card_ids))
+        out: Dict[str, tuple] = {}
+        with self._lock:
+            for k in range(0, len(ids), 500):
+                part = ids[k:k + 500]
+                q = ("SELECT card_id, ease, interval, reps, lapses, due FROM reviews "
+                     f"WHERE card_id IN ({','.join('?' * len(part))})")
+                for cid, *row in self._db.execute(q, part):
+                    out[cid] = tuple(row)
+        return out
+
+    def save_reviews(self, states: Dict[str, tuple]) -> None:
+        """Upsert review states (same tuple layout as ``reviews``) in one transaction."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO reviews(card_id, ease, interval, reps, lapses, due) "
+                "VALUES (?, ?, ?, ?, ?, ?)", ((cid, *st) for cid, st in states.items()))
+
+    # ── sessions ───────────────────────────────────────────────────────────
+    def start_session(self, game: str, deck: Optional[str] = None) -> int:
+        with self._lock, self._db:
+            cur = self._db.execute("INSERT INTO sessions(game, deck, started) VALUES (?, ?, ?)",
+                                   (game, deck, time.time()))
+        return cur.lastrowid
+
+    def end_session(self, session_id: int, **summary) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE sessions SET ended = ?, summary = ? WHERE id = ?",
+                             (time.time(), json.dumps(summary), session_id))
+
+    # ── legacy user_profile.json ───────────────────────────────────────────
+    def import_profile(self, profile_path) -> bool:
+        """Fold an old ``user_profile.json`` into the stats, once."""
+        p = pathlib.Path(profile_path)
+        key = f"imported:{p.resolve()}"
+        with self._lock:
+            done = self._db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone()
+        if done or not p.exists():
+            return False
+        profile = json.loads(p.read_text())
+        self.add_stats({cid: {"kept": s.get("k", 0), "tossed": s.get("t", 0)}
+                        for cid, s in profile.get("by_card", {}).items()})
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO meta(key, value) VALUES (?, ?)", (key, str(time.time())))
+        print(f"[card_store] Imported {len(profile.get('by_card', {}))} card stat(s) from {p.name}")
+        return True
+
+    def export_profile(self, profile_path) -> None:
+        """Write the Game 1 stats in the old ``user_profile.json`` layout."""
+        with self._lock:
+            rows = self._db.execute("SELECT card_id, kept, tossed FROM card_stats "
+                                    "WHERE kept OR tossed").fetchall()
+        by_card = {cid: {"k": k, "t": t} for cid, k, t in rows}
+        profile = {"kept": sum(k for _, k, _ in rows), "tossed": sum(t for _, _, t in rows),
+                   "by_card": by_card}
+        pathlib.Path(profile_path).write_text(json.dumps(profile, indent=2))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _deck_name(p: pathlib.Path) -> str:
+    name = p.name
+    return name[:-len(".cards.json")] if name.endswith(".cards.json") else p.stem
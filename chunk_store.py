@@ -0,0 +1,126 @@
+"""
+chunk_store.py
+--------------
+Versioned on-disk store for the chunks of one document (replaces the old
+``.chunks.pkl``).  A single SQLite file holds, per chunk, its text, token
+count and source page span, plus a fingerprint of everything that decided
+the chunking: the source file's bytes, tokenizer, ``max_tokens``,
+``overlap`` and OCR DPI.  No pickle — opening a store never runs code.
+
+Chunks are rows, so a single chunk is read without loading the rest
+(``store[i]``); the file is opened with SQLite memory-mapping on.
+
+Typical usage
+-------------
+>>> fp = chunk_fingerprint("depo.pdf", max_tokens=900, overlap=0, ocr_dpi=300)
+>>> store = ChunkStore("depo.chunks.sqlite")
+>>> if store.fingerprint != fp:
+...     store.write(fp, iter_chunk_records(iter_pages("depo.pdf"), 900))
+>>> len(store), store[0][:40], store.record(0).pages
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import hashlib, pathlib, sqlite3
+from typing import Iterable, Iterator, List, Optional
+
+from cache import make_key
+from chunker import Chunk, chunk_hash
+
+SCHEMA_VERSION = 1
+MMAP_BYTES = 256 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    idx        INTEGER PRIMARY KEY,
+    hash       TEXT NOT NULL,
+    text       TEXT NOT NULL,
+    tokens     INTEGER NOT NULL,
+    page_start INTEGER NOT NULL,
+    page_end   INTEGER NOT NULL
+);
+"""
+
+# ── 2. Fingerprint ─────────────────────────────────────────────────────────
+
+def _file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_fingerprint(path, *, max_tokens: int, overlap: int = 0,
+                      ocr_dpi: Optional[int] = None) -> str:
+    """Key that changes whenever re-chunking ``path`` could give other chunks."""
+    import chunker
+    return make_key("chunks", SCHEMA_VERSION, _file_digest(path),
+                    chunker.TOKENIZER_MODEL, chunker.ANCHOR_EVERY, chunker.ANCHOR_MIN_FILL,
+                    max_tokens, overlap, ocr_dpi)
+
+# ── 3. Store ───────────────────────────────────────────────────────────────
+
+class ChunkStore:
+    """Indexed, read-mostly table of one document's chunks."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        return row[0] if row else None
+
+    def write(self, fingerprint: str, records: Iterable[Chunk]) -> int:
+        """Replace the contents with ``records`` in one transaction; return the count.
+
+        The fingerprint is written last, so a store that was interrupted
+        mid-write never matches and is simply rebuilt next time.
+        """
+        with self._db:
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM chunks")
+            n = 0
+            for n, c in enumerate(records, start=1):
+                self._db.execute(
+                    "INSERT INTO chunks(idx, hash, text, tokens, page_start, page_end) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (n - 1, chunk_hash(c.text), c.text, c.tokens, c.pages[0], c.pages[1]))
+            self._db.execute("INSERT INTO meta(key, value) VALUES ('fingerprint', ?)",
+                             (fingerprint,))
+        return n
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __getitem__(self, i: int) -> str:
+        row = self._db.execute("SELECT text FROM chunks WHERE idx = ?", (i,)).fetchone()
+        if row is None:
+            raise IndexError(i)
+        return row[0]
+
+    def __iter__(self) -> Iterator[str]:
+        for (text,) in self._db.execute("SELECT text FROM chunks ORDER BY idx"):
+            yield text
+
+    def record(self, i: int) -> Chunk:
+        """Text, token count and page span of chunk ``i``."""
+        row = self._db.execute("SELECT text, tokens, page_start, page_end FROM chunks "
+                               "WHERE idx = ?", (i,)).fetchone()
+        if row is None:
+            raise IndexError(i)
+        return Chunk(row[0], row[1], (row[2], row[3]))
+
+    def hashes(self) -> List[str]:
+        return [h for (h,) in self._db.execute("SELECT hash FROM chunks ORDER BY idx")]
+
+    def close(self) -> None:
+        self._db.close()
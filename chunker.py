@@ -4,7 +4,8 @@ chunker.py
 Split long documents into GPT-friendly chunks, and (optionally) turn those
 chunks into embedding vectors.  *No OpenAI client is created at import time*,
 so importing this module never fails even if the API key is not yet in the
-environment.
+environment.  The tokenizer is loaded lazily too (``get_encoder``), so the
+import itself is cheap.
 
 Typical usage
 -------------
@@ -13,59 +14,354 @@ Typical usage
 >>> txt = extract_text("my_doc.pdf")
 >>> pieces = make_chunks(txt, max_tokens=700)
 >>> vectors = embed_chunks(pieces)   # only if you actually need them
+
+Streaming: ``iter_chunks(iter_pages(path), 700)`` starts yielding chunks
+while the rest of the document is still being extracted.
 """
 
 # ── 1. Imports ──────────────────────────────────────────────────────────────
-from typing import List
-import tiktoken  # Official OpenAI tokenizer
+import bisect, functools, os, re, time, zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+import metrics
+
+# tiktoken downloads its BPE file on first use and by default caches it in
+# the temp dir; keep it somewhere persistent so later runs work offline.
+os.environ.setdefault("TIKTOKEN_CACHE_DIR",
+                      str(Path.home() / ".cache" / "flashcard-maker" / "tiktoken"))
+
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder():
+    """The tiktoken encoder, built on first use rather than at import."""
+    import tiktoken  # Official OpenAI tokenizer
+
+    # Choose a tokenizer that matches your target model family
+    return tiktoken.encoding_for_model(TOKENIZER_MODEL)  # falls back to cl100k_base
+
 
-# Choose a tokenizer that matches your target model family
-enc = tiktoken.encoding_for_model("gpt-4o-mini")  # falls back to cl100k_base
+@functools.lru_cache(maxsize=None)
+def _sep_tokens() -> int:
+    return len(get_encoder().encode_ordinary("\n\n"))   # cost of a paragraph join
+
+
+def __getattr__(name):
+    # keeps ``chunker.enc`` / ``from chunker import enc`` working, lazily
+    if name == "enc":
+        return get_encoder()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ── 2. Chunker ─────────────────────────────────────────────────────────────
 
-def make_chunks(text: str, max_tokens: int = 900) -> List[str]:
+ENCODE_BATCH = 512            # paragraphs per encode_ordinary_batch call
+ANCHOR_EVERY = 8              # ~1 in 8 paragraphs may start a chunk early …
+ANCHOR_MIN_FILL = 0.75        # … once the current chunk is this full
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+")
+
+
+Span = Tuple[int, int]        # first / last source piece (page), 1-based
+
+
+class _Seg(NamedTuple):
+    """A piece of a paragraph plus its (already computed) token ids."""
+    text: str
+    tokens: List[int]
+    joins: bool               # True → first piece of a paragraph, "\n\n" before it
+    span: Span = (0, 0)
+
+
+class Chunk(NamedTuple):
+    """One chunk with its token count and the source pages it covers."""
+    text: str
+    tokens: int
+    pages: Span
+
+
+def _paragraph_spans(texts: Iterable[str], sep: str = "\n") -> Iterator[Tuple[str, Span]]:
+    """``(paragraph, (first_page, last_page))`` of ``sep.join(texts)``
+    without ever building that string.
+
+    Only the unfinished trailing paragraph is buffered between pieces.
+    """
+    buf: List[str] = []           # pieces of the unfinished trailing paragraph
+    carried, last, start, page = 0, "", 1, 0
+    for page, piece in enumerate(texts, start=1):
+        incoming = piece if page == 1 else sep + piece
+        # split only the new text, plus the tail's last character in case
+        # a "\n\n" straddles the boundary: linear in the document size
+        *done, rest = (last + incoming).split("\n\n")  # 2‑A  Heuristic paragraph split
+        if not done:
+            buf.append(incoming)
+            carried += len(incoming)
+            last = incoming[-1:] or last
+            continue
+        done[0] = "".join(buf)[:carried - len(last)] + done[0]
+        for k, para in enumerate(done):
+            # only the first paragraph can reach back into earlier pages
+            if k == 0:
+                yield para, (start, page if len(para) > carried else max(start, page - 1))
+            else:
+                yield para, (page, page)
+        start = page
+        buf, carried, last = [rest], len(rest), rest[-1:]
+    yield "".join(buf), (start, max(start, page))
+
+
+def _encoded(paragraphs: Iterable[Tuple[str, Span]]
+             ) -> Iterator[Tuple[str, Span, List[int]]]:
+    """``(paragraph, span, tokens)``, encoded ``ENCODE_BATCH`` at a time."""
+    block: List[Tuple[str, Span]] = []
+    for item in paragraphs:
+        block.append(item)
+        if len(block) >= ENCODE_BATCH:
+            yield from _encode_block(block)
+            block = []
+    if block:
+        yield from _encode_block(block)
+
+
+def _encode_block(block: List[Tuple[str, Span]]) -> Iterator[Tuple[str, Span, List[int]]]:
+    t0 = time.perf_counter()
+    tokens = get_encoder().encode_ordinary_batch([p for p, _ in block])
+    metrics.add_time("tokenize", time.perf_counter() - t0)
+    return ((p, s, t) for (p, s), t in zip(block, tokens))
+
+
+def _split_oversized(para: str, tokens: List[int], limit: int,
+                     span: Span = (0, 0)) -> Iterator[_Seg]:
+    """Cut one too-long paragraph into pieces of ≤ ``limit`` tokens.
+
+    Works purely on the paragraph's own token ids: character offsets come
+    from ``decode_with_offsets`` and sentence ends are mapped onto token
+    indices, so nothing is encoded twice.  Pieces end at sentence
+    boundaries where possible, otherwise at the last whitespace-led token
+    that fits, otherwise at a bare token boundary.  Pieces are contiguous
+    slices — concatenated they give back the paragraph.
+    """
+    text, offsets = get_encoder().decode_with_offsets(tokens)
+    n = len(tokens)
+    # token index at which each sentence starts (excluding 0); BPE tokens
+    # carry their leading space, so the cut sits where the whitespace begins
+    cuts = sorted({bisect.bisect_left(offsets, m.start()) for m in _SENTENCE_END.finditer(text)}
+                  - {0, n})
+    start, first = 0, True
+    while start < n:
+        stop = min(start + limit, n)
+        if stop < n:
+            k = bisect.bisect_right(cuts, stop) - 1
+            if k >= 0 and cuts[k] > start:
+                stop = cuts[k]                                  # sentence boundary
+            else:
+                for t in range(stop, start, -1):               # word boundary
+                    if text[offsets[t]:offsets[t] + 1].isspace():
+                        stop = t
+                        break
+        lo = offsets[start]
+        hi = offsets[stop] if stop < n else len(text)
+        yield _Seg(text[lo:hi], tokens[start:stop], first, span)
+        start, first = stop, False
+
+
+def _tail(segs: List[_Seg], k: int) -> List[_Seg]:
+    """The last ``k`` tokens of a chunk, as segments (for overlap)."""
+    out: List[_Seg] = []
+    for seg in reversed(segs):
+        if k <= 0:
+            break
+        if len(seg.tokens) <= k:
+            out.append(seg)
+            k -= len(seg.tokens)
+        else:
+            text, offsets = get_encoder().decode_with_offsets(seg.tokens)
+            cut = len(seg.tokens) - k
+            out.append(_Seg(text[offsets[cut]:], seg.tokens[cut:], False, seg.span))
+            break
+    out.reverse()
+    if out:                       # overlap always opens the chunk, no separator
+        out[0] = out[0]._replace(joins=False)
+    return out
+
+
+def _cost(seg: _Seg, first_in_chunk: bool) -> int:
+    return len(seg.tokens) + (_sep_tokens() if seg.joins and not first_in_chunk else 0)
+
+
+def _tally(segs: List[_Seg]) -> int:
+    return sum(_cost(s, i == 0) for i, s in enumerate(segs))
+
+
+def iter_chunks(texts: Iterable[str], max_tokens: int = 900,
+                overlap: int = 0) -> Iterator[str]:
+    """Streaming form of :func:`make_chunks`.
+
+    ``texts`` is any iterable of text pieces (e.g. ``ingest.iter_pages``),
+    treated as if joined with newlines; chunks are yielded as soon as they
+    are full.  One linear pass: each paragraph is encoded once (in
+    batches) and every chunk string is joined exactly once.
+    """
+    return (c.text for c in iter_chunk_records(texts, max_tokens, overlap))
+
+
+def iter_chunk_records(texts: Iterable[str], max_tokens: int = 900,
+                       overlap: int = 0) -> Iterator[Chunk]:
+    """Like :func:`iter_chunks`, but yields :class:`Chunk` records carrying
+    the token count and the 1-based span of ``texts`` pieces (pages) each
+    chunk was cut from."""
+    overlap = max(0, min(overlap, max_tokens // 2))
+    buffer: List[_Seg] = []
+    tally = 0
+    fresh = False             # buffer holds something beyond carried overlap
+
+    def flush() -> Chunk:
+        text = "".join(("\n\n" if s.joins and i else "") + s.text
+                       for i, s in enumerate(buffer))
+        return Chunk(text, tally, (buffer[0].span[0], buffer[-1].span[1]))
+
+    for para, span, tokens in _encoded(_paragraph_spans(texts)):
+        if len(tokens) > max_tokens:
+            segs: Iterable[_Seg] = _split_oversized(para, tokens, max_tokens, span)
+        else:
+            segs = (_Seg(para, tokens, True, span),)
+
+        for seg in segs:
+            # Would this piece overflow the current buffer?  Or is it an
+            # anchor paragraph (chosen by content hash) arriving once the
+            # chunk is mostly full?  Anchors make boundaries depend on local
+            # text, so an edit early in a document doesn't shift every later
+            # chunk — unchanged chunks keep their hash (see ``manifest``).
+            overflow = buffer and tally + _cost(seg, False) > max_tokens
+            anchor = (fresh and seg.joins and tally >= ANCHOR_MIN_FILL * max_tokens
+                      and zlib.crc32(seg.text.encode("utf-8")) % ANCHOR_EVERY == 0)
+            if overflow or anchor:
+                if fresh:
+                    yield flush()
+                    buffer = _tail(buffer, overlap) if overlap else []
+                    fresh = False
+                # shrink the carried overlap until the new piece fits
+                budget = max_tokens - _cost(seg, False)
+                k, tally = sum(len(s.tokens) for s in buffer), _tally(buffer)
+                while buffer and tally > budget:
+                    k -= tally - budget
+                    buffer = _tail(buffer, k)
+                    tally = _tally(buffer)
+
+            tally += _cost(seg, not buffer)
+            buffer.append(seg)
+            fresh = True
+
+    if buffer and fresh:
+        yield flush()
+
+
+def make_chunks(text: str, max_tokens: int = 900, overlap: int = 0) -> List[str]:
     """Greedy, paragraph‑aware splitter.
 
     1. Keeps whole paragraphs together (splits on blank lines).
-    2. Ensures no chunk exceeds *approximately* ``max_tokens``.
-    3. Returns a list of clean text strings ready for an LLM prompt or
+    2. Guarantees no chunk exceeds ``max_tokens``: paragraphs that are too
+       long on their own are cut at sentence (or, failing that, token)
+       boundaries.
+    3. With ``overlap`` > 0 each chunk starts with the last ``overlap``
+       tokens of the previous one (capped at ``max_tokens // 2``).
+    4. Returns a list of clean text strings ready for an LLM prompt or
        embedding call.
     """
-    paragraphs = text.split("\n\n")  # 2‑A  Heuristic paragraph split
+    return list(iter_chunks([text], max_tokens, overlap))
 
-    chunks, buffer, token_tally = [], [], 0
-    for para in paragraphs:
-        ptokens = len(enc.encode(para))
+# ── 3. Optional: compute embeddings for semantic search ────────────────────
 
-        # Would this paragraph overflow the current buffer?
-        if token_tally + ptokens > max_tokens and buffer:
-            chunks.append("\n\n".join(buffer))
-            buffer, token_tally = [], 0
+EMBED_BATCH = 128              # inputs per embeddings request
+EMBED_BATCH_CHARS = 600_000    # ≈ 150k tokens, well under the per-request cap
 
-        buffer.append(para)
-        token_tally += ptokens
 
-    if buffer:
-        chunks.append("\n\n".join(buffer))
+def _openai_embed(texts: List[str], model: str):
+    """Default ``embed_fn``: one batched request, vectors decoded from base64.
 
-    return chunks
+    The shared client is created lazily **inside** this function, so
+    importing ``chunker`` never triggers a network call or requires the key.
+    """
+    import base64
+    import numpy as np
+    from flashcard_gen import get_client  # Local import → no API call at import time
 
-# ── 3. Optional: compute embeddings for semantic search ────────────────────
+    t0 = time.perf_counter()
+    res = get_client().embeddings.create(model=model, input=texts,
+                                         encoding_format="base64")
+    metrics.api_call("embed", model, time.perf_counter() - t0, getattr(res, "usage", None))
+    rows = sorted(res.data, key=lambda d: d.index)
+    return np.stack([np.frombuffer(base64.b64decode(d.embedding), dtype=np.float32)
+                     for d in rows])
 
-def embed_chunks(chunks: List[str], model: str = "text-embedding-3-large") -> List[List[float]]:
-    """Convert each chunk to an embedding vector using OpenAI.
 
-    A *lazy* OpenAI client is created **inside** this function, so importing
-    ``chunker`` never triggers a network call or requires the API key.
+def _batches(texts: List[str]) -> Iterator[List[int]]:
+    """Index groups of ≤ ``EMBED_BATCH`` inputs / ``EMBED_BATCH_CHARS`` chars."""
+    batch, size = [], 0
+    for i, t in enumerate(texts):
+        if batch and (len(batch) >= EMBED_BATCH or size + len(t) > EMBED_BATCH_CHARS):
+            yield batch
+            batch, size = [], 0
+        batch.append(i)
+        size += len(t)
+    if batch:
+        yield batch
+
+
+def embed_chunks(chunks: List[str], model: str = "text-embedding-3-large", *,
+                 store=None, embed_fn=None, concurrency: int = 4, limiter=None):
+    """Convert each chunk to an embedding vector; returns a float32
+    ``(len(chunks), dim)`` NumPy array in chunk order.
+
+    * Many chunks go into each request (``EMBED_BATCH``) and up to
+      ``concurrency`` requests run at once, sharing ``limiter`` if given.
+    * With a ``vector_store.VectorStore`` only chunks whose hash is not
+      stored yet are sent; new vectors are added to the store.
+    * ``embed_fn(texts, model) -> array`` replaces the OpenAI call (e.g.
+      ``fake_openai.fake_embed`` for deterministic offline runs).
     """
-    from openai import OpenAI  # Local import → no API call at import time
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from ratelimit import with_backoff
+
+    embed_fn = embed_fn or _openai_embed
+    keys = [chunk_hash(c) for c in chunks]
+
+    # unique texts the store doesn't know yet
+    todo: dict = {}
+    for k, c in zip(keys, chunks):
+        if (store is None or k not in store) and k not in todo:
+            todo[k] = c
+    todo_keys, todo_texts = list(todo), list(todo.values())
+
+    def _run(idx: List[int]):
+        batch = [todo_texts[i] for i in idx]
+        if limiter is not None:
+            limiter.acquire(sum(len(t) for t in batch) // 4)
+        return idx, np.asarray(with_backoff(lambda: embed_fn(batch, model), limiter=limiter),
+                               dtype=np.float32)
+
+    fresh = None
+    if todo_texts:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for idx, vecs in pool.map(metrics.carry_log(_run), _batches(todo_texts)):
+                if fresh is None:
+                    fresh = np.empty((len(todo_texts), vecs.shape[1]), dtype=np.float32)
+                fresh[idx] = vecs
+        metrics.say(f"[chunker] Embedded {len(todo_texts)} new chunk(s)"
+                    + (f", {len(chunks) - len(todo_texts)} from store" if store is not None else ""))
+        if store is not None:
+            store.add(todo_keys, fresh)
 
-    client = OpenAI()  # Reads ``OPENAI_API_KEY`` from the environment
+    if store is not None:
+        return store.get(keys)
+    row = {k: i for i, k in enumerate(todo_keys)}
+    if fresh is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return fresh[[row[k] for k in keys]]
 
-    vectors: List[List[float]] = []
-    for text in chunks:
-        res = client.embeddings.create(model=model, input=text)
-        vectors.append(res.data[0].embedding)
+# ── 4. Stable chunk identity ────────────────────────────────────────────────
 
-    return vectors
+def chunk_hash(text: str) -> str:
+    """SHA-256 hex digest of a chunk's text (journal / manifest key)."""
+    import hashlib
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,167 @@
+"""
+dedup.py
+--------
+Near-duplicate card detection for generated decks.  Overlapping testimony
+makes ``build_deck`` ask the same question several times; this groups such
+cards and keeps one per group.
+
+Candidates come from locality-sensitive hashing, never from all-pairs
+comparison, so it scales to tens of thousands of cards:
+
+* ``minhash`` (default, no API calls) – MinHash signatures over word
+  1-/2-gram shingles of front + back, banded LSH, then a Jaccard check.
+* ``embedding`` – unit vectors (e.g. from ``chunker.embed_chunks``),
+  random-hyperplane signatures, banded LSH, then a cosine check.
+
+Typical usage
+-------------
+>>> kept, report = dedup_cards(cards, threshold=0.6)
+>>> len(cards) - len(kept), report[0]["kept"], report[0]["merged"]
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import re, zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+NUM_PERM = 64                 # MinHash signature length
+BANDS = 16                    # → 4 rows per band, ~50 % candidate threshold
+SIMHASH_BITS = 384            # hyperplane bits for the embedding method …
+SIMHASH_BANDS = 24            # … 16 bits per band: cos ≥ 0.9 → ~88 % recall
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+# ── 2. Signatures ──────────────────────────────────────────────────────────
+
+def _card_text(card: dict) -> str:
+    return f"{card.get('front', '')} {card.get('back', '')}"
+
+
+def _shingles(text: str) -> np.ndarray:
+    words = _WORD.findall(text.lower())
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    return np.fromiter((zlib.crc32(g.encode()) & _PRIME for g in set(grams)),
+                       dtype=np.int64)
+
+
+def minhash_signatures(texts: List[str], num_perm: int = NUM_PERM,
+                       seed: int = 1) -> np.ndarray:
+    """``(len(texts), num_perm)`` MinHash matrix, computed in blocks."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.int64)
+    b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.int64)
+
+    sig = np.full((len(texts), num_perm), _PRIME, dtype=np.int64)
+    shingles = [_shingles(t) for t in texts]
+    lens = np.fromiter((len(s) for s in shingles), dtype=np.int64, count=len(shingles))
+    i = 0
+    while i < len(shingles):
+        # a block of cards with ≤ ~200k shingles keeps the hash matrix small
+        j, width = i, 0
+        while j < len(shingles) and (j == i or width + lens[j] <= 200_000):
+            width += lens[j]
+            j += 1
+        nonempty = lens[i:j] > 0
+        if nonempty.any():
+            flat = np.concatenate([s for s in shingles[i:j] if len(s)])
+            hashed = (a * flat[None, :] + b) % _PRIME              # (num_perm, width)
+            offsets = np.concatenate(([0], np.cumsum(lens[i:j][nonempty])[:-1]))
+            sig[np.arange(i, j)[nonempty]] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        i = j
+    return sig
+
+
+def hyperplane_signatures(vectors: np.ndarray, bits: int = SIMHASH_BITS,
+                          seed: int = 1) -> np.ndarray:
+    """Sign bits of random projections (SimHash) of unit vectors."""
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((vectors.shape[1], bits)).astype(np.float32)
+    return (vectors @ planes > 0).astype(np.int64)
+
+# ── 3. LSH candidate pairs + union-find ────────────────────────────────────
+
+def _candidate_pairs(sig: np.ndarray, bands: int = BANDS) -> set:
+    """Pairs ``(i, j)`` that share at least one identical band."""
+    rows = sig.shape[1] // bands
+    pairs: set = set()
+    for band in range(bands):
+        part = np.ascontiguousarray(sig[:, band * rows:(band + 1) * rows])
+        keys = part.view(np.dtype((np.void, part.dtype.itemsize * rows))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for g in np.flatnonzero(counts > 1):
+            members = order[starts[g]:starts[g] + min(counts[g], 200)]  # cap degenerate buckets
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((int(members[x]), int(members[y])))
+    return pairs
+
+
+def _clusters(n: int, edges: List[Tuple[int, int]]) -> Dict[int, List[int]]:
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in edges:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return {root: members for root, members in groups.items() if len(members) > 1}
+
+# ── 4. Public API ──────────────────────────────────────────────────────────
+
+def _quality(card: dict) -> tuple:
+    """Higher is better: usable for MC, has an excerpt, fuller answer."""
+    return (len(card.get("distractors") or []) >= 2,
+            bool(card.get("excerpt")),
+            min(len(card.get("back", "")), 300))
+
+
+def dedup_cards(cards: List[dict], threshold: float = 0.6, *,
+                vectors: Optional[np.ndarray] = None) -> Tuple[List[dict], List[dict]]:
+    """Drop near-duplicate cards, keeping the best card of each cluster.
+
+    ``threshold`` is the minimum Jaccard similarity (MinHash) or, when
+    ``vectors`` (unit-normalised, one row per card) are given, the minimum
+    cosine similarity.  Returns ``(kept_cards, report)`` — kept cards stay in
+    their original order; each report entry names the kept card and the
+    fronts merged into it.
+    """
+    if len(cards) < 2:
+        return list(cards), []
+
+    if vectors is None:
+        sig = minhash_signatures([_card_text(c) for c in cards])
+        bands = BANDS
+        similar = lambda i, j: float(np.mean(sig[i] == sig[j]))
+    else:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        sig = hyperplane_signatures(vectors)
+        bands = SIMHASH_BANDS
+        similar = lambda i, j: float(vectors[i] @ vectors[j])
+
+    edges = [(i, j) for i, j in _candidate_pairs(sig, bands) if similar(i, j) >= threshold]
+    drop, report = set(), []
+    for members in _clusters(len(cards), edges).values():
+        best = max(members, key=lambda k: (_quality(cards[k]), -k))
+        merged = [k for k in members if k != best]
+        drop.update(merged)
+        report.append({"kept": cards[best].get("front", ""),
+                       "merged": [cards[k].get("front", "") for k in merged]})
+
+    kept = [c for i, c in enumerate(cards) if i not in drop]
+    metrics.say(f"[dedup] {len(cards)} card(s) → {len(kept)} "
+                f"({len(drop)} near-duplicate(s) merged into {len(report)} cluster(s))")
+    return kept, report
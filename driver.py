@@ -1,16 +1,48 @@
 # driver.py ---------------------------------------------------------------
-import os
 from pathlib import Path
-from decouple import config
-from ingest import extract_text
-from chunker import make_chunks
+from ingest import iter_pages
+from chunker import iter_chunks, iter_chunk_records
+import metrics
 
-# ensure the key is in the environment before any sub-imports need it
-os.environ.setdefault("OPENAI_API_KEY", config("OPENAI_API_KEY"))
+# the OpenAI key is loaded by flashcard_gen.get_client() when first needed —
+# extraction and chunking never talk to the API
 
-def run_extraction(path: Path, max_tokens: int = 900):
-    """Return a list[str] of GPT-sized chunks from a document."""
-    raw = extract_text(path)
-    chunks = make_chunks(raw, max_tokens=max_tokens)
+def run_extraction(path: Path, max_tokens: int = 900, workers=None, ocr_dpi=300,
+                   overlap: int = 0, store_path=None):
+    """Return a list[str] of GPT-sized chunks from a document.
+
+    Pages are streamed from ``ingest.iter_pages`` straight into the chunker,
+    so chunking overlaps extraction and the full text is never held twice.
+
+    With ``store_path`` the chunks are kept in a ``chunk_store.ChunkStore``;
+    if the source file and chunking parameters are unchanged since it was
+    written, extraction and chunking are skipped entirely.
+    """
+    with metrics.stage("ingest"):        # extract + tokenize + chunk (they overlap)
+        chunks = _extract(path, max_tokens, workers, ocr_dpi, overlap, store_path)
+    metrics.count("chunks", len(chunks))
+    return chunks
+
+
+def _extract(path, max_tokens, workers, ocr_dpi, overlap, store_path):
+    if store_path is not None:
+        from chunk_store import ChunkStore, chunk_fingerprint
+        fp = chunk_fingerprint(path, max_tokens=max_tokens, overlap=overlap, ocr_dpi=ocr_dpi)
+        store = ChunkStore(store_path)
+        try:
+            if store.fingerprint == fp:
+                chunks = list(store)
+                metrics.count("chunk_store_reused")
+                print(f"[driver] Reusing {len(chunks)} chunk(s) from {Path(store_path).name}")
+                return chunks
+            pages = iter_pages(path, workers=workers, ocr_dpi=ocr_dpi)
+            store.write(fp, iter_chunk_records(pages, max_tokens=max_tokens, overlap=overlap))
+            chunks = list(store)
+            print(f"[driver] Chunks stored → {Path(store_path).name}")
+        finally:
+            store.close()
+    else:
+        pages = iter_pages(path, workers=workers, ocr_dpi=ocr_dpi)
+        chunks = list(iter_chunks(pages, max_tokens=max_tokens, overlap=overlap))
     print(f"[driver] {len(chunks)} chunks (≈ {sum(len(c) for c in chunks)//1000}k chars)")
-    return chunks
\ No newline at end of file
+    return chunks
@@ -0,0 +1,391 @@
+# fake_openai.py — local stand-in for the OpenAI REST API (dev / load tests)
+"""
+Tiny stdlib HTTP server that answers ``POST /v1/chat/completions`` with
+plausible flash-card JSON built from the user message.  It can add latency
+and inject HTTP 429s so the concurrent generator and rate limiter can be
+exercised without spending tokens, and ``--rate-bad`` spoils a share of
+replies (cut off mid-JSON, or one card with a bad excerpt / distractors)
+to exercise card validation and repair; Game 1 refurbish requests get one
+"(improved)" card back per tossed card.  It also mimics the file-upload and
+Batch endpoints (``/v1/files``, ``/v1/batches``) used by ``batch_gen``; a
+batch "runs" for ``--batch-delay`` seconds before its output file appears,
+and ``--rate-batch-fail`` answers a share of its requests with an error.
+``POST /v1/embeddings`` returns deterministic hashed bag-of-words vectors
+(``fake_embed``), which can also be passed straight to
+``chunker.embed_chunks(embed_fn=...)`` without a server.  ``FakeClient``
+gives the same answers (batches included) in-process, for ``flashcard_gen.set_client`` /
+``prompt_cards.set_client`` (see ``bench/throughput.py``).
+
+    python fake_openai.py --port 8765 --latency 0.8 --jitter 0.4 --rate-429 0.1
+
+then point the real client at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake \\
+        python pipeline.py transcript.txt -n 0 --concurrency 16
+"""
+from __future__ import annotations
+import argparse, base64, contextlib, hashlib, json, random, re, threading, time, uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+SETTINGS = {"latency": 0.5, "jitter": 0.0, "rate_429": 0.0, "batch_delay": 5.0,
+            "rate_bad": 0.0, "rate_batch_fail": 0.0}
+FILES: dict[str, dict] = {}          # file id  → {"meta": {...}, "data": bytes}
+BATCHES: dict[str, dict] = {}        # batch id → Batch object (dict)
+STATS = {"requests": 0, "throttled": 0, "in_flight": 0, "max_in_flight": 0}
+_stats_lock = threading.Lock()
+
+
+# ── Fake card synthesis ───────────────────────────────────────────────────
+def fake_cards(text: str, max_cards: int) -> list[dict]:
+    """Deterministic cards: one per sentence of the chunk, up to ``max_cards``."""
+    sentences = [s.strip() for s in re.split(r"(?<=[.?!])\s+", text) if len(s.split()) >= 4]
+    cards = []
+    for s in sentences[:max_cards]:
+        words = s.split()
+        cards.append({
+            "excerpt": " ".join(words[:100]),
+            "front": "What does the record say about: " + " ".join(words[:8]) + "?",
+            "back": s,
+            "distractors": ["Nothing relevant was stated", "The opposite was stated"],
+            "context": "other",
+        })
+    return cards
+
+
+_PACKED = re.compile(r'<chunk id="(\d+)">\n(.*?)\n</chunk>', re.S)
+
+
+def _max_cards(system_msg: str) -> int:
+    m = re.search(r"Limit to \**(\d+)", system_msg)
+    return int(m.group(1)) if m else 3
+
+
+def _spoil(cards: list[dict]) -> tuple[list[dict], str]:
+    """One of the reply faults real models produce (for ``--rate-bad``)."""
+    fault = random.choice(("truncate", "distractors", "excerpt"))
+    if fault == "truncate":
+        return cards, "length"
+    card = dict(cards[0])
+    if fault == "distractors":
+        card["distractors"] = [card["back"]]
+    else:
+        card["excerpt"] = "An invented quotation that never appears in the record."
+    return [card] + cards[1:], "stop"
+
+
+def _tossed(user: str):
+    """The ``tossed`` cards of a game1 refurbish request, else ``None``."""
+    if not user.startswith("{"):
+        return None
+    try:
+        data = json.loads(user)
+    except json.JSONDecodeError:
+        return None
+    return data.get("tossed") if isinstance(data, dict) else None
+
+
+def _improved(card: dict) -> dict:
+    distractors = (card.get("distractors") or []) + ["Not stated in the record", "Someone else"]
+    return {"id": card.get("id"), "excerpt": card.get("excerpt", ""),
+            "front": card.get("front", "") + " (improved)", "back": card.get("back", ""),
+            "distractors": distractors[:2], "context": "other"}
+
+
+def chat_completion(body: dict, rate_bad: float = None) -> dict:
+    rate_bad = SETTINGS["rate_bad"] if rate_bad is None else rate_bad
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    packed = _PACKED.findall(user)
+    tossed = _tossed(user)
+    if tossed is not None:           # game1_cli.gpt_refurbish: one better card each
+        cards = [_improved(c) for c in tossed if isinstance(c, dict)]
+    elif packed:                       # flashcard_gen packing: tag cards with their chunk
+        cards = [dict(c, chunk=int(k)) for k, text in packed
+                 for c in fake_cards(text, _max_cards(system))]
+    else:
+        cards = fake_cards(user, _max_cards(system))
+    finish = "stop"
+    if cards and random.random() < rate_bad:
+        cards, finish = _spoil(cards)
+    content = json.dumps({"cards": cards})
+    if finish == "length":
+        content = content[: int(len(content) * 0.8)]      # cut off mid-card
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    # like the real prompt cache: a shared prefix of ≥ 1024 tokens, in 128-token steps
+    prefix = len(system) // 4
+    cached_tokens = prefix // 128 * 128 if prefix >= 1024 else 0
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "finish_reason": finish,
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens,
+                  "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+    }
+
+
+# ── Fake embeddings ───────────────────────────────────────────────────────
+FAKE_EMBED_DIM = 256
+
+
+def fake_embed(texts: list[str], model: str = "fake", dim: int = FAKE_EMBED_DIM):
+    """Deterministic unit vectors: hashed word counts, so texts sharing
+    vocabulary get high cosine similarity.  Returns float32 ``(n, dim)``."""
+    import numpy as np
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in re.findall(r"\w+", t.lower()):
+            h = int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little")
+            out[i, h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.where(norms == 0, 1, norms)
+
+
+def embeddings(body: dict) -> dict:
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    vecs = fake_embed(texts, body.get("model", "fake"), int(body.get("dimensions") or FAKE_EMBED_DIM))
+    b64 = body.get("encoding_format") == "base64"
+    data = [{"object": "embedding", "index": i,
+             "embedding": base64.b64encode(v.tobytes()).decode() if b64 else v.tolist()}
+            for i, v in enumerate(vecs)]
+    tokens = sum(len(t) for t in texts) // 4
+    return {"object": "list", "data": data, "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+# ── In-process client (no HTTP) ───────────────────────────────────────────
+def _obj(value):
+    # dicts → attribute access, like the SDK's response models
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _obj(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_obj(v) for v in value]
+    return value
+
+
+class FakeClient:
+    """Drop-in for ``openai.OpenAI()`` (``chat.completions.create``,
+    ``embeddings.create`` and the ``files`` / ``batches`` calls of
+    ``batch_gen``) that answers in-process with the server's fake data,
+    latency and faults — no sockets, so benchmarks measure our code.
+    Keyword ``settings`` override ``SETTINGS`` for this client only.
+
+    >>> flashcard_gen.set_client(FakeClient(latency=0.2, rate_429=0.05))
+    """
+
+    def __init__(self, **settings):
+        self.settings = {**SETTINGS, **settings}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.files = SimpleNamespace(
+            create=self._upload,
+            with_streaming_response=SimpleNamespace(content=self._content))
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _delay_or_fail(self) -> None:
+        s = self.settings
+        time.sleep(max(0.0, s["latency"] + random.uniform(-1, 1) * s["jitter"]))
+        if random.random() < s["rate_429"]:
+            import httpx, openai
+            response = httpx.Response(429, headers={"retry-after": str(s["latency"])},
+                                      request=httpx.Request("POST", "http://fake/v1"))
+            raise openai.RateLimitError("Rate limit reached (fake)", response=response, body=None)
+
+    def _chat(self, **body):
+        self._delay_or_fail()
+        return _obj(chat_completion(body, rate_bad=self.settings["rate_bad"]))
+
+    def _embed(self, **body):
+        self._delay_or_fail()
+        return _obj(embeddings(body))
+
+    def _upload(self, file, purpose: str):
+        return _obj(_store_file(file.read(), getattr(file, "name", "upload"), purpose))
+
+    def _content(self, file_id: str):
+        lines = FILES[file_id]["data"].decode("utf-8").splitlines()
+        return contextlib.nullcontext(SimpleNamespace(iter_lines=lambda: iter(lines)))
+
+    def _create_batch(self, **body):
+        return _obj(create_batch(body))
+
+    def _retrieve_batch(self, batch_id: str):
+        return _obj(batch_status(batch_id, self.settings))
+
+
+# ── Files & Batch API ─────────────────────────────────────────────────────
+def _store_file(data: bytes, filename: str, purpose: str) -> dict:
+    fid = "file-" + uuid.uuid4().hex[:24]
+    meta = {"id": fid, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed"}
+    FILES[fid] = {"meta": meta, "data": data}
+    return meta
+
+
+def _run_batch(batch: dict, settings: dict) -> None:
+    """Answer every request line of the input file and attach the output file."""
+    out, failed = [], 0
+    for line in FILES[batch["input_file_id"]]["data"].decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        if random.random() < settings["rate_batch_fail"]:
+            failed += 1
+            response = {"status_code": 500, "request_id": uuid.uuid4().hex,
+                        "body": {"error": {"message": "The server had an error (fake)",
+                                           "type": "server_error"}}}
+        else:
+            response = {"status_code": 200, "request_id": uuid.uuid4().hex,
+                        "body": chat_completion(req["body"], rate_bad=settings["rate_bad"])}
+        out.append(json.dumps({"id": "batch_req_" + uuid.uuid4().hex[:12],
+                               "custom_id": req["custom_id"], "response": response,
+                               "error": None}))
+    n = len(out)
+    batch.update(status="completed", completed_at=int(time.time()),
+                 output_file_id=_store_file(("\n".join(out) + "\n").encode(),
+                                            "batch_output.jsonl", "batch_output")["id"],
+                 request_counts={"total": n, "completed": n - failed, "failed": failed})
+
+
+def batch_status(bid: str, settings: dict = None) -> dict | None:
+    settings = SETTINGS if settings is None else settings
+    batch = BATCHES.get(bid)
+    if batch and batch["status"] == "in_progress" \
+            and time.time() - batch["created_at"] >= settings["batch_delay"]:
+        _run_batch(batch, settings)
+    return batch
+
+
+def create_batch(body: dict) -> dict:
+    total = sum(1 for l in FILES[body["input_file_id"]]["data"].splitlines() if l.strip())
+    batch = {"id": "batch_" + uuid.uuid4().hex[:24], "object": "batch",
+             "endpoint": body["endpoint"], "input_file_id": body["input_file_id"],
+             "completion_window": body.get("completion_window", "24h"),
+             "status": "in_progress", "created_at": int(time.time()),
+             "output_file_id": None, "error_file_id": None, "errors": None,
+             "request_counts": {"total": total, "completed": 0, "failed": 0}}
+    BATCHES[batch["id"]] = batch
+    return batch
+
+
+# ── HTTP plumbing ─────────────────────────────────────────────────────────
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):          # keep the console quiet
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _raw(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _upload(self, raw: bytes) -> dict:
+        """Parse the multipart ``file`` + ``purpose`` form of ``POST /v1/files``."""
+        head = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        msg = BytesParser(policy=HTTP).parsebytes(head + raw)
+        fields = {part.get_param("name", header="content-disposition"): part
+                  for part in msg.iter_parts()}
+        part = fields["file"]
+        return _store_file(part.get_payload(decode=True), part.get_filename() or "upload",
+                           fields["purpose"].get_content().strip())
+
+    def do_POST(self):
+        raw = self._raw()
+        if self.path.endswith("/files"):
+            return self._send(200, self._upload(raw))
+        if self.path.endswith("/batches"):
+            return self._send(200, create_batch(json.loads(raw)))
+        is_embed = self.path.endswith("/embeddings")
+        if not (is_embed or self.path.endswith("/chat/completions")):
+            return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+        body = json.loads(raw or b"{}")
+
+        with _stats_lock:
+            STATS["requests"] += 1
+            STATS["in_flight"] += 1
+            STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+        try:
+            time.sleep(max(0.0, SETTINGS["latency"] + random.uniform(-1, 1) * SETTINGS["jitter"]))
+            if random.random() < SETTINGS["rate_429"]:
+                with _stats_lock:
+                    STATS["throttled"] += 1
+                return self._send(429, {"error": {"message": "Rate limit reached (fake)",
+                                                  "type": "requests", "code": "rate_limit_exceeded"}},
+                                  {"retry-after": "1"})
+            self._send(200, embeddings(body) if is_embed else chat_completion(body))
+        finally:
+            with _stats_lock:
+                STATS["in_flight"] -= 1
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/stats"):
+            with _stats_lock:
+                return self._send(200, dict(STATS))
+        m = re.search(r"/batches/([\w-]+)$", path)
+        if m and batch_status(m.group(1)):
+            return self._send(200, BATCHES[m.group(1)])
+        m = re.search(r"/files/([\w-]+)/content$", path)
+        if m and m.group(1) in FILES:
+            data = FILES[m.group(1)]["data"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            return self.wfile.write(data)
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+
+def serve(port: int = 8765, **settings) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread and return it (``.shutdown()`` to stop)."""
+    SETTINGS.update(settings)
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Fake OpenAI API for local testing")
+    cli.add_argument("--port", type=int, default=8765)
+    cli.add_argument("--latency", type=float, default=0.5,
+                     help="Seconds of delay per request (default 0.5)")
+    cli.add_argument("--jitter", type=float, default=0.0,
+                     help="± random seconds added to latency")
+    cli.add_argument("--rate-429", type=float, default=0.0,
+                     help="Fraction of requests answered with HTTP 429")
+    cli.add_argument("--batch-delay", type=float, default=5.0,
+                     help="Seconds a submitted batch stays in_progress (default 5)")
+    cli.add_argument("--rate-bad", type=float, default=0.0,
+                     help="Fraction of replies truncated or with one malformed card")
+    cli.add_argument("--rate-batch-fail", type=float, default=0.0,
+                     help="Fraction of batch requests answered with an error")
+    args = cli.parse_args()
+    SETTINGS.update(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                    batch_delay=args.batch_delay, rate_bad=args.rate_bad,
+                    rate_batch_fail=args.rate_batch_fail)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"[fake_openai] listening on http://127.0.0.1:{args.port}/v1  "
+          f"(latency {args.latency}s ± {args.jitter}s, 429 rate {args.rate_429:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
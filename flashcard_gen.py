@@ -1,15 +1,58 @@
 # flashcard_gen.py --------------------------------------------------------
-import os, json, random, pathlib, sys
-from typing import List
-from decouple import config
-from openai import OpenAI
-import genanki
+import os, json, pathlib, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
+from cache import DiskCache, make_key
+from chunker import get_encoder, chunk_hash
+from journal import CardJournal
+from manifest import DeckManifest, assign_ids, deck_id
+from ratelimit import RateLimiter, with_backoff
+import metrics
 
-os.environ.setdefault("OPENAI_API_KEY", config("OPENAI_API_KEY"))
-client = OpenAI()                               # picks up key from env
+# openai / genanki / decouple are imported on first use: importing this
+# module (e.g. for write_outputs or quick-play) stays cheap and offline-safe
+_client = None
+_client_lock = threading.Lock()
 
-def _cards_from_chunk(chunk: str, max_cards: int = 3):
-    SYSTEM_PROMPT = """
+
+def get_client():
+    """Shared OpenAI client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from decouple import config
+                from openai import OpenAI
+                os.environ.setdefault("OPENAI_API_KEY", config("OPENAI_API_KEY"))
+                # picks up key (and OPENAI_BASE_URL, e.g. fake_openai.py) from env;
+                # 429 / transient retries are handled by ratelimit.with_backoff instead
+                _client = OpenAI(max_retries=0)
+    return _client
+
+
+def set_client(client) -> None:
+    """Use ``client`` for every API call instead of a real ``OpenAI()`` —
+    e.g. ``fake_openai.FakeClient()`` for offline runs and benchmarks.
+    ``None`` goes back to building the real one on next use."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def __getattr__(name):
+    # ``flashcard_gen.client`` still works, it is just built lazily now
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 900          # completion budget per chunk request
+CACHE_PATH = pathlib.Path(".flashcard_cache") / "cards.sqlite"
+CACHE_MAX_BYTES = 256 << 20
+DEDUP_EMBED_MODEL = "text-embedding-3-small"
+
+SYSTEM_PROMPT = """
 You are an expert flash‑card author and lawyer preparing study material
 for a fellow lawyer who must review the main points of the input document.
 
@@ -47,74 +90,549 @@ Return JSON:
 
 Limit to {max_cards} cards.
 """
-    # --- build the system message ---
-    system_msg = SYSTEM_PROMPT.format(max_cards=max_cards)
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+def _estimate_tokens(request: dict) -> int:
+    """Prompt + completion budget one request charges against the TPM limit."""
+    enc = get_encoder()
+    return (sum(len(enc.encode_ordinary(m["content"])) for m in request["messages"])
+            + request.get("max_tokens", MAX_TOKENS))
+
+
+def _cache_key(chunk: str, max_cards: int) -> str:
+    # SCHEMA_VERSION: answers cached under older validation rules are not reused
+    from card_schema import SCHEMA_VERSION
+    return make_key(chunk, MODEL, SYSTEM_PROMPT, max_cards, MAX_TOKENS, SCHEMA_VERSION)
+
+
+def _cacheable(cards: List[dict], stats: dict) -> bool:
+    """An empty result is only final if the model really wrote nothing
+    usable: not after a broken reply or cards that failed validation."""
+    return bool(cards) or not (stats["salvaged"] or stats["invalid"])
+
+
+def _chat_request(chunk: str, max_cards: int) -> dict:
+    """Keyword arguments for ``chat.completions.create`` (also the batch body)."""
+    return dict(
+        model=MODEL,
         messages=[
-            {"role": "system", "content": system_msg},
+            {"role": "system", "content": SYSTEM_PROMPT.format(max_cards=max_cards)},
             {"role": "user",   "content": chunk},
         ],
         response_format={"type": "json_object"},
-        max_tokens=900,
+        max_tokens=MAX_TOKENS,
     )
 
-    # ---------- safe JSON parse ----------
-    try:
-        cards = json.loads(resp.choices[0].message.content)["cards"]
-    except Exception as e:
-        print("[flashcard_gen] ⚠️  GPT returned malformed JSON:", e)
-        cards = []
 
-    # guarantee it is a list of dicts
-    cards = cards[:max_cards] if isinstance(cards, list) else []
+REPAIR_MAX_TOKENS = 350      # completion budget per card in a repair call
+REPAIR_NOTE = """Some flash cards written from the chunk below failed validation.
+Return corrected versions of these cards (same questions where possible),
+fixing every listed problem: "excerpt" must be copied from the chunk and
+"distractors" must be two plausible wrong answers, different from "back".
+{extra}
+{cards}"""
+
+
+def _accept_cards(content: str, chunk: str, max_cards: int) -> Tuple[List[dict], list, int, dict]:
+    """Validated cards from a model reply.
+
+    Returns ``(valid, to_fix, extra, stats)``: ``to_fix`` are
+    ``(card, problems)`` pairs worth one repair call, ``extra`` how many
+    cards were lost to a broken (e.g. truncated) reply.
+    """
+    from card_schema import extract_cards
+    raw, broken = extract_cards(content)
+    if broken:
+        metrics.say(f"[flashcard_gen] ⚠️  GPT returned malformed JSON — salvaged {len(raw)} card(s)")
+    return _accept_raw(raw, broken, chunk, max_cards)
+
+
+def _accept_raw(raw: list, broken: bool, chunk: str, max_cards: int):
+    from card_schema import validate
+    valid, invalid = validate(raw, chunk)
+    valid = valid[:max_cards]
+    to_fix = invalid[:max_cards - len(valid)]
+    extra = max_cards - len(valid) - len(to_fix) if broken else 0
+    stats = {"returned": len(raw), "valid": len(valid), "invalid": len(invalid),
+             "salvaged": broken, "repaired": 0, "repair_call": False}
+    return valid, to_fix, extra, stats
+
+
+def _repair_request(chunk: str, to_fix: list, extra: int) -> dict:
+    n = len(to_fix) + extra
+    cards = json.dumps([dict(c, problems=p) for c, p in to_fix], ensure_ascii=False, indent=1)
+    extra_line = f"Also write {extra} new card(s) from the chunk." if extra else ""
+    return dict(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT.format(max_cards=n)},
+            {"role": "user",   "content": REPAIR_NOTE.format(extra=extra_line,
+                                                             cards=cards if to_fix else "")},
+            {"role": "user",   "content": chunk},
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=min(MAX_TOKENS, REPAIR_MAX_TOKENS * n),
+    )
+
+
+def _api_call(request: dict, kind: str, ref: str, limiter: Optional[RateLimiter]):
+    """One chat request with back-off, recorded in ``metrics``."""
+    attempts, latency = 0, None
+
+    def attempt():
+        nonlocal attempts, latency
+        attempts += 1
+        if limiter is not None:
+            t0 = time.perf_counter()
+            limiter.acquire(_estimate_tokens(request))
+            metrics.add_time("rate_limit_wait", time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        resp = get_client().chat.completions.create(**request)
+        latency = time.perf_counter() - t0       # the successful attempt only
+        return resp
+
+    resp = with_backoff(attempt, limiter=limiter)
+    metrics.api_call(kind, request["model"], latency, getattr(resp, "usage", None),
+                     retries=attempts - 1, ref=ref)
+    return resp
+
+
+def _finish_chunk(chunk: str, max_cards: int, accepted, *,
+                  limiter: Optional[RateLimiter] = None,
+                  cache: Optional[DiskCache] = None,
+                  report: Optional[dict] = None) -> Optional[List[dict]]:
+    """Repair what ``_accept_*`` flagged (one small call), record the
+    stats and cache the result.  ``None`` if nothing usable came back."""
+    cards, to_fix, extra, stats = accepted
+    h = chunk_hash(chunk)
+    if to_fix or extra:
+        from card_schema import extract_cards, validate
+        stats["repair_call"] = True
+        fix = _api_call(_repair_request(chunk, to_fix, extra), "repair", h[:16], limiter)
+        fixed, _ = validate(extract_cards(fix.choices[0].message.content)[0], chunk)
+        fixed = fixed[:max_cards - len(cards)]
+        stats["repaired"] = len(fixed)
+        cards += fixed
+    stats["kept"] = len(cards)
+    if report is not None:
+        report[h] = stats
+
+    if not _cacheable(cards, stats):
+        return None                    # not cached, journaled or kept: retried next run
+    if cache is not None:
+        cache.put(_cache_key(chunk, max_cards), cards)
     return cards
 
+
+def _cached_cards(chunk: str, max_cards: int, cache: Optional[DiskCache], refresh: bool):
+    if cache is None or refresh:
+        return None
+    cached = cache.get(_cache_key(chunk, max_cards))
+    metrics.count("card_cache_hits" if cached is not None else "card_cache_misses")
+    return cached
+
+
+def _cards_from_chunk(chunk: str, max_cards: int = 3, *,
+                      limiter: Optional[RateLimiter] = None,
+                      cache: Optional[DiskCache] = None,
+                      refresh: bool = False,
+                      report: Optional[dict] = None):
+    # --- cached answer for this exact chunk + prompt? ---
+    cached = _cached_cards(chunk, max_cards, cache, refresh)
+    if cached is not None:
+        return cached
+
+    resp = _api_call(_chat_request(chunk, max_cards), "chunk", chunk_hash(chunk)[:16], limiter)
+
+    # ---------- validate, salvage, repair only what is broken ----------
+    accepted = _accept_cards(resp.choices[0].message.content, chunk, max_cards)
+    return _finish_chunk(chunk, max_cards, accepted, limiter=limiter, cache=cache, report=report)
+
+# ── Packed requests: several chunks per call ──────────────────────────────
+
+PACK_TOKENS = 6000            # chunk tokens per packed request (--pack default)
+PACK_MAX_CHUNKS = 8
+PACK_NOTE = """
+## Several chunks
+The input holds several chunks, each wrapped in <chunk id="N"> … </chunk>.
+Treat every chunk as a separate source: apply all rules above to each one
+on its own (the excerpt must come from *that* chunk), write at most
+{max_cards} cards per chunk, and add "chunk": N to every card.
+"""
+
+
+def _packed_request(chunks: List[str], max_cards: int) -> dict:
+    # the system message depends only on max_cards, so every request of a
+    # deck starts with the same bytes and the provider's prompt cache applies
+    body = "\n".join(f'<chunk id="{k}">\n{ch}\n</chunk>' for k, ch in enumerate(chunks))
+    return dict(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT.format(max_cards=max_cards)
+                                          + PACK_NOTE.format(max_cards=max_cards)},
+            {"role": "user",   "content": body},
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=MAX_TOKENS * len(chunks),
+    )
+
+
+def pack_chunks(chunks: List[str], budget: int = PACK_TOKENS,
+                max_chunks: int = PACK_MAX_CHUNKS) -> List[List[int]]:
+    """Group chunk indices into requests of at most ``budget`` chunk tokens
+    and ``max_chunks`` chunks, first-fit over chunks sorted by size (a
+    chunk bigger than the budget gets a request of its own)."""
+    enc = get_encoder()
+    sizes = [len(t) for t in enc.encode_ordinary_batch(chunks)]
+    bins: List[List[int]] = []
+    room: List[int] = []
+    for i in sorted(range(len(chunks)), key=lambda i: -sizes[i]):
+        for b, left in enumerate(room):
+            if sizes[i] <= left and len(bins[b]) < max_chunks:
+                bins[b].append(i)
+                room[b] -= sizes[i]
+                break
+        else:
+            bins.append([i])
+            room.append(budget - sizes[i])
+    return [sorted(b) for b in bins]
+
+
+def _cards_from_pack(chunks: List[str], max_cards: int, *,
+                     limiter: Optional[RateLimiter] = None,
+                     cache: Optional[DiskCache] = None,
+                     report: Optional[dict] = None,
+                     follow_up: bool = True) -> List[Optional[List[dict]]]:
+    """One request for several chunks; cards are split back out by their
+    ``chunk`` tag, then validated / repaired / cached per chunk.
+
+    A chunk with no cards in a complete reply was skipped on purpose
+    (captions, boilerplate) and is cached as ``[]``.  If the reply was cut
+    off, only the chunks from the last one it reached onwards are lost;
+    they go out again together as one re-packed request (``follow_up``),
+    not as one repair call each.
+    """
+    from card_schema import extract_cards
+    request = _packed_request(chunks, max_cards)
+    resp = _api_call(request, "pack", chunk_hash(chunks[0])[:16], limiter)
+    raw, broken = extract_cards(resp.choices[0].message.content)
+    groups: List[list] = [[] for _ in chunks]
+    for card in raw:
+        k = card.pop("chunk", None) if isinstance(card, dict) else None
+        if isinstance(k, str) and k.strip().isdigit():
+            k = int(k)
+        if isinstance(k, int) and 0 <= k < len(chunks):
+            groups[k].append(card)
+
+    cut = len(chunks)
+    if broken:
+        # cards come in chunk order: the reply broke inside the last chunk it reached
+        cut = max((k for k, g in enumerate(groups) if g), default=0)
+        metrics.say(f"[flashcard_gen] ⚠️  GPT returned malformed JSON — salvaged {len(raw)} card(s), "
+                    f"{len(chunks) - cut} of {len(chunks)} chunk(s) cut off")
+    out = [_finish_chunk(ch, max_cards, _accept_raw(g, False, ch, max_cards),
+                         limiter=limiter, cache=cache, report=report)
+           for ch, g in zip(chunks[:cut], groups[:cut])]
+    if cut == len(chunks):
+        return out
+
+    lost = chunks[cut:]
+    if follow_up:
+        metrics.say(f"[flashcard_gen] Re-packing {len(lost)} cut-off chunk(s) into one request")
+        out += _cards_from_pack(lost, max_cards, limiter=limiter, cache=cache,
+                                report=report, follow_up=False)
+    else:                              # second truncation: per-chunk repair, never cached
+        out += [_finish_chunk(ch, max_cards, _accept_raw(g, True, ch, max_cards),
+                              limiter=limiter, cache=cache, report=report)
+                for ch, g in zip(lost, groups[cut:])]
+    if report is not None and chunk_hash(chunks[cut]) in report:
+        report[chunk_hash(chunks[cut])]["salvaged"] = True     # one broken reply
+    return out
+
+
+def iter_chunk_cards(chunks: List[str], max_cards: int = 3, *,
+                     concurrency: int = 4,
+                     limiter: Optional[RateLimiter] = None,
+                     cache: Optional[DiskCache] = None,
+                     refresh: bool = False,
+                     report: Optional[dict] = None,
+                     executor: Optional[ThreadPoolExecutor] = None,
+                     pack: Optional[int] = None
+                     ) -> Iterator[Tuple[int, List[dict]]]:
+    """Yield ``(chunk_index, cards)`` as each chunk's request completes.
+
+    Up to ``concurrency`` requests are in flight at once; all of them share
+    ``limiter`` so RPM/TPM limits hold process-wide.  Results arrive in
+    *completion* order — callers that need document order index by
+    ``chunk_index``.  Chunks found in ``cache`` skip the API entirely
+    (``refresh`` ignores cached answers but still stores new ones).
+    Chunks without a usable result (broken reply, every card invalid) are
+    not yielded, so the next run tries them again.
+    Per-chunk validation / repair counts go into ``report`` (by chunk hash).
+    A shared ``executor`` replaces the private pool (and ``concurrency``),
+    so several decks built at once stay under one in-flight limit.
+
+    With ``pack`` (a chunk-token budget, e.g. ``PACK_TOKENS``) uncached
+    chunks are grouped by ``pack_chunks`` and each group goes out as one
+    request, so the system prompt is paid once per group, not per chunk.
+    """
+    if pack:
+        todo = []
+        for i, ch in enumerate(chunks):
+            cached = _cached_cards(ch, max_cards, cache, refresh)
+            if cached is not None:
+                yield i, cached
+            else:
+                todo.append(i)
+        units = [[todo[j] for j in group]
+                 for group in pack_chunks([chunks[i] for i in todo], pack)]
+        if units:
+            metrics.say(f"[flashcard_gen] Packing {len(todo)} chunk(s) into {len(units)} request(s)")
+        run = partial(_cards_from_pack, max_cards=max_cards,
+                      limiter=limiter, cache=cache, report=report)
+        gen = lambda idx: run([chunks[i] for i in idx])
+    else:
+        units = [[i] for i in range(len(chunks))]
+        one = partial(_cards_from_chunk, max_cards=max_cards,
+                      limiter=limiter, cache=cache, refresh=refresh, report=report)
+        gen = lambda idx: [one(chunks[idx[0]])]
+
+    if concurrency <= 1 and executor is None:
+        for idx in units:
+            yield from _usable(idx, gen(idx))
+        return
+
+    pool = executor or ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="cardgen")
+    futures = {}
+    try:
+        gen = metrics.carry_log(gen)     # worker lines go where the caller's do
+        futures = {pool.submit(gen, idx): idx for idx in units}
+        for fut in as_completed(futures):
+            yield from _usable(futures[fut], fut.result())
+    finally:
+        # on error / Ctrl-C don't start chunks nobody will collect
+        if executor is None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for fut in futures:
+                fut.cancel()
+
+
+def _usable(idx: List[int], results: List[Optional[List[dict]]]):
+    return ((i, cards) for i, cards in zip(idx, results) if cards is not None)
+
+
 def build_deck(chunks: List[str], deck_name: str,
-               max_cards_per_chunk: int = 3) -> pathlib.Path:
-    """Return Path to the generated .apkg file and also write a .cards.json file."""
-    all_cards: list[dict] = []
-    for i, ch in enumerate(chunks, 1):
-        new_cards = _cards_from_chunk(ch, max_cards_per_chunk)
-        print(f"[flashcard_gen] Chunk {i}/{len(chunks)} → {len(new_cards)} card(s)")
-        all_cards.extend(new_cards)
+               max_cards_per_chunk: int = 3, *,
+               concurrency: int = 4,
+               rpm: Optional[float] = None,
+               tpm: Optional[float] = None,
+               use_cache: bool = True,
+               refresh: bool = False,
+               resume: bool = False,
+               batch_state=None,
+               poll_interval: float = 30.0,
+               dedup: Optional[float] = None,
+               dedup_method: str = "minhash",
+               manifest=None,
+               out_dir=None,
+               limiter: Optional[RateLimiter] = None,
+               progress=None,
+               cache: Optional[DiskCache] = None,
+               executor: Optional[ThreadPoolExecutor] = None,
+               pack: Optional[int] = None,
+               on_cards=None,
+               card_store=None) -> pathlib.Path:
+    """Return Path to the generated .apkg file and also write a .cards.json file.
+
+    ``concurrency`` chunks are sent to the API in parallel, throttled to
+    ``rpm`` requests / ``tpm`` tokens per minute when given.  Cards keep
+    the original chunk order regardless of completion order.  Responses are
+    cached on disk (``CACHE_PATH``) so re-runs only pay for unseen chunks;
+    ``use_cache=False`` bypasses the cache, ``refresh=True`` regenerates
+    and overwrites it.
+
+    Every finished chunk is appended to ``<deck>.journal.jsonl`` right away;
+    with ``resume=True`` chunks already in the journal are not re-sent, so
+    an interrupted build only pays for the remaining work.
+
+    With ``batch_state`` (a JSON path) the chunks go through the OpenAI
+    Batch API instead — cheaper and off the live rate limits, but results
+    can take hours; see ``batch_gen``.
+
+    ``dedup`` (a similarity threshold) drops near-duplicate cards before
+    anything is written and saves what was merged to ``<deck>.dedup.json``;
+    see ``dedup.dedup_cards``.
+
+    With ``manifest`` (a JSON path, see ``manifest.DeckManifest``) chunks
+    unchanged since the last finished build reuse their cards and card IDs;
+    only new or edited chunks are generated, and cards of removed chunks
+    are dropped.  ``refresh=True`` regenerates every chunk.
+
+    ``out_dir`` places every output file there instead of the current
+    directory.  A shared ``limiter`` overrides ``rpm``/``tpm`` (e.g. one
+    limit for all jobs of a server), and ``progress(done, total)`` is
+    called after each finished chunk.  Likewise a shared ``cache`` and
+    request ``executor`` (see ``iter_chunk_cards``) let many decks be built
+    side by side — ``bulk_build`` does this.
+
+    ``pack`` (a token budget) sends several chunks per request; see
+    ``iter_chunk_cards``.  Ignored in batch mode.
+
+    ``on_cards(cards)`` receives each chunk's cards (copies, IDs already
+    assigned) the moment they exist — reused chunks first — so a game can
+    start before the deck is written (see ``live_deck``).  Cards that
+    ``dedup`` later merges may already have been handed out.
+
+    ``card_store`` (a ``card_store.CardStore`` path) imports the finished
+    deck there, so the games load it without parsing the JSON; by default
+    nothing is imported.
+    """
+    journal = CardJournal(_out_path(deck_name, ".journal.jsonl", out_dir), resume=resume)
+    hashes = [chunk_hash(ch) for ch in chunks]
+    known = dict(journal.done)
+    if manifest is not None:
+        manifest = DeckManifest(manifest)
+        if not refresh:
+            reuse, _, _ = manifest.diff(hashes, max_cards_per_chunk)
+            known = {**reuse, **known}
+    # identical chunks (repeated boilerplate pages) would get identical
+    # cards *and* card IDs: only the first occurrence is generated
+    first: dict = {}
+    for i, h in enumerate(hashes):
+        first.setdefault(h, i)
+    repeats = len(hashes) - len(first)
+    if repeats:
+        metrics.say(f"[flashcard_gen] {repeats} repeated chunk(s) skipped (same text as an earlier one)")
+    per_chunk: list[list[dict]] = [list(known.get(h, [])) if first[h] == i else []
+                                   for i, h in enumerate(hashes)]
+    todo = [i for i, h in enumerate(hashes) if h not in known and first[h] == i]
+    for h, cards in zip(hashes, per_chunk):
+        assign_ids(h, cards)
+        if cards and on_cards is not None:
+            on_cards([dict(c) for c in cards])
+    if resume:
+        metrics.say(f"[flashcard_gen] Resume: {len(set(journal.done) & set(hashes))}/{len(first)} "
+                    f"chunk(s) already in {journal.path.name}")
+
+    if limiter is None:
+        limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    own_cache = cache is None
+    if own_cache and use_cache:
+        cache = DiskCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES)
+    report: dict = {}                  # chunk hash → validation / repair counts
+    settled = set(known)               # hashes with final cards: reused, journaled or generated
+    done = len(chunks) - len(todo)
+    if batch_state is not None:
+        from batch_gen import iter_batch_cards     # only needed in batch mode
+        results = iter_batch_cards([chunks[i] for i in todo], max_cards_per_chunk,
+                                   batch_state, cache=cache, refresh=refresh,
+                                   poll_interval=poll_interval, report=report)
+    else:
+        results = iter_chunk_cards([chunks[i] for i in todo], max_cards_per_chunk,
+                                   concurrency=concurrency, limiter=limiter,
+                                   cache=cache, refresh=refresh, report=report,
+                                   executor=executor, pack=pack)
+    t0 = time.perf_counter()
+    try:
+        for j, new_cards in results:
+            i = todo[j]
+            settled.add(hashes[i])
+            assign_ids(hashes[i], new_cards)
+            journal.append(hashes[i], i, new_cards)
+            per_chunk[i] = new_cards
+            if new_cards and on_cards is not None:
+                on_cards([dict(c) for c in new_cards])
+            done += 1
+            if progress is not None:
+                progress(done, len(chunks))
+            metrics.say(f"[flashcard_gen] Chunk {done}/{len(chunks)} (#{i + 1}) → {len(new_cards)} card(s)")
+    except KeyboardInterrupt:
+        metrics.say(f"\n[flashcard_gen] Interrupted — {done}/{len(chunks)} chunk(s) saved in "
+                    f"{journal.path.name}; re-run with --resume to continue.")
+        raise
+    finally:
+        metrics.add_time("generate", time.perf_counter() - t0)
+        journal.close()
+        if cache is not None and own_cache:
+            s = cache.stats()
+            metrics.say(f"[flashcard_gen] Cache: {s['hits']} hit(s), {s['misses']} miss(es), "
+                        f"{s['entries']} entries / {s['bytes'] // 1024} KiB")
+            cache.close()
+    if done < len(chunks):
+        metrics.say(f"[flashcard_gen] ⚠️  {len(chunks) - done} chunk(s) without usable cards "
+                    f"— retried on the next run")
+    if report:
+        _write_salvage_report(report, hashes, deck_name, out_dir)
+    if manifest is not None:
+        # chunks that got no usable answer stay out, so the next build generates them
+        keep = [i for i, h in enumerate(hashes) if h in settled and first[h] == i]
+        manifest.save([hashes[i] for i in keep], [per_chunk[i] for i in keep],
+                      max_cards=max_cards_per_chunk)
+    all_cards: list[dict] = [c for cards in per_chunk for c in cards]
+    if dedup is not None:
+        with metrics.stage("dedup"):
+            all_cards = _dedup(all_cards, deck_name, dedup, dedup_method, out_dir)
+    with metrics.stage("export"):
+        return write_outputs(all_cards, deck_name, out_dir, card_store=card_store)
+
+
+def _write_salvage_report(report: dict, hashes: List[str], deck_name: str, out_dir=None) -> None:
+    rows = [dict(chunk=i + 1, **report[h]) for i, h in enumerate(hashes) if h in report]
+    total = {k: sum(r[k] for r in rows) for k in ("returned", "valid", "repaired", "kept")}
+    metrics.say(f"[flashcard_gen] Validation: {total['valid']}/{total['returned']} card(s) valid as "
+                f"returned, {total['repaired']} repaired, "
+                f"{sum(r['salvaged'] for r in rows)} broken reply(s) salvaged, "
+                f"{sum(r['repair_call'] for r in rows)} repair call(s)")
+    path = _out_path(deck_name, ".salvage.json", out_dir)
+    path.write_text(json.dumps({"total": total, "chunks": rows}, indent=2), encoding="utf-8")
+
+
+def _dedup(cards: List[dict], deck_name: str, threshold: float, method: str,
+           out_dir=None) -> List[dict]:
+    from dedup import dedup_cards
+
+    vectors = None
+    if method == "embedding":
+        import numpy as np
+        from chunker import embed_chunks
+        from vector_store import VectorStore
+        store = VectorStore(_out_path(deck_name, ".card_vectors", out_dir), DEDUP_EMBED_MODEL)
+        vectors = embed_chunks([f"{c.get('front', '')}\n{c.get('back', '')}" for c in cards],
+                               model=DEDUP_EMBED_MODEL, store=store)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    kept, report = dedup_cards(cards, threshold, vectors=vectors)
+    report_path = _out_path(deck_name, ".dedup.json", out_dir)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    metrics.say("[flashcard_gen] Dedup report written →", report_path)
+    return kept
+
+
+def _out_path(deck_name: str, suffix: str, out_dir=None) -> pathlib.Path:
+    return pathlib.Path(out_dir or ".") / (deck_name.replace(" ", "_") + suffix)
+
+
+def write_outputs(all_cards: List[dict], deck_name: str, out_dir=None,
+                  card_store=None) -> pathlib.Path:
+    """Write ``.cards.json``, ``.cards.txt`` and ``.apkg``; return the .apkg path.
+    With ``card_store`` (a path) the cards are also imported into that store."""
+    from anki_export import write_deck_files
+
     total_cards = len(all_cards)
-    print(f"[flashcard_gen] Total cards generated: {total_cards}")
-
-    # --- JSON dump for Game 2 ---
-    json_path = pathlib.Path(deck_name.replace(" ", "_") + ".cards.json")
-    json_path.write_text(json.dumps(all_cards, ensure_ascii=False, indent=2), encoding="utf-8")
-    print("[flashcard_gen] Card JSON written →", json_path)
-
-    # --- Human‑readable TXT dump ------------------------------------------
-    txt_lines = []
-    for c in all_cards:
-        txt_lines.append("Q: " + c["front"])
-        txt_lines.append("A: " + c["back"])
-        txt_lines.append("CTX: " + c.get("context", ""))
-        txt_lines.append("EXCERPT: " + c.get("excerpt", "")[:200])
-        txt_lines.append("-" * 40)
-    txt_path = pathlib.Path(deck_name.replace(" ", "_") + ".cards.txt")
-    txt_path.write_text("\n".join(txt_lines), encoding="utf-8")
-    print("[flashcard_gen] Card TXT written →", txt_path)
-
-    deck = genanki.Deck(random.randrange(1<<30), deck_name[:90])
-    model = genanki.Model(
-        1537156452, "Basic",
-        fields=[{"name":"Front"},{"name":"Back"}],
-        templates=[{"name":"Card",
-                    "qfmt":"{{Front}}",
-                    "afmt":"{{Back}}<hr id=answer>"}],
-    )
-    for c in all_cards:
-        # skip malformed card if GPT failed to supply two distractors
-        if len(c.get("distractors", [])) < 2:
-            continue
-        deck.add_note(genanki.Note(model, [c["front"], c["back"]]))
+    metrics.say(f"[flashcard_gen] Total cards generated: {total_cards}")
+
+    # JSON (for the games), human-readable TXT and the Anki deck in one pass
+    json_path, txt_path, out = write_deck_files(all_cards, deck_name, deck_id(deck_name), out_dir)
+    metrics.say("[flashcard_gen] Card JSON written →", json_path)
+    metrics.say("[flashcard_gen] Card TXT written →", txt_path)
 
+    if card_store is not None:
+        from card_store import CardStore
+        store = CardStore(card_store)
+        try:
+            store.import_cards(json_path, all_cards, name=deck_name)   # games skip re-parsing
+        finally:
+            store.close()
 
-    out = pathlib.Path(deck_name.replace(" ", "_") + ".apkg")
-    genanki.Package(deck).write_to_file(out)
-    print("[flashcard_gen] Deck written →", out.resolve())
-    return out
\ No newline at end of file
+    metrics.say("[flashcard_gen] Deck written →", out.resolve())
+    return out
@@ -1,6 +1,9 @@
 # game1_cli.py — “Curate & Improve”
-import json, random, pathlib, argparse, pickle, os
-from typing import List, Tuple
+import json, random, re, pathlib, argparse, pickle, os, threading
+from concurrent.futures import Future, wait as futures_wait
+from typing import Dict, List, Optional, Tuple
+from card_store import CardStore
+import metrics
 
 HAND_MIN, HAND_MAX = 3, 12
 PROFILE_PATH = pathlib.Path("user_profile.json")
@@ -8,93 +11,266 @@ PROFILE_PATH = pathlib.Path("user_profile.json")
 
 # ── Helpers ───────────────────────────────────────────────────────────────
 def load_cards(json_file: str) -> List[dict]:
-    data = json.loads(pathlib.Path(json_file).read_text(encoding="utf-8"))
-    for i, c in enumerate(data):
-        c.setdefault("id", f"c{i}")
-    return data
+    # parsed once, then served from the card store until the file changes
+    with metrics.stage("game.load"):
+        store = CardStore()
+        try:
+            return store.load_json_deck(json_file)
+        finally:
+            store.close()
 
 
-def load_profile() -> dict:
-    if PROFILE_PATH.exists():
-        return json.loads(PROFILE_PATH.read_text())
-    # simple starter profile
-    return {"kept": 0, "tossed": 0, "by_card": {}}
+def open_profile() -> CardStore:
+    """Per-card keep/toss stats now live in the card store; an old
+    ``user_profile.json`` is folded in the first time."""
+    store = CardStore()
+    store.import_profile(PROFILE_PATH)
+    return store
 
 
-def save_profile(profile: dict) -> None:
-    PROFILE_PATH.write_text(json.dumps(profile, indent=2))
+REFURB_BATCH = 20            # tossed cards per refurbish request
+REFURB_EXAMPLES = 5          # kept cards shown as "what the player likes"
+REFURB_MAX_TOKENS = 300      # completion budget per card
+REFURB_PROMPT = """
+You improve flash cards that a lawyer threw out while reviewing a deck.
 
+For every tossed card you get its excerpt, the card itself and (maybe)
+the reviewer's reason.  Write one better card per tossed card: fix what
+the reason complains about, keep it answerable from the excerpt, give
+exactly one correct answer and two plausible but wrong distractors.
+Cards the reviewer kept are shown as examples of what they like.
 
-def gpt_refurbish(kept: List[dict], tossed: List[dict]) -> List[dict]:
-    """
-    Stub replacement for the actual GPT call.
-    For now, we just paraphrase tossed card fronts with '(improved)' suffix.
-    """
-    new_cards = []
-    for c in tossed:
-        new_cards.append(
-            {
-                "id": c["id"] + "_v2",
-                "front": c["front"] + " (improved)",
-                "back": c["back"],
-            }
-        )
-    return new_cards
+Return JSON:
+{ "cards": [ { "id": "<id of the tossed card>", "excerpt": "...",
+               "front": "...", "back": "...", "distractors": ["...", "..."],
+               "context": "..." } ] }
+"""
+
+_VERSION = re.compile(r"_v(\d+)$")
+
+
+def _next_id(card_id: str) -> str:
+    m = _VERSION.search(card_id)
+    if m is None:
+        return card_id + "_v2"
+    return card_id[:m.start()] + f"_v{int(m.group(1)) + 1}"
+
+
+def _refurbish_request(kept: List[dict], batch: List[Tuple[dict, str]]) -> dict:
+    from flashcard_gen import MODEL
+    fields = ("excerpt", "front", "back", "distractors")
+    payload = {
+        "kept": [{k: c[k] for k in ("front", "back") if k in c}
+                 for c in kept[-REFURB_EXAMPLES:]],
+        "tossed": [dict({k: c[k] for k in fields if k in c}, id=c["id"], reason=reason)
+                   for c, reason in batch],
+    }
+    return dict(
+        model=MODEL,
+        messages=[{"role": "system", "content": REFURB_PROMPT},
+                  {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}],
+        response_format={"type": "json_object"},
+        max_tokens=REFURB_MAX_TOKENS * len(batch),
+    )
+
+
+def _accept_refurbished(content: str, originals: Dict[str, dict]) -> List[dict]:
+    """Valid replacements from a reply, with new versioned IDs; anything
+    that does not match a tossed card or fails validation is dropped."""
+    from card_schema import ExcerptIndex, clean_card, extract_cards, problems
+    raw, _ = extract_cards(content)
+    out = []
+    for card in raw:
+        orig = originals.pop(str(card.get("id")), None) if isinstance(card, dict) else None
+        if orig is None:
+            continue
+        c = clean_card(card)
+        issues = problems(c, ExcerptIndex(orig.get("excerpt") or ""))
+        if not orig.get("excerpt"):             # nothing to check it against
+            issues = [p for p in issues if not p.startswith("excerpt")]
+        if not issues:
+            out.append({**orig, **c, "id": _next_id(orig["id"])})
+    return out
+
+
+def gpt_refurbish(kept: List[dict], tossed: List[dict],
+                  reasons: Optional[Dict[str, str]] = None, *, limiter=None) -> List[dict]:
+    """Rewrite ``tossed`` cards (with the player's ``reasons``, by card id)
+    in batched chat requests of ``REFURB_BATCH`` cards; returns the
+    improved cards, each with a bumped ``_vN`` id.  ``limiter`` is the
+    ``RateLimiter`` shared with the deck build."""
+    from flashcard_gen import _api_call
+    reasons = reasons or {}
+    improved = []
+    for i in range(0, len(tossed), REFURB_BATCH):
+        batch = [(c, reasons.get(c["id"], "")) for c in tossed[i:i + REFURB_BATCH]]
+        resp = _api_call(_refurbish_request(kept, batch), "refurbish", None, limiter)
+        improved += _accept_refurbished(resp.choices[0].message.content or "",
+                                        {c["id"]: c for c, _ in batch})
+    metrics.count("game1.refurbished", len(improved))
+    return improved
+
+
+class Refurbisher:
+    """Runs ``gpt_refurbish`` on a background thread while the player
+    carries on.  Tossed cards queue up; whenever no job is running,
+    everything queued so far goes out as one batched job.  Jobs run on
+    daemon threads, so quitting never waits for a refurbish call."""
+
+    def __init__(self, refurbish=gpt_refurbish, limiter=None):
+        self._refurbish = refurbish
+        self._limiter = limiter
+        self._closed = False
+        self._job: Optional[Future] = None
+        self._tossed: List[dict] = []
+        self._reasons: Dict[str, str] = {}
+        self._kept: List[dict] = []
+
+    @property
+    def pending(self) -> bool:
+        return self._job is not None or bool(self._tossed)
+
+    def submit(self, kept: List[dict], tossed: List[dict], reasons: Dict[str, str]) -> None:
+        self._kept = (self._kept + kept)[-REFURB_EXAMPLES:]
+        self._tossed += tossed
+        self._reasons.update(reasons)
+        self._start()
+
+    def _start(self) -> None:
+        if self._job is None and self._tossed and not self._closed:
+            job = self._job = Future()
+            args = (self._kept, self._tossed, self._reasons)
+            self._tossed, self._reasons = [], {}
+            threading.Thread(target=self._run, args=(job, *args), name="refurbish",
+                             daemon=True).start()
+
+    def _run(self, job: Future, kept, tossed, reasons) -> None:
+        if not job.set_running_or_notify_cancel():
+            return
+        try:
+            with metrics.stage("game1.refill"):
+                job.set_result(self._refurbish(kept, tossed, reasons, limiter=self._limiter))
+        except BaseException as e:
+            job.set_exception(e)
+
+    def ready(self) -> List[dict]:
+        """Improved cards of a finished job (never blocks)."""
+        if self._job is None or not self._job.done():
+            return []
+        job, self._job = self._job, None
+        try:
+            cards = job.result()
+        except Exception as e:                  # the game goes on without them
+            print(f"\n[game1] ⚠️  Could not improve tossed cards: {e}")
+            cards = []
+        self._start()
+        return cards
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._job is not None:
+            futures_wait([self._job], timeout=timeout)
+
+    def close(self) -> None:
+        """Drop queued work; a call still in flight is abandoned."""
+        self._closed = True
+        self._tossed, self._reasons = [], {}
+        if self._job is not None:
+            self._job.cancel()
+
+
+def _add(pool: Dict[str, dict], cards: List[dict], seen: set) -> None:
+    for c in cards:
+        if c["id"] not in seen:
+            pool.setdefault(c["id"], c)
 
 
 # ── Main game loop ────────────────────────────────────────────────────────
-def play_curate(cards: List[dict], source_file: str, *, endless: bool = False):
-    pool = cards[:]               # mutable copy
-    kept_deck = []
-    graveyard = []
-    profile = load_profile()
+def play_curate(cards: List[dict], source_file: str, *, endless: bool = False, live=None,
+                limiter=None):
+    """Keep / throw rounds over ``cards``; with ``live`` (a
+    ``live_deck.LiveDeck``) cards still being generated join the pool
+    between rounds.  Tossed cards are improved in the background
+    (``Refurbisher``, throttled by ``limiter``) and come back into the
+    pool when ready."""
+    pool: Dict[str, dict] = {}    # id → card, not yet dealt
+    seen: set = set()             # ids already dealt
+    _add(pool, cards, seen)
+    kept_deck: Dict[str, dict] = {}
+    graveyard: Dict[str, dict] = {}
+    refurb = Refurbisher(limiter=limiter)
+    profile = open_profile()
+    session = profile.start_session("curate", str(source_file))
+
+    def more_coming() -> bool:
+        return refurb.pending or (live is not None and not live.done)
 
     round_no = 1
-    while True:
-        print(f"\n=== Round {round_no} ===")
-        hand_size = random.randint(HAND_MIN, HAND_MAX)
-        hand = random.sample(pool, min(hand_size, len(pool)))
-
-        kept, tossed = [], []
-        for idx, card in enumerate(hand, 1):
-            print(f"\n── {idx}/{len(hand)} ──")
-            print("Q:", card["front"])
-            print("A:", card["back"])
-            choice = input("(k)eep / (t)hrow :").lower().strip()
-            if choice.startswith("k"):
-                kept.append(card)
-            else:
-                tossed.append(card)
-                reason = input("Reason (optional): ")
-            
-        # update piles and profile
-        kept_deck.extend(kept)
-        graveyard.extend(tossed)
-        profile["kept"] += len(kept)
-        profile["tossed"] += len(tossed)
-        for card in kept + tossed:
-            stat = profile["by_card"].setdefault(card["id"], {"k": 0, "t": 0})
-            if card in kept:
-                stat["k"] += 1
-            else:
-                stat["t"] += 1
-        save_profile(profile)
-
-        if not tossed or not pool:
-            break  # player happy or pool exhausted
-
-        # refurbish tossed cards with GPT logic
-        new_cards = gpt_refurbish(kept, tossed)
-        pool = [c for c in pool if c not in hand] + new_cards
-        round_no += 1
+    try:
+        while True:
+            _add(pool, refurb.ready(), seen)
+            if live is not None:
+                _add(pool, live.drain(), seen)
+            if not pool and more_coming():
+                print("\n⏳  Waiting for the next cards …")
+                while not pool and more_coming():
+                    if live is not None and not live.done:
+                        _add(pool, live.next_batch(timeout=0.5), seen)
+                    else:
+                        refurb.wait()
+                    _add(pool, refurb.ready(), seen)
+            if not pool:
+                break  # pool exhausted
+            print(f"\n=== Round {round_no} ===")
+            hand_size = random.randint(HAND_MIN, HAND_MAX)
+            hand = [pool.pop(cid) for cid in random.sample(list(pool), min(hand_size, len(pool)))]
+            seen.update(c["id"] for c in hand)
+
+            kept, tossed, reasons = [], [], {}
+            for idx, card in enumerate(hand, 1):
+                print(f"\n── {idx}/{len(hand)} ──")
+                print("Q:", card["front"])
+                print("A:", card["back"])
+                choice = input("(k)eep / (t)hrow :").lower().strip()
+                metrics.count("game.answers")
+                if choice.startswith("k"):
+                    kept.append(card)
+                else:
+                    tossed.append(card)
+                    reason = input("Reason (optional): ").strip()
+                    if reason:
+                        reasons[card["id"]] = reason
+
+            # update piles and profile
+            kept_deck.update((c["id"], c) for c in kept)
+            graveyard.update((c["id"], c) for c in tossed)
+            deltas = {}
+            for card in kept:
+                deltas.setdefault(card["id"], {"kept": 0, "tossed": 0})["kept"] += 1
+            for card in tossed:
+                deltas.setdefault(card["id"], {"kept": 0, "tossed": 0})["tossed"] += 1
+            with metrics.stage("game.save"):
+                profile.add_stats(deltas)      # one transaction, only these rows
+
+            # improve tossed cards in the background; next hand starts right away
+            if tossed:
+                refurb.submit(kept, tossed, reasons)
+            elif not more_coming():
+                break  # player happy
+            round_no += 1
+    finally:
+        refurb.close()
 
     # ── Final summary ─────────────────────────────────────────────────
+    played = list(kept_deck.values()) + list(graveyard.values())
     print("\n🎯  Session finished.")
     print(f"Total kept: {len(kept_deck)}   |   Total tossed: {len(graveyard)}")
     print("\nPer‑card stats this session:")
-    for card in kept_deck + graveyard:
-        s = profile["by_card"][card["id"]]
-        print(f"- {card['front'][:60]}…   ✔ {s['k']}   ✘ {s['t']}")
+    stats = profile.stats(c["id"] for c in played)
+    for card in played:
+        s = stats[card["id"]]
+        print(f"- {card['front'][:60]}…   ✔ {s['kept']}   ✘ {s['tossed']}")
+    profile.end_session(session, kept=len(kept_deck), tossed=len(graveyard))
+    profile.close()
     
     # --- Write session TXT -----------------------------------------------
     
@@ -103,9 +279,9 @@ def play_curate(cards: List[dict], source_file: str, *, endless: bool = False):
     sess_path = pathlib.Path(base + "_session.txt")
 
     report = []
-    for c in kept_deck:
+    for c in kept_deck.values():
         report.append("[KEPT]   " + c["front"] + "  ->  " + c["back"])
-    for c in graveyard:
+    for c in graveyard.values():
         report.append("[THROWN] " + c["front"] + "  ->  " + c["back"])
 
     sess_path.write_text("\n\n".join(report), encoding="utf-8")
@@ -1,13 +1,31 @@
 # game2_cli.py — Basic & Multiple‑choice drills
-import json, random, pathlib, argparse
+import random, time
+from card_store import CardStore
+from scheduler import DueQueue, NEW, RELEARN_SECONDS, due_cards, load_states, sm2
+import metrics
 
 # ────────────────────────────────────────────────────────────────
 def load_cards(json_file: str):
-    data = json.loads(pathlib.Path(json_file).read_text(encoding="utf-8"))
-    for i, c in enumerate(data):
-        c.setdefault("id", f"c{i}")
+    # parsed once, then served from the card store until the file changes
+    with metrics.stage("game.load"):
+        store = CardStore()
+        try:
+            data = store.load_json_deck(json_file)
+        finally:
+            store.close()
+    for c in data:
         c.setdefault("distractors", [])          # may be empty
     return data
+
+
+def record_answer(store: CardStore, card_id: str, good: bool, review=None) -> None:
+    """Persist one answer as it happens (plus the card's new SM-2 state
+    on its first answer this session), so an endless drill or Ctrl-C
+    loses nothing."""
+    with metrics.stage("game.save"):
+        store.add_stats({card_id: {"right": int(good), "wrong": int(not good)}})
+        if review is not None:
+            store.save_reviews({card_id: review})
 # ────────────────────────────────────────────────────────────────
 # BASIC mode helpers
 def ask_basic(card, idx, total, correct, wrong):
@@ -17,37 +35,8 @@ def ask_basic(card, idx, total, correct, wrong):
     print(f"✅  {card['back']}\n")
     return input("Did you recall it? (y/N) ").lower().startswith("y")
 
-def play_basic(cards, endless=False):
-    remaining = cards[:]            # cards still to master
-    random.shuffle(remaining)
-    total = len(remaining)
-    correct = wrong = 0
-    stats = {c["id"]: {"right": 0, "wrong": 0} for c in cards}
-
-    while remaining:
-        card = remaining.pop(0)
-        idx  = total - len(remaining)   # 1‑based position
-        good = ask_basic(card, idx, total, correct, wrong)
-
-        if good:
-            correct += 1
-            stats[card["id"]]["right"] += 1
-            if endless:                 # recycle only in endless mode
-                remaining.append(card)
-        else:
-            wrong += 1
-            stats[card["id"]]["wrong"] += 1
-            remaining.append(card)
-
-    print(f"\n🎉  All {total} cards answered correctly!")
-    print(f"Session summary → ✔ {correct}  ✘ {wrong}")
-    print("\n── Per‑card stats ─────────────────────────────")
-    for idx, card in enumerate(cards, 1):
-        s = stats[card["id"]]
-        print(f"Card {idx}/{total}:  "
-              f"✔ {s['right']}  ✘ {s['wrong']}  — {card['front'][:60]}…")
-
-    print("Thank you — game over!\n")
+def play_basic(cards, endless=False, live=None):
+    _drill(cards, ask_basic, "basic", endless, live=live)
 # ────────────────────────────────────────────────────────────────
 # MULTIPLE‑CHOICE helpers
 def ask_mc(card, idx, total, correct, wrong):
@@ -66,29 +55,98 @@ def ask_mc(card, idx, total, correct, wrong):
     print("✅  Correct!\n" if right else f"❌  Wrong. Correct answer: {card['back']}\n")
     return right
 
-def play_mc(cards, endless=False):
-    remaining = cards[:]
-    random.shuffle(remaining)
-    total = len(remaining)
+def play_mc(cards, endless=False, live=None):
+    _drill(cards, ask_mc, "mc", endless, live=live)
+# ────────────────────────────────────────────────────────────────
+# REVIEW mode — only what the spaced-repetition schedule says is due
+def play_review(cards, endless=False):
+    store = CardStore()
+    try:
+        states = load_states(store, (c["id"] for c in cards))
+    finally:
+        store.close()
+    due = due_cards(cards, states)
+    if not due:
+        nxt = min((s.due for s in states.values()), default=None)
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(nxt)) if nxt else "—"
+        print(f"\n🎉  Nothing due. Next review: {when}")
+        return
+    print(f"\n📅  {len(due)} card(s) due of {len(cards)}")
+    _drill(due, ask_basic, "review", endless,
+           states=states, shuffle=False)
+# ────────────────────────────────────────────────────────────────
+# Shared drill loop
+def _drill(cards, ask, game, endless=False, *, states=None, shuffle=True, live=None):
+    """Run one drill over ``cards``; next card comes off a due-time heap.
+
+    Missed cards go back in ``RELEARN_SECONDS`` later (behind everything
+    already due), so picks are O(log n).  The first answer per card this
+    session updates its SM-2 schedule; repeats are practice only.
+
+    With ``live`` (a ``live_deck.LiveDeck``) cards still being generated
+    join the queue as they arrive; the drill only waits when it has
+    nothing left to ask.
+    """
+    states = {} if states is None else states
+    cards = list(cards)
+    order = cards[:]
+    if shuffle:
+        random.shuffle(order)
+    queue = DueQueue()
+    start = time.time()
+    for c in order:                  # overdue first, then unseen cards
+        queue.push(c, states[c["id"]].due if c["id"] in states else start)
+    total = len(order)
     correct = wrong = 0
-    stats = {c["id"]: {"right": 0, "wrong": 0} for c in cards}   
+    stats = {c["id"]: {"right": 0, "wrong": 0} for c in cards}
+    reviews = {}                     # card id → new SM-2 state (first answer only)
 
-    while remaining:
-        card = remaining.pop(0)
-        idx  = total - len(remaining)
-        good = ask_mc(card, idx, total, correct, wrong)
+    store = CardStore()
+    session = store.start_session(game)
+    stopped = False
+    try:
+        while True:
+            if live is not None:
+                if not queue and not live.finished.is_set():
+                    print("\n⏳  Waiting for the next cards …")
+                fresh = live.drain() if queue else live.next_batch()
+                now = time.time()
+                for c in fresh:
+                    queue.push(c, now)
+                    stats.setdefault(c["id"], {"right": 0, "wrong": 0})
+                cards.extend(fresh)
+                total += len(fresh)
+            if not queue:
+                break
+            card = queue.pop()
+            idx  = total - len(queue)   # 1‑based position
+            good = ask(card, idx, total, correct, wrong)
+            metrics.count("game.answers")
 
-        if good:
-            correct += 1
-            stats[card["id"]]["right"] += 1
-            if endless:
-                remaining.append(card)
-        else:
-            wrong += 1
-            stats[card["id"]]["wrong"] += 1
-            remaining.append(card)
+            now = time.time()
+            review = None
+            if card["id"] not in reviews:
+                review = reviews[card["id"]] = sm2(states.get(card["id"], NEW), good, now)
+            record_answer(store, card["id"], good, review)
+            if good:
+                correct += 1
+                stats[card["id"]]["right"] += 1
+                if endless:                 # recycle only in endless mode
+                    queue.push(card, now)
+            else:
+                wrong += 1
+                stats[card["id"]]["wrong"] += 1
+                queue.push(card, now + RELEARN_SECONDS)
+    except (KeyboardInterrupt, EOFError):
+        stopped = True
+    finally:
+        store.end_session(session, right=correct, wrong=wrong)
+        store.close()
 
-    print(f"\n🎉  All {total} cards answered correctly!")
+    if stopped:
+        print("\n\n⏹  Stopped — progress saved.")
+    else:
+        print(f"\n🎉  All {total} cards answered correctly!")
     print(f"Session summary → ✔ {correct}  ✘ {wrong}")
     print("\n── Per‑card stats ─────────────────────────────")
     for idx, card in enumerate(cards, 1):
@@ -1,33 +1,175 @@
 # ingest.py  – safe for str or pathlib.Path
 """
 Turn PDFs, Word docs, or images into plain-text strings.
+
+``iter_pages`` streams the text one page (PDF / image frame) or paragraph
+(DOCX) at a time, optionally spread over a process pool; ``extract_text``
+is the old one-big-string interface on top of it.
+
+PDF pages without a text layer (scans) are rasterised and OCR'd.  OCR
+results are cached on disk per (page content hash, DPI), so re-ingesting a
+document — even an amended copy — only OCRs pages it has not seen.
+
+The format libraries (PyMuPDF, python-docx, tesseract, Pillow) are imported
+only when a file of that type is actually read.
 """
+import hashlib, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import fitz          # PyMuPDF
-import docx          # python-docx
-import pytesseract
-from PIL import Image
+from typing import Iterator, List, Optional
+from cache import DiskCache, make_key
+import metrics
+
+PAGES_PER_TASK = 4         # pages one worker extracts per round-trip
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+OCR_DPI = 300              # rasterisation resolution for scanned PDF pages
+OCR_CACHE_PATH = Path(".flashcard_cache") / "ocr.sqlite"
+OCR_CACHE_MAX_BYTES = 512 << 20
+
+_ocr_cache = None          # one DiskCache per (worker) process, opened lazily;
+                           # the file is shared safely (WAL, size cap kept in SQL)
+
+# ── Worker-side helpers (top-level so they pickle) ────────────────────────
+def _init_worker() -> None:
+    # tesseract is multi-threaded by default; with one process per core
+    # that only oversubscribes the CPU
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _get_ocr_cache() -> DiskCache:
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = DiskCache(OCR_CACHE_PATH, max_bytes=OCR_CACHE_MAX_BYTES)
+    return _ocr_cache
+
+
+def _page_fingerprint(pdf, page) -> str:
+    """Hash of what the page draws: its content stream plus embedded images."""
+    h = hashlib.sha256(page.read_contents())
+    for img in page.get_images(full=True):
+        h.update(pdf.xref_stream_raw(img[0]) or b"")
+    return h.hexdigest()
+
+
+def _ocr_pdf_page(pdf, page, dpi: int) -> str:
+    import pytesseract
+    from PIL import Image
+    key = make_key("pdf-page-ocr", _page_fingerprint(pdf, page), dpi)
+    cache = _get_ocr_cache()
+    text = cache.get(key)
+    if text is None:
+        pix = page.get_pixmap(dpi=dpi, alpha=False)
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        text = pytesseract.image_to_string(img)
+        cache.put(key, text)
+    return text
+
+
+def _pdf_pages(path: str, start: int, stop: int, ocr_dpi: Optional[int] = OCR_DPI) -> List[str]:
+    import fitz          # PyMuPDF
+    out = []
+    with fitz.open(path) as pdf:
+        for i in range(start, stop):
+            page = pdf[i]
+            text = page.get_text()
+            # no text layer but something drawn on it → scanned page
+            if not text.strip() and ocr_dpi and page.get_images():
+                text = _ocr_pdf_page(pdf, page, ocr_dpi)
+            out.append(text)
+    return out
+
+
+def _ocr_frames(path: str, start: int, stop: int, ocr_dpi: Optional[int] = None) -> List[str]:
+    import pytesseract
+    from PIL import Image
+    with Image.open(path) as img:
+        out = []
+        for i in range(start, stop):
+            img.seek(i)
+            out.append(pytesseract.image_to_string(img))
+        return out
+
+
+def _count_units(p: Path, suffix: str) -> int:
+    if suffix == ".pdf":
+        import fitz
+        with fitz.open(p) as pdf:
+            return pdf.page_count
+    from PIL import Image
+    with Image.open(p) as img:
+        return getattr(img, "n_frames", 1)
 
-def extract_text(path) -> str:
+
+def _parallel(fn, path: Path, total: int, workers: int, per_task: int,
+              *args) -> Iterator[str]:
+    """Run ``fn(path, start, stop, *args)`` over page ranges in a process pool.
+
+    At most ``2 × workers`` ranges are in flight, so memory stays bounded
+    however long the document is, and results are yielded in page order.
     """
-    Accepts str or pathlib.Path.  Detects file type by extension,
-    extracts visible text, and returns one big string.
+    ranges = ((s, min(s + per_task, total)) for s in range(0, total, per_task))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        window = deque()
+        for start, stop in ranges:
+            window.append(pool.submit(fn, str(path), start, stop, *args))
+            if len(window) >= 2 * workers:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def _auto_workers(total: int, per_task: int, workers: Optional[int]) -> int:
+    if workers is None:        # only pay for a pool when there is real work
+        workers = min(os.cpu_count() or 1, total // per_task)
+    return max(1, workers)
+
+
+# ── Public API ────────────────────────────────────────────────────────────
+def iter_pages(path, workers: Optional[int] = None,
+               ocr_dpi: Optional[int] = OCR_DPI) -> Iterator[str]:
+    """
+    Lazily yield the text of each page (PDF), frame (image / multi-page
+    TIFF) or paragraph (DOCX) in document order.  ``workers`` > 1 extracts
+    and OCRs pages in that many processes; ``None`` picks a pool size from
+    the page count, ``0``/``1`` stays in-process.  Scanned PDF pages are
+    OCR'd at ``ocr_dpi`` (``None``/``0`` disables the fallback).
     """
-    p = Path(path)            # normalise to Path object
+    # time spent extracting (not in the consumer) → metrics stage "extract"
+    return metrics.timed_iter("extract", _pages(Path(path), workers, ocr_dpi), counter="pages")
+
+
+def _pages(p: Path, workers: Optional[int], ocr_dpi: Optional[int]) -> Iterator[str]:
     suffix = p.suffix.lower() # '.pdf', '.docx', '.png', ...
 
-    if suffix == ".pdf":                              # ── PDF
-        with fitz.open(p) as pdf:
-            return "\n".join(page.get_text() for page in pdf)
+    if suffix == ".pdf" or suffix in IMAGE_SUFFIXES:  # ── PDF / Image
+        total = _count_units(p, suffix)
+        fn = _pdf_pages if suffix == ".pdf" else _ocr_frames
+        per_task = PAGES_PER_TASK if suffix == ".pdf" else 1
+        n = _auto_workers(total, per_task, workers)
+        if n <= 1:
+            for start in range(0, total, per_task):
+                yield from fn(str(p), start, min(start + per_task, total), ocr_dpi)
+        else:
+            yield from _parallel(fn, p, total, n, per_task, ocr_dpi)
 
     elif suffix in {".docx", ".doc"}:                 # ── DOCX
+        import docx          # python-docx
         doc = docx.Document(p)
-        return "\n".join(par.text for par in doc.paragraphs)
+        for par in doc.paragraphs:
+            yield par.text
+
+    elif suffix == ".txt":                            # ── Plain text
+        yield p.read_text(encoding="utf-8", errors="ignore")
+
+    else:
+        raise ValueError(f"Unsupported file type: {suffix}")
 
-    elif suffix in {".png", ".jpg", ".jpeg", ".tiff", ".bmp"}:  # ── Image
-        img = Image.open(p)
-        return pytesseract.image_to_string(img)
-    elif suffix == ".txt":                         # ── Plain text
-        return p.read_text(encoding="utf-8", errors="ignore")
 
-    raise ValueError(f"Unsupported file type: {suffix}")
+def extract_text(path, workers: Optional[int] = None,
+                 ocr_dpi: Optional[int] = OCR_DPI) -> str:
+    """
+    Accepts str or pathlib.Path.  Detects file type by extension,
+    extracts visible text, and returns one big string.
+    """
+    return "\n".join(iter_pages(path, workers=workers, ocr_dpi=ocr_dpi))
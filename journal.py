@@ -0,0 +1,61 @@
+"""
+journal.py
+----------
+Write-ahead journal for deck builds.  Every chunk's cards are appended to a
+JSONL file (and fsync'ed) the moment they come back from the API, so a build
+that dies half-way can be resumed without paying for finished chunks again.
+
+Each line is one finished chunk::
+
+    {"chunk": "<sha256 of chunk text>", "i": 17, "cards": [ … ]}
+
+Chunks are matched by content hash, not position, so a resume is correct even
+if chunk order changes.  A torn last line (crash mid-write) is ignored.
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import json, os, pathlib
+from typing import Dict, List
+
+# ── 2. Journal ─────────────────────────────────────────────────────────────
+
+class CardJournal:
+    """Append-only JSONL log of ``chunk hash → cards``."""
+
+    def __init__(self, path, *, resume: bool = False):
+        self.path = pathlib.Path(path)
+        self.done: Dict[str, List[dict]] = self._load() if resume else {}
+        # resume → keep appending; fresh build → start a new journal
+        self._fh = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._fh.tell() and not self._ends_with_newline():
+            self._fh.write("\n")                 # fence off a torn last line
+
+    def _load(self) -> Dict[str, List[dict]]:
+        done: Dict[str, List[dict]] = {}
+        if not self.path.exists():
+            return done
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue                      # torn write from a crash
+                done[rec["chunk"]] = rec["cards"]
+        return done
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) == b"\n"
+
+    def append(self, chunk_hash: str, index: int, cards: List[dict]) -> None:
+        """Durably record one finished chunk."""
+        self._fh.write(json.dumps({"chunk": chunk_hash, "i": index, "cards": cards},
+                                  ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.done[chunk_hash] = cards
+
+    def close(self) -> None:
+        self._fh.close()
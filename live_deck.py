@@ -0,0 +1,125 @@
+"""
+live_deck.py
+------------
+Play while the deck is still being generated.
+
+``LiveDeck.start`` runs ``flashcard_gen.build_deck`` on a background
+thread; every chunk's cards go into a thread-safe queue the moment they
+exist (``build_deck(on_cards=...)``), and the games draw from it:
+``game1_cli.play_curate(..., live=deck)`` and the Game 2 drills top up
+their pools / due queues between questions and only block when they have
+nothing left to show.  The deck files are still written once, when
+generation finishes.
+
+The builder's progress lines go to ``<deck>.build.log`` instead of the
+terminal (``metrics.log_to`` on the builder thread and its workers), so
+they don't interleave with the game's prompts; ``sys.stdout`` is left alone.
+
+Typical usage
+-------------
+>>> live = LiveDeck.start(chunks, "deposition", max_cards_per_chunk=3)
+>>> play_mc([], live=live)                  # first cards after one API round-trip
+>>> deck_path = live.wait()
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import pathlib, queue, threading
+from typing import List, Optional
+
+import metrics
+
+# ── 2. Live deck ───────────────────────────────────────────────────────────
+
+class LiveDeck:
+    """Cards of a deck that is still being built, in arrival order."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[List[dict]]]" = queue.Queue()
+        self.finished = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.deck_path: Optional[pathlib.Path] = None
+        self.received = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def start(cls, chunks: List[str], deck_name: str, *, out_dir=None, report=None,
+              **build_kw) -> "LiveDeck":
+        """Start ``build_deck(chunks, deck_name, **build_kw)`` in the background;
+        with ``report`` (a path) the ``metrics`` report is written as soon as
+        generation ends, so it covers the build, not the game."""
+        from flashcard_gen import _out_path, build_deck
+        live = cls()
+        log = open(_out_path(deck_name, ".build.log", out_dir), "w", encoding="utf-8")
+        log_lock = threading.Lock()
+
+        def write(line: str) -> None:
+            with log_lock:                      # builder + cardgen threads
+                log.write(line + "\n")
+                log.flush()
+
+        def run():
+            try:
+                with metrics.log_to(write):
+                    try:
+                        live.deck_path = build_deck(chunks, deck_name, out_dir=out_dir,
+                                                    on_cards=live.put, **build_kw)
+                    finally:
+                        if report is not None:
+                            metrics.write_report(report, deck=deck_name)
+            except BaseException as e:          # surfaced by wait()
+                live.error = e
+            finally:
+                log.close()
+                live.finished.set()
+                live._queue.put(None)           # wake a blocked reader
+
+        live._thread = threading.Thread(target=run, name="live-build", daemon=True)
+        live._thread.start()
+        return live
+
+    @property
+    def done(self) -> bool:
+        """Generation is over and every card has been handed out."""
+        with self._queue.mutex:
+            pending = any(self._queue.queue)
+        return self.finished.is_set() and not pending
+
+    def put(self, cards: List[dict]) -> None:
+        self._queue.put(cards)
+
+    def drain(self) -> List[dict]:
+        """Every card that arrived since the last call (never blocks)."""
+        out: List[dict] = []
+        while True:
+            try:
+                batch = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if batch:
+                out.extend(batch)
+        self.received += len(out)
+        return out
+
+    def next_batch(self, timeout: Optional[float] = None) -> List[dict]:
+        """Block until new cards arrive; ``[]`` once generation is over
+        (or after ``timeout`` seconds)."""
+        out = self.drain()
+        while not out and not (self.finished.is_set() and self._queue.empty()):
+            try:
+                batch = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if batch:
+                out.extend(batch)
+                self.received += len(batch)
+                out.extend(self.drain())
+        return out
+
+    def wait(self) -> pathlib.Path:
+        """Block until the deck files are written; re-raise a build error."""
+        if self._thread is not None:
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.deck_path
@@ -0,0 +1,102 @@
+"""
+manifest.py
+-----------
+Per-document build manifest for incremental re-builds.  It remembers, for
+every chunk the last finished build got an answer for, the chunk's content
+hash and the cards (with their IDs) it produced::
+
+    {"version": 1, "max_cards": 3,
+     "chunks": {"<sha256 of chunk>": [{"id": "3f9a…-0", "front": …}, …]}}
+
+When an amended transcript is re-run, chunks whose hash is already in the
+manifest reuse their cards as-is — same text, same card IDs, so Anki keeps
+their review history — and only new or edited chunks go to the LLM.  Chunks
+that disappeared take their cards with them; chunks that got no usable
+answer are not recorded, so they count as new next time.
+
+Typical usage
+-------------
+>>> m = DeckManifest("deposition.manifest.json")
+>>> reuse, todo, removed = m.diff(hashes)
+>>> …                                  # generate cards for ``todo`` only
+>>> m.save(hashes, per_chunk, max_cards=3)
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import hashlib, json, os, pathlib
+from typing import Dict, List, Sequence, Tuple
+
+import metrics
+
+VERSION = 1
+
+# ── 2. Stable IDs ──────────────────────────────────────────────────────────
+
+def card_id(chunk_hash: str, k: int) -> str:
+    """ID of the ``k``-th card generated from a chunk."""
+    return f"{chunk_hash[:16]}-{k}"
+
+
+def assign_ids(chunk_hash: str, cards: List[dict]) -> List[dict]:
+    """Give every card of one chunk a stable ``id`` (existing IDs are kept)."""
+    for k, card in enumerate(cards):
+        card.setdefault("id", card_id(chunk_hash, k))
+    return cards
+
+
+def deck_id(deck_name: str) -> int:
+    """Anki deck ID derived from the deck name, so re-imports update in place."""
+    digest = hashlib.sha256(deck_name.encode("utf-8")).digest()
+    return (1 << 30) + int.from_bytes(digest[:4], "big") % (1 << 30)
+
+# ── 3. Manifest ────────────────────────────────────────────────────────────
+
+class DeckManifest:
+    """``chunk hash → cards`` of the last finished build of one document."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.max_cards = None
+        self.chunks: Dict[str, List[dict]] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                metrics.say(f"[manifest] ⚠️  Ignoring unreadable {self.path.name}: {e}")
+                return
+            if data.get("version") == VERSION:
+                self.max_cards = data.get("max_cards")
+                self.chunks = data.get("chunks", {})
+
+    def diff(self, hashes: Sequence[str], max_cards: int = None
+             ) -> Tuple[Dict[str, List[dict]], List[int], List[str]]:
+        """Split a new chunk list against the manifest.
+
+        Returns ``(reuse, todo, removed)``: cards to reuse keyed by chunk
+        hash, indices of chunks that need generating, and hashes of chunks
+        that are gone.  A different ``max_cards`` invalidates everything.
+        """
+        old = self.chunks if max_cards in (None, self.max_cards) else {}
+        current = set(hashes)
+        reuse = {h: old[h] for h in current if h in old}
+        todo = [i for i, h in enumerate(hashes) if h not in reuse]
+        removed = [h for h in self.chunks if h not in current]
+        if self.chunks:
+            metrics.say(f"[manifest] {len(reuse)} unchanged, {len(todo)} new/changed, "
+                        f"{len(removed)} removed chunk(s) vs {self.path.name}")
+        return reuse, todo, removed
+
+    def save(self, hashes: Sequence[str], per_chunk: Sequence[List[dict]],
+             max_cards: int = None) -> None:
+        """Replace the manifest with the chunks of a finished build (atomically)."""
+        self.max_cards = max_cards
+        self.chunks = {}
+        for h, cards in zip(hashes, per_chunk):
+            self.chunks.setdefault(h, cards)    # a repeated chunk's cards live on its first copy
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": VERSION, "max_cards": max_cards,
+                                   "chunks": self.chunks}, ensure_ascii=False),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+        metrics.say("[manifest] Manifest written →", self.path)
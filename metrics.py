@@ -0,0 +1,278 @@
+"""
+metrics.py
+----------
+Process-wide timing, token and cost counters for one pipeline run, plus
+optional profiler hooks.  Everything is thread-safe and stdlib-only, so
+any module can record into it without import cost.
+
+* ``stage(name)``      – context manager adding wall time to a stage
+  (stages timed inside worker threads, e.g. ``rate_limit_wait``, add up
+  across threads and can exceed the run's wall time).
+* ``timed_iter``       – same for the time a (streaming) iterator spends
+  producing items, e.g. page extraction feeding the chunker.
+* ``count(name, n)``   – plain counters (cache hits, pages, retries …).
+* ``api_call(...)``    – one LLM / embedding request: latency, tokens from
+  ``resp.usage``, retries and estimated USD cost (``PRICES``).
+* ``write_report``     – everything as JSON, with latency percentiles and
+  the slowest / most expensive requests called out.
+* ``profiled(engine, path)`` – cProfile (``.prof``) or pyinstrument
+  (``.html``) around a block.
+* ``say(...)``         – ``print`` for build progress lines; ``log_to(fn)``
+  sends them to ``fn(line)`` for the current thread (and the worker calls
+  wrapped with ``carry_log``) instead of the terminal.
+
+Typical usage
+-------------
+>>> with stage("generate"):
+...     resp = client.chat.completions.create(...)
+>>> api_call("chunk", MODEL, 1.7, resp.usage, retries=0, ref="3f2a…")
+>>> write_report("deposition.metrics.json", document="deposition.pdf")
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import contextlib, json, pathlib, threading, time
+from typing import Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# USD per 1M (input, output) tokens; batch requests are billed at half
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+BATCH_DISCOUNT = 0.5
+CACHED_DISCOUNT = 0.5         # prompt-cache hits are billed at half the input price
+OUTLIERS = 10                 # slowest / costliest requests listed in the report
+
+_lock = threading.Lock()
+_stages: dict = {}            # name → {"seconds", "calls"}
+_counters: dict = {}
+_calls: list = []
+_started = time.time()
+
+# ── 2. Recording ───────────────────────────────────────────────────────────
+
+def add_time(name: str, seconds: float) -> None:
+    with _lock:
+        s = _stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        s["seconds"] += seconds
+        s["calls"] += 1
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time the ``with`` block as stage ``name`` (re-entries add up)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - t0)
+
+
+def timed_iter(name: str, items: Iterable[T], counter: Optional[str] = None) -> Iterator[T]:
+    """Yield from ``items``, charging only the time spent *producing* each
+    item to stage ``name`` (the consumer's time is not counted)."""
+    it = iter(items)
+    spent, n = 0.0, 0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                spent += time.perf_counter() - t0
+                return
+            spent += time.perf_counter() - t0
+            n += 1
+            yield item
+    finally:
+        add_time(name, spent)
+        if counter:
+            count(counter, n)
+
+
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int, batch: bool = False,
+         cached_tokens: int = 0) -> float:
+    """Estimated USD for one request (0 for models not in ``PRICES``)."""
+    p_in, p_out = PRICES.get(model, (0.0, 0.0))
+    billed_in = prompt_tokens - cached_tokens * (1 - CACHED_DISCOUNT)
+    usd = (billed_in * p_in + completion_tokens * p_out) / 1e6
+    return usd * BATCH_DISCOUNT if batch else usd
+
+
+def api_call(kind: str, model: str, seconds: Optional[float], usage=None, *,
+             retries: int = 0, ref: Optional[str] = None, batch: bool = False) -> None:
+    """Record one API request; ``usage`` is ``resp.usage`` (object or dict)."""
+    get = usage.get if isinstance(usage, dict) else (lambda k, d=0: getattr(usage, k, d))
+    prompt = int(get("prompt_tokens", 0) or 0) if usage is not None else 0
+    completion = int(get("completion_tokens", 0) or 0) if usage is not None else 0
+    details = get("prompt_tokens_details", None) if usage is not None else None
+    cached = (details.get("cached_tokens") if isinstance(details, dict)
+              else getattr(details, "cached_tokens", 0)) or 0
+    row = {"kind": kind, "model": model, "ref": ref,
+           "seconds": round(seconds, 4) if seconds is not None else None,
+           "prompt_tokens": prompt, "cached_tokens": int(cached), "completion_tokens": completion,
+           "retries": retries, "usd": round(cost(model, prompt, completion, batch, int(cached)), 6)}
+    with _lock:
+        _calls.append(row)
+
+
+def reset() -> None:
+    """Forget everything recorded so far (e.g. between documents)."""
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _calls.clear()
+        _started = time.time()
+
+# ── 3. Report ──────────────────────────────────────────────────────────────
+
+def _percentile(sorted_values: list, q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[i], 4)
+
+
+def snapshot() -> dict:
+    """Current totals as a JSON-ready dict."""
+    with _lock:
+        stages = {k: dict(v) for k, v in _stages.items()}
+        counters = dict(_counters)
+        calls = list(_calls)
+        started = _started
+
+    by_kind: dict = {}
+    for c in calls:
+        k = by_kind.setdefault(c["kind"], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                           "completion_tokens": 0, "retries": 0, "usd": 0.0,
+                                           "_lat": []})
+        k["calls"] += 1
+        k["prompt_tokens"] += c["prompt_tokens"]
+        k["cached_tokens"] += c["cached_tokens"]
+        k["completion_tokens"] += c["completion_tokens"]
+        k["retries"] += c["retries"]
+        k["usd"] += c["usd"]
+        if c["seconds"] is not None:
+            k["_lat"].append(c["seconds"])
+    for k in by_kind.values():
+        lat = sorted(k.pop("_lat"))
+        k["usd"] = round(k["usd"], 6)
+        k["latency"] = {"p50": _percentile(lat, 0.5), "p95": _percentile(lat, 0.95),
+                        "max": lat[-1] if lat else None,
+                        "mean": round(sum(lat) / len(lat), 4) if lat else None}
+
+    for s in stages.values():
+        s["seconds"] = round(s["seconds"], 4)
+    timed = [c for c in calls if c["seconds"] is not None]
+    return {
+        "started": started,
+        "wall_seconds": round(time.time() - started, 3),
+        "stages": stages,
+        "counters": counters,
+        "api": by_kind,
+        "tokens": {"prompt": sum(c["prompt_tokens"] for c in calls),
+                   "cached": sum(c["cached_tokens"] for c in calls),
+                   "completion": sum(c["completion_tokens"] for c in calls)},
+        "usd": round(sum(c["usd"] for c in calls), 6),
+        "slowest": sorted(timed, key=lambda c: -c["seconds"])[:OUTLIERS],
+        "costliest": sorted(calls, key=lambda c: -c["usd"])[:OUTLIERS],
+        "calls": calls,
+    }
+
+
+def summary_line(data: Optional[dict] = None) -> str:
+    data = data or snapshot()
+    stages = ", ".join(f"{k} {v['seconds']:.1f}s" for k, v in data["stages"].items())
+    calls = sum(k["calls"] for k in data["api"].values())
+    return (f"{data['wall_seconds']:.1f}s wall ({stages or 'no stages'}); {calls} API call(s), "
+            f"{data['tokens']['prompt']}+{data['tokens']['completion']} tokens, "
+            f"≈ ${data['usd']:.4f}")
+
+
+def write_report(path, **meta) -> pathlib.Path:
+    """Write ``snapshot()`` (plus ``meta``, e.g. the document name) as JSON."""
+    data = snapshot()
+    path = pathlib.Path(path)
+    path.write_text(json.dumps({**meta, **data}, ensure_ascii=False, indent=2), encoding="utf-8")
+    say(f"[metrics] {summary_line(data)}")
+    say("[metrics] Report written →", path)
+    return path
+
+# ── 4. Profiling ───────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def profiled(engine: Optional[str], path):
+    """Profile the block with ``"cprofile"`` (stats to ``path``, open with
+    ``snakeviz`` / ``pstats``) or ``"pyinstrument"`` (HTML); ``None`` is a no-op."""
+    if not engine:
+        yield
+        return
+    path = pathlib.Path(path)
+    if engine == "pyinstrument":
+        from pyinstrument import Profiler
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            path.write_text(prof.output_html(), encoding="utf-8")
+            print("[metrics] pyinstrument profile written →", path)
+    else:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(str(path))
+            print("[metrics] cProfile stats written →", path)
+
+# ── 5. Progress lines ──────────────────────────────────────────────────────
+
+_log = threading.local()      # .fn: where say() sends this thread's lines
+
+
+def say(*parts) -> None:
+    """``print(*parts)``, or one line to this thread's ``log_to`` callback."""
+    fn = getattr(_log, "fn", None)
+    if fn is None:
+        print(*parts)
+    else:
+        fn(" ".join(str(p) for p in parts))
+
+
+@contextlib.contextmanager
+def log_to(fn):
+    """Send ``say`` lines of the current thread to ``fn(line)`` inside the
+    block (``None`` = the terminal); other threads are not affected."""
+    old = getattr(_log, "fn", None)
+    _log.fn = fn
+    try:
+        yield
+    finally:
+        _log.fn = old
+
+
+def carry_log(call):
+    """``call`` wrapped so it logs where the *submitting* thread does —
+    for work handed to a thread pool."""
+    fn = getattr(_log, "fn", None)
+    if fn is None:
+        return call
+
+    def run(*args, **kwargs):
+        with log_to(fn):
+            return call(*args, **kwargs)
+    return run
@@ -1,10 +1,9 @@
 # pipeline.py — one‑shot workflow: PDF → Anki deck (+ JSON) → optional Game 2
 from __future__ import annotations
-import pathlib, sys, pickle, argparse
-from driver import run_extraction
-from flashcard_gen import build_deck
+import pathlib, sys, argparse
 from game2_cli import load_cards
-import random
+from ratelimit import RateLimiter
+import metrics
 
 
 def main():
@@ -14,13 +13,63 @@ def main():
                      help="Path to PDF / DOCX / image (prompted if omitted)")
     cli.add_argument("--tokens", type=int, default=700,
                      help="Max tokens per chunk (default 700)")
+    cli.add_argument("--overlap", type=int, default=0,
+                     help="Tokens repeated from the previous chunk (default 0)")
     cli.add_argument("--cards", type=int, default=3,
                      help="Max cards per chunk (default 3)")
     cli.add_argument("-n", "--test-chunks", type=int, default=None,
-                     help="Process only first N chunks (interactive prompt if missing)")
+                     help="Test mode: process only the N top-scoring chunks "
+                          "(see select_chunks; interactive prompt if missing)")
     cli.add_argument("--endless", action="store_true",
                      help="Endless mode for Game 2")
+    cli.add_argument("--concurrency", type=int, default=4,
+                     help="Parallel card-generation requests (default 4)")
+    cli.add_argument("--rpm", type=float, default=None,
+                     help="Max OpenAI requests per minute (default: unlimited)")
+    cli.add_argument("--tpm", type=float, default=None,
+                     help="Max OpenAI tokens per minute (default: unlimited)")
+    cli.add_argument("--no-cache", action="store_true",
+                     help="Bypass the on-disk LLM response cache")
+    cli.add_argument("--refresh", action="store_true",
+                     help="Regenerate every chunk and overwrite cached responses")
+    cli.add_argument("--resume", action="store_true",
+                     help="Continue an interrupted build from its card journal")
+    cli.add_argument("--batch", action="store_true",
+                     help="Generate via the OpenAI Batch API (slow, half price)")
+    cli.add_argument("--poll", type=float, default=30.0,
+                     help="Seconds between batch status polls (default 30)")
+    cli.add_argument("--workers", type=int, default=None,
+                     help="Extraction/OCR processes (default: auto, 0 = in-process)")
+    cli.add_argument("--ocr-dpi", type=int, default=300,
+                     help="DPI for OCR of scanned PDF pages (0 = no OCR fallback)")
+    cli.add_argument("--dedup", action="store_true",
+                     help="Merge near-duplicate cards")
+    cli.add_argument("--dedup-threshold", type=float, default=0.6, metavar="THRESHOLD",
+                     help="Similarity at which --dedup merges two cards (default 0.6)")
+    cli.add_argument("--dedup-method", choices=["minhash", "embedding"], default="minhash",
+                     help="minhash = local text similarity; embedding = OpenAI vectors")
+    cli.add_argument("--select", type=int, default=None, metavar="K",
+                     help="Send only the K most substantive chunks to the LLM")
+    cli.add_argument("--min-score", type=float, default=None,
+                     help="Skip chunks scoring below this (0‑1, local TF‑IDF/boilerplate score)")
+    cli.add_argument("--pack", action="store_true",
+                     help="Send several chunks per request")
+    cli.add_argument("--pack-tokens", type=int, default=6000, metavar="TOKENS",
+                     help="Chunk tokens per --pack request (default 6000)")
+    cli.add_argument("--live", action="store_true",
+                     help="Start playing while the deck is still being generated")
+    cli.add_argument("--profile", action="store_true",
+                     help="Profile the build (<file>.prof, or .profile.html for pyinstrument)")
+    cli.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+                     help="Profiler used by --profile (default cprofile)")
+    cli.add_argument("--metrics", type=pathlib.Path, default=None,
+                     help="Timing / token / cost report path (default <file>.metrics.json)")
     args = cli.parse_args()
+    if args.profile and args.live:
+        # the live build runs on a background thread the profiler would not see
+        cli.error("--profile cannot be combined with --live")
+    # one RPM/TPM budget for the build and Game 1's background refurbishing
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
 
     # ── 1. Ask for file path if missing ───────────────────────────────────
     pdf_path: pathlib.Path
@@ -34,51 +83,113 @@ def main():
                 break
             print("❌  File not found — try again.\n")
 
-    # ── 1‑b. Quick‑play if user gave a .cards.json file ───────────────────────
+    # ── 1‑b. Quick‑play if user gave a .cards.json file (nothing to measure)
     if pdf_path.suffix.lower() == ".json":
-        json_path = pdf_path
-        print(f"\n▶  Using pre‑existing card set: {json_path.name}")
-        # ask play‑prompt just like normal build path
-        goto_play = True
-    else:
-        goto_play = False
+        print(f"\n▶  Using pre‑existing card set: {pdf_path.name}")
+        play, _ = _choose_game(args, limiter)
+        play(load_cards(pdf_path), pdf_path)
+        return
 
     # ── 2. Ask for test‑mode if flag not supplied ─────────────────────────
     if args.test_chunks is None:
         reply = input("Activate test mode? (y/n) ").lower().strip()
         if reply.startswith("y"):
             while True:
-                cnt = input("How many random chunks (1‑5)? ").strip()
+                cnt = input("How many chunks (1‑5)? ").strip()
                 if cnt.isdigit() and 1 <= int(cnt) <= 5:
                     args.test_chunks = int(cnt)
                     break
                 print("Please enter a number between 1 and 5.")
 
-    if not goto_play:
-        # ── 3. Extract & chunk ────────────────────────────────────────────────
-        print(f"\n▶  Extracting & chunking {pdf_path.name} …")
-        chunks = run_extraction(pdf_path, max_tokens=args.tokens)
-    if args.test_chunks:
-        take = min(args.test_chunks, len(chunks))
-        chunks = random.sample(chunks, take)
-        print(f"[pipeline] Test mode ON — using {take} random chunk(s)")
-
-        # ── 4. Cache chunks to .pkl ───────────────────────────────────────────
-        cache_path = pdf_path.with_suffix(".chunks.pkl")
-        cache_path.write_bytes(pickle.dumps(chunks))
-        print(f"[pipeline] Chunks cached → {cache_path.name}")
-
-        # ── 5. Build deck + JSON ─────────────────────────────────────────────
-        deck_name = pdf_path.stem + ("_TEST" if args.test_chunks else "")
-        deck_path = build_deck(chunks, deck_name=deck_name,
-                            max_cards_per_chunk=args.cards)
-        json_path = deck_path.with_suffix(".cards.json")
-
+    # live mode asks for the game up front; review mode needs the finished deck
+    play, live_ok = _choose_game(args, limiter) if args.live else (None, False)
+
+    # ── 2‑a. Timing / token / cost report (+ optional profile) for the build
+    # only — the report is written before the game starts
+    report_path = args.metrics or pdf_path.with_name(pdf_path.stem + ".metrics.json")
+    prof_path = pdf_path.with_name(pdf_path.stem + (".profile.html"
+                                                     if args.profiler == "pyinstrument" else ".prof"))
+    live = None
+    try:
+        with metrics.profiled(args.profiler if args.profile else None, prof_path):
+            json_path, live = _build(args, pdf_path, live_ok, report_path, limiter)
+    finally:
+        if live is None:               # a live build writes it when generation ends
+            metrics.write_report(report_path, document=str(pdf_path))
+
+    # ── 6. Play ───────────────────────────────────────────────────────────
+    if live is not None:
+        play([], json_path, live=live)
+        if not live.finished.is_set():
+            print("\n⏳  Finishing the deck …")
+        deck_path = live.wait()
         print(f"\n✅  Deck:  {deck_path.name}")
-        print(f"✅  JSON:  {json_path.name}")
-        json_path = deck_path.with_suffix(".cards.json")
-
-        # ── 6. Choose which game to play ─────────────────────────────────────
+        print(f"✅  JSON:  {deck_path.with_suffix('.cards.json').name}")
+        return
+    if play is None:
+        play, _ = _choose_game(args, limiter)
+    play(load_cards(json_path), json_path)
+
+
+def _build(args, pdf_path: pathlib.Path, live: bool, report_path, limiter):
+    """Extract, chunk and build; return ``(json_path, None)``, or with
+    ``live`` the expected JSON path and the started ``LiveDeck``."""
+    # heavy imports (tokenizer, OpenAI, PDF/OCR libs) only on the build path
+    from driver import run_extraction
+    from card_store import STORE_PATH
+    from flashcard_gen import _out_path, build_deck
+
+    # ── 3/4. Extract & chunk (reused from .chunks.sqlite when unchanged)
+    print(f"\n▶  Extracting & chunking {pdf_path.name} …")
+    chunks = run_extraction(pdf_path, max_tokens=args.tokens,
+                            workers=args.workers, ocr_dpi=args.ocr_dpi,
+                            overlap=args.overlap,
+                            store_path=pdf_path.with_suffix(".chunks.sqlite"))
+    if args.test_chunks or args.select or args.min_score is not None:
+        from select_chunks import select_chunks
+        take = min(filter(None, [args.test_chunks, args.select])) \
+            if (args.test_chunks or args.select) else None
+        keep = select_chunks(chunks, top_k=take, min_score=args.min_score)
+        chunks = [chunks[i] for i in keep]
+        if args.test_chunks:
+            print(f"[pipeline] Test mode ON — using the {len(chunks)} top-scoring chunk(s)")
+
+    # ── 5. Build deck + JSON ─────────────────────────────────────────────
+    deck_name = pdf_path.stem + ("_TEST" if args.test_chunks else "")
+    build_kw = dict(max_cards_per_chunk=args.cards,
+                    concurrency=args.concurrency,
+                    limiter=limiter,
+                    use_cache=not args.no_cache,
+                    refresh=args.refresh,
+                    resume=args.resume,
+                    batch_state=(pdf_path.with_suffix(".batch.json")
+                                 if args.batch else None),
+                    poll_interval=args.poll,
+                    dedup=args.dedup_threshold if args.dedup else None,
+                    dedup_method=args.dedup_method,
+                    manifest=pdf_path.with_name(deck_name + ".manifest.json"),
+                    pack=args.pack_tokens if args.pack else None,
+                    card_store=STORE_PATH)          # the store the games load from
+
+    # ── 5‑b. Live mode: play while the cards are still being generated
+    if live:
+        from live_deck import LiveDeck
+        print("\n▶  Generating in the background — first cards in a few seconds …")
+        return (_out_path(deck_name, ".cards.json"),
+                LiveDeck.start(chunks, deck_name, report=report_path, **build_kw))
+
+    deck_path = build_deck(chunks, deck_name=deck_name, **build_kw)
+    json_path = deck_path.with_suffix(".cards.json")
+
+    print(f"\n✅  Deck:  {deck_path.name}")
+    print(f"✅  JSON:  {json_path.name}")
+    return json_path, None
+
+
+def _choose_game(args, limiter=None):
+    """Ask which game to play; return ``(play(cards, json_path[, live]),
+    takes_live)`` — review mode needs the finished deck.  Game 1 calls
+    the API through ``limiter``."""
     game_choice = input(
         "\nPlay a game now?  1) Curate & Improve   2) Mastery Drill   (n = cancel) : "
     ).lower().strip()
@@ -94,23 +205,28 @@ def main():
     # ── 6‑b. Game‑specific options & launcher ─────────────────────────────
     if game_choice == "1":                         # Curate & Improve
         from game1_cli import play_curate
-        play_curate(load_cards(json_path), str(json_path))   # ← pass path
+        return (lambda cards, json_path, live=None:
+                play_curate(cards, str(json_path), live=live, limiter=limiter)), True   # ← pass path
 
     else:                                          # Mastery Drill
         while True:
-            gm2_mode = input("Mode: 1) Basic  2) Multiple‑choice : ").strip()
-            if gm2_mode in {"1", "2"}:
+            gm2_mode = input("Mode: 1) Basic  2) Multiple‑choice  3) Review due cards : ").strip()
+            if gm2_mode in {"1", "2", "3"}:
                 break
         endless = args.endless
         if not endless:
             endless = input("Enable endless mode? (y/N) ").lower().startswith("y")
 
-        if gm2_mode == "2":
+        if gm2_mode == "3":
+            from game2_cli import play_review
+            return (lambda cards, json_path: play_review(cards, endless=endless)), False
+        elif gm2_mode == "2":
             from game2_cli import play_mc as play_drill
         else:
             from game2_cli import play_basic as play_drill
 
-        play_drill(load_cards(json_path), endless=endless)
+        return (lambda cards, json_path, live=None:
+                play_drill(cards, endless=endless, live=live)), True
 
 #----
 if __name__ == "__main__":
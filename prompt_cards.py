@@ -1,13 +1,46 @@
-import json, pathlib, genanki, random
-from openai import OpenAI
-from fastapi.responses import FileResponse
-
-def generate_from_prompt(topic: str, num_cards: int) -> FileResponse:
-    
-    client = OpenAI()
-    
+import asyncio, base64, json, pathlib, threading, time, random
+from collections import OrderedDict
+from concurrent.futures import Future
+from fastapi.responses import Response
+from anki_export import apkg_bytes, qa_model
+from cache import DiskCache, make_key
+
+MODEL = "gpt-4o-mini"
+DECK_TTL = 24 * 3600.0            # seconds a generated topic deck is reused
+MEMORY_DECKS = 64                 # decks kept in memory (LRU); older ones come from disk
+DECK_CACHE_PATH = pathlib.Path(".flashcard_cache") / "prompt_decks.sqlite"
+DECK_CACHE_MAX_BYTES = 128 << 20
+
+_client = _async_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Shared ``OpenAI`` client (created on first use)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI()
+    return _client
+
+def get_async_client():
+    """Shared ``AsyncOpenAI`` client for the service (created on first use)."""
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI()
+    return _async_client
+
+def set_client(client=None, async_client=None):
+    """Swap in other clients (e.g. ``fake_openai.FakeClient``); ``None`` →
+    the real ones are built again on next use."""
+    global _client, _async_client
+    with _client_lock:
+        _client, _async_client = client, async_client
+
+def _messages(topic: str, num_cards: int) -> list[dict]:
     # Prompt to instruct the AI to generate flashcards in JSON format
-    prompt = f"""
+    prompt = """
         You are an expert flash-card author.
 
         Goals:
@@ -25,56 +58,131 @@ def generate_from_prompt(topic: str, num_cards: int) -> FileResponse:
             ...
         ]
         }
-        Limit to **{{max_cards}}** cards.
+        Limit to **{{num_cards}}** cards.
         """
+    # Replace values within prompt with user inputted arguments
+    return [
+        {"role": "system", "content": prompt.replace("{{num_cards}}", str(num_cards)).replace("{{topic}}", topic)},
+        {"role": "user", "content": f"The topic is {topic} and I only want to make {num_cards} cards"}
+    ]
 
-    # Call OpenAI chat completion, replace values within prompt with user inputted arguments
-    response = client.chat.completions.create(
-        model = "gpt-4o-mini",
-        messages = [
-            {"role": "system", "content": prompt.replace("{{num_cards}}", str(num_cards)).replace("{{topic}}", topic)},
-            {"role": "user", "content": f"The topic is {topic} and I only want to make {num_cards} cards"}
-        ],
-        response_format = {"type": "json_object"} # Expect only JSON objects
-        
-    )
-    
-    cards = json.loads(response.choices[0].message.content)["cards"] # Parse "cards"
-    output_path = create_anki_deck(cards, topic)
-    return FileResponse(output_path, filename="flashcards.apkg", media_type="application/octet-stream") # Returns anki deck downloadable
-
-# Create an Anki deck file from "cards" and return the file path
-def create_anki_deck(response: list[dict], topic: str) -> str:
-    
-    # Model format for each note (flashcard)
-    my_model = genanki.Model(
-        1537156451, # Model ID
-        'Flashcard Model',
-        fields=[
-            {'name': 'Question'},
-            {'name': 'Answer'},
-        ],
-        templates=[ # CSS format for UI implementation
-            {
-            'name': 'Card 1',
-            'qfmt': '{{Question}}',
-            'afmt': '{{FrontSide}}<hr id="answer">{{Answer}}',
-            },
-        ])
-    
-    # Decks to store flashcards
-    my_deck = genanki.Deck(
-        random.randrange(1 << 30, 1 << 31), # Randomized deck ID (avoid overwrite when downloading decks)
-        topic)
-    
-    # Transfer API "cards" to flashcards 
-    for i in range(len(response)):
-        my_note = genanki.Note(
-            model = my_model,
-            fields = [response[i]["front"], response[i]["back"]]
+# ── Deck cache: memory LRU → SQLite (both with TTL), plus in-flight coalescing
+_memory: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+_memory_lock = threading.Lock()
+_disk = None
+_inflight: dict[str, Future] = {}         # sync callers waiting on one upstream call
+_ainflight: dict[str, asyncio.Task] = {}  # async callers (event-loop thread only)
+
+def _deck_key(topic: str, num_cards: int) -> str:
+    # case / whitespace differences are the same request
+    return make_key("prompt-deck", MODEL, " ".join(topic.lower().split()), int(num_cards))
+
+def _get_disk() -> DiskCache:
+    global _disk
+    with _memory_lock:
+        if _disk is None:
+            _disk = DiskCache(DECK_CACHE_PATH, max_bytes=DECK_CACHE_MAX_BYTES)
+    return _disk
+
+def _cached_deck(key: str) -> bytes | None:
+    now = time.time()
+    with _memory_lock:
+        hit = _memory.get(key)
+        if hit is not None and now - hit[0] < DECK_TTL:
+            _memory.move_to_end(key)
+            return hit[1]
+        _memory.pop(key, None)
+    entry = _get_disk().get(key)
+    if entry is not None and now - entry["created"] < DECK_TTL:
+        data = base64.b64decode(entry["apkg"])
+        _remember(key, data, entry["created"])
+        return data
+    return None
+
+def _remember(key: str, data: bytes, created: float) -> None:
+    with _memory_lock:
+        _memory[key] = (created, data)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_DECKS:
+            _memory.popitem(last=False)
+
+def _store_deck(key: str, data: bytes) -> None:
+    now = time.time()
+    _remember(key, data, now)
+    _get_disk().put(key, {"created": now, "apkg": base64.b64encode(data).decode("ascii")})
+
+def _deck_bytes(cards: list[dict], topic: str) -> bytes:
+    # built straight into memory — no temp .apkg to write and read back
+    return apkg_bytes(_notes(cards), topic, random.randrange(1 << 30, 1 << 31), qa_model())
+
+def _notes(cards: list[dict]):
+    return ((None, [c["front"], c["back"]]) for c in cards)
+
+def _deck_response(data: bytes) -> Response:
+    # Returns anki deck downloadable
+    return Response(data, media_type="application/octet-stream",
+                    headers={"Content-Disposition": 'attachment; filename="flashcards.apkg"'})
+
+def deck_for_topic(topic: str, num_cards: int) -> bytes:
+    """``.apkg`` bytes for a topic: cached, and concurrent identical
+    requests share one upstream call."""
+    key = _deck_key(topic, num_cards)
+    data = _cached_deck(key)
+    if data is not None:
+        return data
+    with _memory_lock:
+        fut = _inflight.get(key)
+        owner = fut is None
+        if owner:
+            fut = _inflight[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        # Call OpenAI chat completion
+        response = get_client().chat.completions.create(
+            model = MODEL,
+            messages = _messages(topic, num_cards),
+            response_format = {"type": "json_object"} # Expect only JSON objects
         )
-        my_deck.add_note(my_note) # Adds each note as a flashcard to the deck
-        
-    output_path = pathlib.Path(f"flashcards_{random.randint(100000,999999)}.apkg") # Avoids Overwrite during simultanious downloads
-    genanki.Package(my_deck).write_to_file(output_path) # Generates .apkg file
-    return output_path
\ No newline at end of file
+        cards = json.loads(response.choices[0].message.content)["cards"] # Parse "cards"
+        data = _deck_bytes(cards, topic)
+        _store_deck(key, data)
+        fut.set_result(data)
+        return data
+    except BaseException as e:
+        fut.set_exception(e)                # waiters fail too; nothing is cached
+        raise
+    finally:
+        with _memory_lock:
+            _inflight.pop(key, None)
+
+async def adeck_for_topic(topic: str, num_cards: int) -> bytes:
+    """Async :func:`deck_for_topic`: the API call awaits instead of blocking
+    a worker, and the genanki write runs in a thread."""
+    key = _deck_key(topic, num_cards)
+    data = await asyncio.to_thread(_cached_deck, key)
+    if data is not None:
+        return data
+    task = _ainflight.get(key)
+    if task is None:
+        task = _ainflight[key] = asyncio.create_task(_agenerate(key, topic, num_cards))
+        task.add_done_callback(lambda _: _ainflight.pop(key, None))
+    # shield: one caller disconnecting must not cancel the others' generation
+    return await asyncio.shield(task)
+
+async def _agenerate(key: str, topic: str, num_cards: int) -> bytes:
+    response = await get_async_client().chat.completions.create(
+        model = MODEL,
+        messages = _messages(topic, num_cards),
+        response_format = {"type": "json_object"}
+    )
+    cards = json.loads(response.choices[0].message.content)["cards"]
+    data = await asyncio.to_thread(_deck_bytes, cards, topic)
+    await asyncio.to_thread(_store_deck, key, data)
+    return data
+
+def generate_from_prompt(topic: str, num_cards: int) -> Response:
+    return _deck_response(deck_for_topic(topic, num_cards))
+
+async def agenerate_from_prompt(topic: str, num_cards: int) -> Response:
+    return _deck_response(await adeck_for_topic(topic, num_cards))
@@ -0,0 +1,124 @@
+"""
+ratelimit.py
+------------
+Thread-safe requests-per-minute / tokens-per-minute limiter plus a small
+retry helper for OpenAI 429s.  One ``RateLimiter`` is meant to be shared by
+every worker thread that talks to the API, so the whole process stays under
+the account limits no matter how many calls are in flight.
+
+Typical usage
+-------------
+>>> limiter = RateLimiter(rpm=500, tpm=200_000)
+>>> limiter.acquire(tokens=1_600)          # blocks until budget is free
+>>> resp = client.chat.completions.create(...)
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import random, threading, time
+from typing import Callable, Optional, TypeVar
+import metrics
+
+T = TypeVar("T")
+
+# ── 2. Token buckets ───────────────────────────────────────────────────────
+
+class _Bucket:
+    """Classic token bucket that refills ``per_minute`` units every 60 s."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0          # units per second
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available (0 → take them now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)    # oversize requests wait for a full bucket
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared RPM / TPM budget.  ``None`` for either limit disables it."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._req = _Bucket(rpm) if rpm else None
+        self._tok = _Bucket(tpm) if tpm else None
+        self._paused_until = 0.0
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request costing ``tokens`` fits in both budgets."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(0.0, self._paused_until - now)
+                if self._req:
+                    wait = max(wait, self._req.wait_for(1, now))
+                if self._tok:
+                    wait = max(wait, self._tok.wait_for(tokens, now))
+                if wait == 0.0:
+                    if self._req:
+                        self._req.take(1)
+                    if self._tok:
+                        self._tok.take(tokens)
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold *every* caller for ``seconds`` (used after the server says 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+# ── 3. Retry with exponential back-off ─────────────────────────────────────
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Read the server's ``retry-after`` hint from an OpenAI error, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def with_backoff(call: Callable[[], T], *, limiter: Optional[RateLimiter] = None,
+                 max_retries: int = 6, base_delay: float = 1.0,
+                 max_delay: float = 60.0) -> T:
+    """Run ``call()``; on HTTP 429 / transient errors sleep and try again.
+
+    Delay doubles each attempt (with jitter) unless the server sends a
+    ``retry-after`` header.  A shared ``limiter`` is paused too, so sibling
+    threads stop hammering the API while we wait.
+    """
+    from openai import RateLimitError, APIConnectionError, InternalServerError
+
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            metrics.count("retries")
+            delay = _retry_after(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                delay *= 0.5 + random.random()          # full jitter
+            metrics.say(f"[ratelimit] {type(e).__name__} — retry {attempt}/{max_retries} "
+                        f"in {delay:.1f}s")
+            if limiter is not None and isinstance(e, RateLimitError):
+                limiter.pause(delay)
+            time.sleep(delay)
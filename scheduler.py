@@ -0,0 +1,98 @@
+"""
+scheduler.py
+------------
+Spaced repetition for the Game 2 drills: SM-2 intervals / ease per card ID
+(persisted in ``card_store``) and a heap-backed queue keyed on due time.
+
+* ``sm2`` turns one right / wrong answer into the card's next review state.
+* ``DueQueue`` hands out the next card in O(log n) — missed cards go back
+  in with a later due time instead of being shifted through a list.
+* ``due_cards`` picks what a "review due cards" session should show:
+  everything overdue, plus a few never-seen cards.
+
+Typical usage
+-------------
+>>> states = load_states(store, [c["id"] for c in cards])
+>>> q = DueQueue()
+>>> for c in due_cards(cards, states): q.push(c, states.get(c["id"], NEW).due)
+>>> card = q.pop()
+>>> states[card["id"]] = sm2(states.get(card["id"], NEW), good=True)
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import heapq, itertools, time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+DAY = 86400.0
+MIN_EASE = 1.3
+NEW_PER_SESSION = 20          # unseen cards introduced per review session
+RELEARN_SECONDS = 60.0        # a missed card comes back this much later
+
+# ── 2. SM-2 ────────────────────────────────────────────────────────────────
+
+class Review(NamedTuple):
+    """Scheduling state of one card."""
+    ease: float = 2.5
+    interval: float = 0.0     # days
+    reps: int = 0             # successful reviews in a row
+    lapses: int = 0
+    due: float = 0.0          # epoch seconds; 0 → never reviewed
+
+
+NEW = Review()
+
+
+def sm2(state: Review, good: bool, now: Optional[float] = None) -> Review:
+    """Next state after one answer (``good`` ↔ SM-2 quality 4, else 1)."""
+    now = time.time() if now is None else now
+    q = 4 if good else 1
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    if not good:
+        return Review(ease, 1.0, 0, state.lapses + 1, now + DAY)
+    reps = state.reps + 1
+    interval = 1.0 if reps == 1 else 6.0 if reps == 2 else round(state.interval * ease, 1)
+    return Review(ease, interval, reps, state.lapses, now + interval * DAY)
+
+
+def load_states(store, card_ids: Iterable[str]) -> Dict[str, Review]:
+    """Saved states for ``card_ids`` (cards never reviewed are left out)."""
+    return {cid: Review(*row) for cid, row in store.reviews(card_ids).items()}
+
+
+def due_cards(cards: List[dict], states: Dict[str, Review], now: Optional[float] = None,
+              new_limit: int = NEW_PER_SESSION) -> List[dict]:
+    """Cards a review session should show: overdue ones, then up to
+    ``new_limit`` unseen ones (in deck order)."""
+    now = time.time() if now is None else now
+    due, fresh = [], []
+    for c in cards:
+        s = states.get(c["id"])
+        if s is None:
+            if len(fresh) < new_limit:
+                fresh.append(c)
+        elif s.due <= now:
+            due.append(c)
+    return due + fresh
+
+# ── 3. Queue ───────────────────────────────────────────────────────────────
+
+class DueQueue:
+    """Min-heap of cards by due time; ties keep insertion order."""
+
+    def __init__(self):
+        self._heap: list = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, card: dict, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._seq), card))
+
+    def pop(self) -> dict:
+        """The card due soonest (overdue first).  O(log n)."""
+        return heapq.heappop(self._heap)[2]
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
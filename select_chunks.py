@@ -0,0 +1,128 @@
+"""
+select_chunks.py
+----------------
+Cheap, local pre-filter that decides which chunks are worth a paid
+card-generation call.  Each chunk gets a score in ``[0, 1]``:
+
+    score = centrality × (1 − boilerplate)
+
+* **boilerplate** – share of lines that look like captions, appearances,
+  oath / certificate pages, breaks, stenographer notes and the like (the
+  things ``SYSTEM_PROMPT`` already tells the model to ignore).
+* **centrality** – cosine similarity of the chunk's TF-IDF vector (hashed to
+  ``DIM`` features) to the document centroid, or of its embedding if
+  vectors are supplied.
+
+Selection is greedy by score with a redundancy penalty (MMR), so the chosen
+chunks cover different parts of the testimony instead of ten copies of the
+same exchange.  No API calls are made.
+
+Typical usage
+-------------
+>>> keep = select_chunks(chunks, top_k=40)
+>>> chunks = [chunks[i] for i in keep]          # still in document order
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import re, zlib
+from typing import List, Optional
+
+import numpy as np
+
+DIM = 4096                    # hashed TF-IDF features
+MMR_LAMBDA = 0.7              # 1.0 = pure score, lower = more diversity
+
+_WORD = re.compile(r"[a-z][a-z']+")
+_BOILERPLATE = re.compile(r"""(?ix)
+      \b(court\s+reporter|certified\s+shorthand|c\.?s\.?r\.?\s*no|notary\s+public)\b
+    | ^\s*appearances\b | \bon\s+behalf\s+of\s+(the\s+)?(plaintiff|defendant)s?\b
+    | \b(reporter'?s?\s+certificate|certificate\s+of\s+(reporter|deponent))\b
+    | \b(duly\s+sworn|was\s+sworn|do\s+you\s+(solemnly\s+)?swear|penalty\s+of\s+perjury)\b
+    | \b(off\s+the\s+record|on\s+the\s+record|short\s+(break|recess)|take\s+a\s+break)\b
+    | \b(whereupon|(a\s+)?recess\s+was\s+taken|time\s+noted|deposition\s+concluded)\b
+    | \b(index\s+of\s+exhibits|exhibits?\s+marked|marked\s+for\s+identification)\b
+    | \b(videographer|stenograph\w*|page\s+\d+\s+of\s+\d+|errata)\b
+    | \b(good\s+(morning|afternoon)|thank\s+you\s+(very\s+much|counsel))\b
+    | ^\s*(case\s+no\.?|civil\s+action|in\s+the\s+(superior|district|circuit)\s+court)
+    | ^\s*[-_=*.\s]{4,}$
+""")
+
+# ── 2. Scoring ─────────────────────────────────────────────────────────────
+
+def boilerplate_ratio(chunk: str) -> float:
+    """Fraction of non-empty lines matching a boilerplate pattern."""
+    lines = [l for l in chunk.splitlines() if l.strip()]
+    if not lines:
+        return 1.0
+    return sum(1 for l in lines if _BOILERPLATE.search(l)) / len(lines)
+
+
+def tfidf_matrix(chunks: List[str], dim: int = DIM) -> np.ndarray:
+    """L2-normalised TF-IDF rows over hashed word features."""
+    tf = np.zeros((len(chunks), dim), dtype=np.float32)
+    for i, ch in enumerate(chunks):
+        for w in _WORD.findall(ch.lower()):
+            tf[i, zlib.crc32(w.encode()) % dim] += 1.0
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(chunks)) / (1 + df)).astype(np.float32) + 1.0
+    x = np.log1p(tf) * idf                                  # sub-linear TF
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def score_chunks(chunks: List[str], vectors: Optional[np.ndarray] = None, *,
+                 features: Optional[np.ndarray] = None) -> np.ndarray:
+    """One score per chunk (higher = more substantive).  ``features`` are
+    the unit rows from ``_features`` if the caller already has them."""
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    x = _features(chunks, vectors) if features is None else features
+    centroid = _unit(x.mean(axis=0, keepdims=True))[0]
+    centrality = np.clip(x @ centroid, 0.0, 1.0)
+    boiler = np.fromiter((boilerplate_ratio(c) for c in chunks), dtype=np.float32,
+                         count=len(chunks))
+    return centrality * (1.0 - boiler)
+
+
+def _features(chunks: List[str], vectors: Optional[np.ndarray]) -> np.ndarray:
+    """Unit rows compared by centrality and MMR: embeddings if given, else TF-IDF."""
+    return tfidf_matrix(chunks) if vectors is None else _unit(vectors)
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+# ── 3. Selection ───────────────────────────────────────────────────────────
+
+def select_chunks(chunks: List[str], top_k: Optional[int] = None,
+                  min_score: Optional[float] = None, *,
+                  vectors: Optional[np.ndarray] = None) -> List[int]:
+    """Indices of the chunks worth sending to the LLM, in document order.
+
+    ``min_score`` drops everything below the threshold; ``top_k`` then keeps
+    at most that many, picked by score with an MMR redundancy penalty.
+    With neither set, only pure boilerplate (score 0) is dropped.
+    """
+    x = _features(chunks, vectors) if chunks else None   # shared by scoring and MMR
+    scores = score_chunks(chunks, features=x)
+    floor = min_score if min_score is not None else 1e-6
+    pool = [i for i in range(len(chunks)) if scores[i] >= floor]
+    if top_k is None or top_k >= len(pool):
+        chosen = pool
+    else:
+        chosen, best_sim = [], np.zeros(len(chunks), dtype=np.float32)
+        candidates = np.array(pool)
+        for _ in range(top_k):
+            mmr = MMR_LAMBDA * scores[candidates] - (1 - MMR_LAMBDA) * best_sim[candidates]
+            pick = int(candidates[np.argmax(mmr)])
+            chosen.append(pick)
+            best_sim = np.maximum(best_sim, x @ x[pick])
+            candidates = candidates[candidates != pick]
+        chosen.sort()
+
+    print(f"[select_chunks] {len(chosen)}/{len(chunks)} chunk(s) selected "
+          f"({len(chunks) - len(pool)} boilerplate / below threshold)")
+    return chosen
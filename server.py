@@ -0,0 +1,251 @@
+"""
+server.py
+---------
+Async HTTP service around ``prompt_cards`` and the document → deck pipeline.
+
+* ``POST /prompt``           – topic → ``.apkg`` bytes (AsyncOpenAI; the deck
+  is built in memory in a thread and cached, no temp file).
+* ``POST /jobs?filename=…``  – upload a document (raw request body, streamed
+  to disk) and queue it; returns ``202`` with a job id.
+* ``GET  /jobs/{id}``        – status / progress snapshot.
+* ``GET  /jobs/{id}/events`` – the same as Server-Sent Events until the job ends.
+* ``GET  /jobs/{id}/deck``, ``/jobs/{id}/cards`` – results.
+* ``DELETE /jobs/{id}``      – cancel (if still queued) and delete its files;
+  a finished job keeps its done / failed status.
+
+Jobs run ``driver.run_extraction`` + ``flashcard_gen.build_deck`` in a
+bounded thread pool (``JOB_WORKERS``), each in its own temp directory, all
+sharing one rate limiter.  The event loop only ever awaits, so one slow
+generation never stalls other requests.  Every job also shares one LLM
+response cache.  Finished jobs and their files are removed after
+``JOB_TTL`` seconds.
+
+Typical usage
+-------------
+    uvicorn server:app --port 8000
+    curl -X POST --data-binary @depo.pdf "localhost:8000/jobs?filename=depo.pdf"
+    curl -N localhost:8000/jobs/<id>/events
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import asyncio, json, os, pathlib, re, shutil, tempfile, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+
+from prompt_cards import agenerate_from_prompt
+from ratelimit import RateLimiter
+
+JOB_WORKERS = int(os.environ.get("FLASHCARD_JOB_WORKERS", 2))
+MAX_PENDING = 32              # queued + running jobs before uploads get 503
+MAX_UPLOAD_BYTES = 512 << 20
+JOB_TTL = 3600.0              # seconds a finished job's files are kept
+CLEANUP_EVERY = 60.0
+UPLOAD_SUFFIXES = {".pdf", ".docx", ".doc", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+JOB_ROOT = pathlib.Path(tempfile.gettempdir()) / "flashcard-jobs"
+
+# ── 2. Jobs ────────────────────────────────────────────────────────────────
+
+class Job:
+    """State of one document build; mutated by its worker thread."""
+
+    def __init__(self, filename: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.dir = JOB_ROOT / self.id
+        self.dir.mkdir(parents=True)
+        self.source = self.dir / filename
+        self.deck_name = self.source.stem
+        self.params = params
+        self.status = "queued"              # queued → running → done | failed | cancelled
+        self.stage = "upload"
+        self.done = self.total = 0
+        self.error: Optional[str] = None
+        self.deck: Optional[pathlib.Path] = None
+        self.created = self.updated = time.time()
+        self.version = 0                    # bumped on every change (for /events)
+        self.future = None
+
+    def set(self, **fields) -> None:
+        self.__dict__.update(fields)
+        self.updated = time.time()
+        self.version += 1
+
+    def snapshot(self) -> dict:
+        return {"id": self.id, "status": self.status, "stage": self.stage,
+                "done": self.done, "total": self.total, "error": self.error,
+                "deck": f"/jobs/{self.id}/deck" if self.deck else None}
+
+
+_jobs: Dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+# one limit for every job — N concurrent builds must not each get the full RPM/TPM
+_limiter = RateLimiter(rpm=float(os.environ["FLASHCARD_RPM"]) if "FLASHCARD_RPM" in os.environ else None,
+                       tpm=float(os.environ["FLASHCARD_TPM"]) if "FLASHCARD_TPM" in os.environ else None)
+_cache = None                 # one DiskCache for every job (opened in ``lifespan``)
+
+
+def _run_job(job: Job) -> None:
+    from driver import run_extraction
+    from flashcard_gen import build_deck
+    # status changes happen under _jobs_lock, so DELETE cannot cancel a job
+    # (and remove its directory) while it is starting
+    with _jobs_lock:
+        if job.status != "queued":
+            return
+        job.set(status="running", stage="extract")
+    try:
+        # split the CPU between concurrent jobs instead of one pool per job per core
+        workers = max(1, (os.cpu_count() or 1) // JOB_WORKERS)
+        chunks = run_extraction(job.source, max_tokens=job.params["tokens"], workers=workers,
+                                store_path=job.dir / (job.deck_name + ".chunks.sqlite"))
+        job.set(stage="generate", total=len(chunks))
+        deck = build_deck(chunks, job.deck_name, job.params["cards"],
+                          concurrency=job.params["concurrency"], limiter=_limiter,
+                          dedup=job.params["dedup"], out_dir=job.dir,
+                          use_cache=_cache is not None, cache=_cache,
+                          progress=lambda done, total: job.set(done=done, total=total))
+        with _jobs_lock:
+            job.set(status="done", stage="finished", deck=deck)
+    except Exception as e:
+        with _jobs_lock:
+            job.set(status="failed", error=f"{type(e).__name__}: {e}")
+        print(f"[server] Job {job.id} failed: {e}")
+
+
+def _get_job(job_id: str) -> Job:
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "unknown job")
+    return job
+
+
+def _drop(job: Job) -> None:
+    with _jobs_lock:
+        _jobs.pop(job.id, None)
+    shutil.rmtree(job.dir, ignore_errors=True)
+
+
+async def _cleanup_loop() -> None:
+    while True:
+        await asyncio.sleep(CLEANUP_EVERY)
+        cutoff = time.time() - JOB_TTL
+        for job in list(_jobs.values()):
+            if job.status in {"done", "failed", "cancelled"} and job.updated < cutoff:
+                await asyncio.to_thread(_drop, job)
+
+# ── 3. App ─────────────────────────────────────────────────────────────────
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _cache
+    from cache import DiskCache
+    from flashcard_gen import CACHE_MAX_BYTES, CACHE_PATH
+    JOB_ROOT.mkdir(parents=True, exist_ok=True)
+    _cache = DiskCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES)
+    cleaner = asyncio.create_task(_cleanup_loop())
+    yield
+    cleaner.cancel()
+    _pool.shutdown(wait=True, cancel_futures=True)
+    _cache.close()
+
+
+app = FastAPI(title="flashcard-maker", lifespan=lifespan)
+
+
+@app.post("/prompt")
+async def prompt(topic: str, num_cards: int = 10):
+    return await agenerate_from_prompt(topic, num_cards)
+
+
+@app.post("/jobs", status_code=202)
+async def submit(request: Request, filename: str, cards: int = 3, tokens: int = 900,
+                 concurrency: int = 4, dedup: Optional[float] = None):
+    name = re.sub(r"[^\w.\-]+", "_", pathlib.Path(filename).name) or "upload"
+    if pathlib.Path(name).suffix.lower() not in UPLOAD_SUFFIXES:
+        raise HTTPException(415, f"unsupported file type: {pathlib.Path(name).suffix}")
+    with _jobs_lock:
+        if sum(j.status in {"queued", "running"} for j in _jobs.values()) >= MAX_PENDING:
+            raise HTTPException(503, "too many jobs in progress, try again later")
+        job = Job(name, {"cards": cards, "tokens": tokens,
+                         "concurrency": concurrency, "dedup": dedup})
+        _jobs[job.id] = job
+
+    size = 0
+    try:
+        # stream, never hold the whole upload; disk writes stay off the event loop
+        fh = await asyncio.to_thread(open, job.source, "wb")
+        try:
+            async for block in request.stream():
+                size += len(block)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(413, "upload too large")
+                await asyncio.to_thread(fh.write, block)
+        finally:
+            await asyncio.to_thread(fh.close)
+    except BaseException:
+        await asyncio.to_thread(_drop, job)
+        raise
+    with _jobs_lock:
+        if job.status != "queued":                 # deleted during the upload
+            raise HTTPException(409, f"job is {job.status}")
+        job.set(stage="queued")
+        job.future = _pool.submit(_run_job, job)
+    return job.snapshot()
+
+
+@app.get("/jobs/{job_id}")
+async def status(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def events(job_id: str):
+    job = _get_job(job_id)
+
+    async def stream():
+        seen = -1
+        while True:
+            if job.version != seen:
+                seen = job.version
+                yield f"data: {json.dumps(job.snapshot())}\n\n"
+                if job.status in {"done", "failed", "cancelled"}:
+                    return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/jobs/{job_id}/deck")
+async def deck(job_id: str):
+    job = _get_job(job_id)
+    if job.deck is None:
+        raise HTTPException(409, f"job is {job.status}")
+    return FileResponse(job.deck, filename=job.deck.name, media_type="application/octet-stream")
+
+
+@app.get("/jobs/{job_id}/cards")
+async def cards(job_id: str):
+    job = _get_job(job_id)
+    if job.deck is None:
+        raise HTTPException(409, f"job is {job.status}")
+    return FileResponse(job.deck.with_suffix(".cards.json"), media_type="application/json")
+
+
+@app.delete("/jobs/{job_id}")
+async def delete(job_id: str):
+    job = _get_job(job_id)
+    with _jobs_lock:                               # atomic with _run_job's start
+        if job.status == "running":
+            raise HTTPException(409, "job is running")
+        if job.status == "queued":
+            if job.future is not None:
+                job.future.cancel()
+            job.set(status="cancelled")
+        status = job.status                        # a finished job keeps its outcome
+    await asyncio.to_thread(_drop, job)
+    return JSONResponse({"id": job.id, "status": status, "deleted": True})
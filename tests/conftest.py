@@ -0,0 +1,4 @@
+# tests/conftest.py — make the flat top-level modules importable
+import pathlib, sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
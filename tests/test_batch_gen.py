@@ -0,0 +1,75 @@
+# tests/test_batch_gen.py — Batch API path against the in-process fake
+import json, random, time
+from types import SimpleNamespace
+
+import pytest
+
+import batch_gen
+import flashcard_gen as fg
+import fake_openai
+from fake_openai import FakeClient
+
+CHUNKS = [
+    "The witness inspected the pump on Monday. The valve was already cracked.",
+    "Ms. Okafor signed the invoice in March. Payment was never received.",
+]
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield
+    fg.set_client(None)
+
+
+def build(tmp_path, client, **kw):
+    fg.set_client(client)
+    deck = fg.build_deck(CHUNKS, "deck", 3, out_dir=tmp_path, use_cache=False,
+                         batch_state=tmp_path / "deck.batch.json", poll_interval=0, **kw)
+    return json.loads(deck.with_suffix(".cards.json").read_text(encoding="utf-8"))
+
+
+def state(tmp_path):
+    return json.loads((tmp_path / "deck.batch.json").read_text(encoding="utf-8"))
+
+
+def test_submit_and_collect(tmp_path):
+    cards = build(tmp_path, FakeClient(latency=0, batch_delay=0))
+    assert len(cards) == 4
+    assert state(tmp_path)["status"] == "completed"
+
+
+def test_killed_run_resumes_the_same_batch(tmp_path, monkeypatch):
+    def killed(seconds):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(batch_gen, "time", SimpleNamespace(time=time.time, sleep=killed))
+    with pytest.raises(KeyboardInterrupt):
+        build(tmp_path, FakeClient(latency=0, batch_delay=3600))
+    submitted = state(tmp_path)["batch_id"]
+    assert state(tmp_path)["status"] == "in_progress"
+
+    before = len(fake_openai.BATCHES)
+    assert len(build(tmp_path, FakeClient(latency=0, batch_delay=0))) == 4
+    assert len(fake_openai.BATCHES) == before                 # nothing resubmitted
+    assert state(tmp_path)["batch_id"] == submitted
+
+
+def test_refresh_submits_a_new_batch(tmp_path):
+    build(tmp_path, FakeClient(latency=0, batch_delay=0))
+    first = state(tmp_path)["batch_id"]
+    build(tmp_path, FakeClient(latency=0, batch_delay=0), refresh=True)
+    assert state(tmp_path)["batch_id"] != first
+
+
+def test_failed_requests_are_resubmitted(tmp_path):
+    manifest = tmp_path / "deck.manifest.json"
+    random.seed(0)                                             # fails one of the two requests
+    cards = build(tmp_path, FakeClient(latency=0, batch_delay=0, rate_batch_fail=0.5),
+                  manifest=manifest, resume=True)
+    assert len(cards) == 2
+    assert "batch_id" not in state(tmp_path)
+    assert len(json.loads(manifest.read_text(encoding="utf-8"))["chunks"]) == 1
+
+    assert len(build(tmp_path, FakeClient(latency=0, batch_delay=0),
+                     manifest=manifest, resume=True)) == 4
+    assert state(tmp_path)["requests"] == 1                   # only the failed chunk
@@ -0,0 +1,65 @@
+# tests/test_card_schema.py — salvage of broken replies, excerpt matching
+import json
+
+from card_schema import ExcerptIndex, _salvage, extract_cards
+
+CARD = {"excerpt": "I inspected the pump.", "front": "Who inspected the pump?",
+        "back": "The witness", "distractors": ["Mr. Patel", "Ms. Okafor"], "context": "event"}
+
+
+def test_salvage_keeps_complete_cards_before_the_cut():
+    content = json.dumps({"cards": [CARD, dict(CARD, front="Second?")]})
+    cut = content[: content.rindex("Second") + 3]
+    assert _salvage(cut) == [CARD]
+
+
+def test_salvage_handles_whitespace_and_commas_between_cards():
+    content = '{"cards": [\n  %s ,\n\n  %s\n  , {"front": "torn' % (json.dumps(CARD), json.dumps(CARD))
+    assert _salvage(content) == [CARD, CARD]
+
+
+def test_salvage_without_cards_array():
+    assert _salvage("") == []
+    assert _salvage('{"error": "nope"') == []
+    assert _salvage('{"cards": [') == []
+
+
+def test_salvage_ignores_braces_inside_strings():
+    card = dict(CARD, back='a } brace and a " quote')
+    content = json.dumps({"cards": [card]})[:-2]          # drop "]}"
+    assert _salvage(content) == [card]
+
+
+def test_extract_cards_reports_broken():
+    good = json.dumps({"cards": [CARD]})
+    assert extract_cards(good) == ([CARD], False)
+    assert extract_cards(good[:-10]) == ([], True)
+    assert extract_cards(None) == ([], True)
+    assert extract_cards(json.dumps([CARD])) == ([CARD], False)
+
+
+CHUNK = ("12  Q. What did you do next?\n13  A. I walked over to Bay 3 and "
+         "inspected the hydraulic pump — it was leaking about 20 gallons an hour.")
+
+
+def test_excerpt_exact_and_normalised():
+    index = ExcerptIndex(CHUNK)
+    assert index.contains("inspected the hydraulic pump")
+    # case, punctuation, dashes and whitespace are normalised away
+    assert index.contains("INSPECTED  the hydraulic pump - it was leaking")
+    assert index.contains("I walked over to Bay 3, and inspected the hydraulic pump")
+
+
+def test_excerpt_fuzzy_match_tolerates_light_cleanup():
+    index = ExcerptIndex(CHUNK)
+    # a dropped line number / one changed word still passes the trigram test
+    assert index.contains("I walked over to Bay 3 and inspected the hydraulic pump it "
+                          "was leaking about 20 gallons every hour")
+
+
+def test_excerpt_rejects_invented_or_empty_text():
+    index = ExcerptIndex(CHUNK)
+    assert not index.contains("An invented quotation that never appears in the record.")
+    assert not index.contains("")
+    assert not index.contains("   ")
+    assert not index.contains("pump leaking")              # too short for trigrams, not a substring
@@ -0,0 +1,35 @@
+# tests/test_dedup.py — near-duplicate card merging
+from dedup import dedup_cards
+from fake_openai import fake_embed
+
+
+def card(front, back, distractors=("Wrong A", "Wrong B"), excerpt="quote"):
+    return {"front": front, "back": back, "distractors": list(distractors), "excerpt": excerpt}
+
+
+CARDS = [
+    card("Who inspected the pump on Monday morning?", "The witness inspected the pump",
+         distractors=()),
+    card("Who signed the invoice in March?", "Ms. Okafor signed the invoice"),
+    card("Who inspected the pump on Monday morning?", "The witness inspected the pump"),
+    card("What colour was the delivery truck?", "The truck was red"),
+]
+
+
+def test_minhash_merges_near_duplicates_and_keeps_the_better_card():
+    kept, report = dedup_cards(CARDS, threshold=0.6)
+    assert kept == [CARDS[1], CARDS[2], CARDS[3]]              # original order
+    assert report == [{"kept": CARDS[2]["front"], "merged": [CARDS[0]["front"]]}]
+
+
+def test_distinct_cards_are_all_kept():
+    kept, report = dedup_cards([CARDS[1], CARDS[3]], threshold=0.6)
+    assert kept == [CARDS[1], CARDS[3]] and report == []
+    assert dedup_cards(CARDS[:1]) == ([CARDS[0]], [])
+
+
+def test_embedding_vectors_merge_by_cosine():
+    vectors = fake_embed([f"{c['front']}\n{c['back']}" for c in CARDS])
+    kept, report = dedup_cards(CARDS, threshold=0.9, vectors=vectors)
+    assert kept == [CARDS[1], CARDS[2], CARDS[3]]
+    assert len(report) == 1
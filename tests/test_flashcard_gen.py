@@ -0,0 +1,98 @@
+# tests/test_flashcard_gen.py — deck builds against fake_openai.FakeClient
+import json
+
+import httpx
+import openai
+import pytest
+
+import flashcard_gen as fg
+import metrics
+from cache import DiskCache
+from fake_openai import FakeClient, _obj
+
+CHUNKS = [
+    "The witness inspected the pump on Monday. The valve was already cracked.",
+    "Ms. Okafor signed the invoice in March. Payment was never received.",
+]
+
+
+class BrokenClient(FakeClient):
+    """Every reply is cut off before the first card is complete."""
+
+    def _chat(self, **body):
+        return _obj({"choices": [{"message": {"content": '{"cards": [{"front": "Wh'}}],
+                     "usage": None})
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield
+    fg.set_client(None)
+
+
+def build(tmp_path, client, chunks=CHUNKS, **kw):
+    fg.set_client(client)
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    try:
+        deck = fg.build_deck(chunks, "deck", 3, out_dir=tmp_path, cache=cache,
+                             **{"concurrency": 2, **kw})
+    finally:
+        cache.close()
+    return json.loads(deck.with_suffix(".cards.json").read_text(encoding="utf-8"))
+
+
+def test_unusable_chunk_is_regenerated_on_the_next_run(tmp_path):
+    assert build(tmp_path, BrokenClient(latency=0), resume=True) == []
+    journal = (tmp_path / "deck.journal.jsonl").read_text(encoding="utf-8")
+    assert journal.strip() == ""                       # nothing journaled as done
+
+    cards = build(tmp_path, FakeClient(latency=0), resume=True)
+    assert len(cards) == 4
+    assert {c["id"].split("-")[0] for c in cards} == {fg.chunk_hash(c)[:16] for c in CHUNKS}
+
+
+def test_manifest_leaves_out_chunks_without_cards(tmp_path, capsys):
+    manifest = tmp_path / "deck.manifest.json"
+    assert build(tmp_path, BrokenClient(latency=0), manifest=manifest) == []
+    assert json.loads(manifest.read_text(encoding="utf-8"))["chunks"] == {}
+
+    assert len(build(tmp_path, FakeClient(latency=0), manifest=manifest)) == 4
+    (tmp_path / "deck.journal.jsonl").unlink()
+    capsys.readouterr()
+    assert len(build(tmp_path, BrokenClient(latency=0), manifest=manifest, resume=True)) == 4
+    out = capsys.readouterr().out
+    assert "2 unchanged, 0 new/changed" in out
+    assert "Resume: 0/2 chunk(s) already in" in out
+
+
+def test_cards_keep_document_order_under_concurrency(tmp_path):
+    chunks = [f"Exhibit {k} was shown to the witness. The witness identified exhibit {k}."
+              for k in range(12)]
+    cards = build(tmp_path, FakeClient(latency=0.02, jitter=0.02), chunks=chunks)
+    assert [c["id"] for c in cards] == [f"{fg.chunk_hash(ch)[:16]}-{k}"
+                                        for ch in chunks for k in range(2)]
+
+
+class ThrottledClient(FakeClient):
+    """The first ``n`` calls get an HTTP 429 with ``retry-after: 0``."""
+
+    def __init__(self, n, **settings):
+        super().__init__(**settings)
+        self.throttle = n
+
+    def _delay_or_fail(self):
+        if self.throttle > 0:
+            self.throttle -= 1
+            response = httpx.Response(429, headers={"retry-after": "0"},
+                                      request=httpx.Request("POST", "http://fake/v1"))
+            raise openai.RateLimitError("Rate limit reached (fake)", response=response, body=None)
+        super()._delay_or_fail()
+
+
+def test_rate_limited_build_retries_and_completes(tmp_path):
+    metrics.reset()
+    client = ThrottledClient(3, latency=0)
+    cards = build(tmp_path, client, concurrency=1)
+    assert len(cards) == 4
+    assert metrics.snapshot()["counters"]["retries"] == 3
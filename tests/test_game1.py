@@ -0,0 +1,48 @@
+# tests/test_game1.py — background refurbishing in Game 1
+import pathlib, subprocess, sys, textwrap, time
+
+import flashcard_gen as fg
+from fake_openai import FakeClient
+from game1_cli import Refurbisher
+from ratelimit import RateLimiter
+
+CARD = {"id": "c0", "excerpt": "The valve was cracked.", "front": "What was cracked?",
+        "back": "The valve", "distractors": ["The pump", "The hose"], "context": "equipment"}
+
+
+class CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def acquire(self, tokens: int = 0) -> None:
+        self.calls += 1
+
+
+def test_refurbish_goes_through_the_shared_limiter():
+    fg.set_client(FakeClient(latency=0))
+    try:
+        limiter = CountingLimiter()
+        refurb = Refurbisher(limiter=limiter)
+        refurb.submit([], [CARD], {"c0": "too easy"})
+        refurb.wait(timeout=5)
+        cards = refurb.ready()
+        refurb.close()
+    finally:
+        fg.set_client(None)
+    assert [c["id"] for c in cards] == ["c0_v2"]
+    assert limiter.calls == 1
+
+
+def test_close_does_not_wait_for_a_call_in_flight():
+    script = textwrap.dedent("""
+        import time
+        from game1_cli import Refurbisher
+        refurb = Refurbisher(lambda *a, **kw: time.sleep(30))
+        refurb.submit([], [{"id": "c0"}], {})
+        refurb.close()
+    """)
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=20,
+                   cwd=pathlib.Path(__file__).resolve().parent.parent)
+    assert time.perf_counter() - t0 < 10
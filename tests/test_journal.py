@@ -0,0 +1,73 @@
+# tests/test_journal.py — resuming interrupted builds from the card journal
+import json
+
+import pytest
+
+import flashcard_gen as fg
+from fake_openai import FakeClient
+from journal import CardJournal
+
+CHUNKS = [f"Exhibit {k} was shown to the witness. The witness identified exhibit {k}."
+          for k in range(4)]
+
+
+class CountingClient(FakeClient):
+    """Counts chat calls; raises ``KeyboardInterrupt`` on call ``stop_at``."""
+
+    def __init__(self, stop_at=None, **settings):
+        super().__init__(latency=0, **settings)
+        self.calls, self.stop_at = 0, stop_at
+
+    def _chat(self, **body):
+        self.calls += 1
+        if self.calls == self.stop_at:
+            raise KeyboardInterrupt
+        return super()._chat(**body)
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield
+    fg.set_client(None)
+
+
+def build(tmp_path, client, **kw):
+    fg.set_client(client)
+    deck = fg.build_deck(CHUNKS, "deck", 3, concurrency=1, use_cache=False,
+                         out_dir=tmp_path, **kw)
+    return json.loads(deck.with_suffix(".cards.json").read_text(encoding="utf-8"))
+
+
+def test_resume_only_pays_for_unfinished_chunks(tmp_path):
+    with pytest.raises(KeyboardInterrupt):
+        build(tmp_path, CountingClient(stop_at=3))
+    journal = CardJournal(tmp_path / "deck.journal.jsonl", resume=True)
+    journal.close()
+    assert len(journal.done) == 2
+
+    client = CountingClient()
+    cards = build(tmp_path, client, resume=True)
+    assert client.calls == 2
+    assert [c["id"] for c in cards] == [f"{fg.chunk_hash(ch)[:16]}-{k}"
+                                        for ch in CHUNKS for k in range(2)]
+
+
+def test_torn_last_line_is_ignored_and_fenced_off(tmp_path):
+    path = tmp_path / "deck.journal.jsonl"
+    path.write_text(json.dumps({"chunk": "a", "i": 0, "cards": [{"front": "Q"}]}) + "\n"
+                    + '{"chunk": "b", "i": 1, "ca', encoding="utf-8")
+    journal = CardJournal(path, resume=True)
+    assert list(journal.done) == ["a"]
+    journal.append("c", 2, [])
+    journal.close()
+    journal = CardJournal(path, resume=True)
+    journal.close()
+    assert list(journal.done) == ["a", "c"]
+
+
+def test_fresh_build_starts_a_new_journal(tmp_path):
+    path = tmp_path / "deck.journal.jsonl"
+    path.write_text(json.dumps({"chunk": "a", "i": 0, "cards": []}) + "\n", encoding="utf-8")
+    CardJournal(path).close()
+    assert path.read_text(encoding="utf-8") == ""
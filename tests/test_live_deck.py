@@ -0,0 +1,36 @@
+# tests/test_live_deck.py — playing while the deck is generated
+import sys
+
+import pytest
+
+import flashcard_gen as fg
+from fake_openai import FakeClient
+from live_deck import LiveDeck
+
+CHUNKS = [
+    "The witness inspected the pump on Monday. The valve was already cracked.",
+    "Ms. Okafor signed the invoice in March. Payment was never received.",
+]
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield
+    fg.set_client(None)
+
+
+def test_builder_output_goes_to_the_log_not_stdout(tmp_path, capsys):
+    fg.set_client(FakeClient(latency=0.01))
+    terminal = sys.stdout
+    live = LiveDeck.start(CHUNKS, "deck", out_dir=tmp_path, use_cache=False, concurrency=2)
+    print("prompt while building")
+    assert sys.stdout is terminal
+    cards = []
+    while not live.done:
+        cards += live.next_batch(timeout=5)
+    assert live.wait().exists()
+    assert len(cards) == 4
+    assert capsys.readouterr().out == "prompt while building\n"
+    log = (tmp_path / "deck.build.log").read_text(encoding="utf-8")
+    assert "Chunk 2/2" in log and "Deck written" in log
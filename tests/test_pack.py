@@ -0,0 +1,67 @@
+# tests/test_pack.py — several chunks per request, and truncated packed replies
+import json
+
+import pytest
+
+import flashcard_gen as fg
+from fake_openai import FakeClient, _PACKED, _obj, chat_completion
+
+CHUNKS = [f"Exhibit {k} was shown to the witness. The witness identified exhibit {k}."
+          for k in range(4)]
+
+
+class TruncatingClient(FakeClient):
+    """Cuts the first ``n`` packed replies off halfway; records every request."""
+
+    def __init__(self, n, **settings):
+        super().__init__(latency=0, **settings)
+        self.truncate, self.requests = n, []
+
+    def _chat(self, **body):
+        self.requests.append(body)
+        reply = chat_completion(body, rate_bad=0.0)
+        packed = _PACKED.findall(body["messages"][-1]["content"])
+        if packed and self.truncate > 0:
+            self.truncate -= 1
+            content = reply["choices"][0]["message"]["content"]
+            reply["choices"][0]["message"]["content"] = content[: len(content) // 2]
+        return _obj(reply)
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield
+    fg.set_client(None)
+
+
+def build(tmp_path, client):
+    fg.set_client(client)
+    deck = fg.build_deck(CHUNKS, "deck", 3, concurrency=1, use_cache=False,
+                         out_dir=tmp_path, pack=fg.PACK_TOKENS)
+    return json.loads(deck.with_suffix(".cards.json").read_text(encoding="utf-8"))
+
+
+def packed_chunks(request):
+    return len(_PACKED.findall(request["messages"][-1]["content"]))
+
+
+def test_truncated_pack_re_sends_only_the_cut_off_chunks(tmp_path):
+    client = TruncatingClient(1)
+    cards = build(tmp_path, client)
+    assert packed_chunks(client.requests[0]) == 4
+    assert len(client.requests) == 2                        # one re-pack, no per-chunk calls
+    assert 0 < packed_chunks(client.requests[1]) < 4
+    assert [c["id"] for c in cards] == [f"{fg.chunk_hash(ch)[:16]}-{k}"
+                                        for ch in CHUNKS for k in range(2)]
+    report = json.loads((tmp_path / "deck.salvage.json").read_text(encoding="utf-8"))
+    assert sum(r["salvaged"] for r in report["chunks"]) == 1
+
+
+def test_second_truncation_falls_back_to_per_chunk_repair(tmp_path):
+    client = TruncatingClient(2)
+    cards = build(tmp_path, client)
+    _, second, *repairs = client.requests
+    assert 0 < len(repairs) <= packed_chunks(second)     # one repair per chunk cut off again
+    assert all(packed_chunks(r) == 0 for r in repairs)
+    assert {c["id"].split("-")[0] for c in cards} == {fg.chunk_hash(ch)[:16] for ch in CHUNKS}
@@ -0,0 +1,74 @@
+# tests/test_ratelimit.py — shared RPM/TPM budget and 429 back-off
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, with_backoff
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; ``sleep`` advances it and records the wait."""
+    state = SimpleNamespace(now=1000.0, slept=[])
+
+    def sleep(seconds):
+        state.slept.append(seconds)
+        state.now += seconds
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=lambda: state.now,
+                                                           sleep=sleep))
+    return state
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers,
+                              request=httpx.Request("POST", "http://fake/v1"))
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_rpm_bucket_allows_a_burst_then_spaces_requests(clock):
+    limiter = RateLimiter(rpm=2)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.slept == []
+    limiter.acquire()                                  # refills 1 request per 30 s
+    assert sum(clock.slept) == pytest.approx(30.0)
+
+
+def test_tpm_bucket_waits_for_tokens(clock):
+    limiter = RateLimiter(tpm=600)
+    limiter.acquire(tokens=600)
+    limiter.acquire(tokens=100)                        # 10 tokens per second
+    assert sum(clock.slept) == pytest.approx(10.0)
+
+
+def test_pause_holds_every_caller(clock):
+    limiter = RateLimiter()
+    limiter.pause(5)
+    limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(5.0)
+
+
+def test_backoff_retries_and_honours_retry_after(clock):
+    limiter = RateLimiter()
+    errors = [rate_limit_error(retry_after=3), rate_limit_error()]
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    assert with_backoff(call, limiter=limiter, base_delay=1.0) == "ok"
+    assert clock.slept[0] == 3.0                       # server's hint
+    assert 1.0 <= clock.slept[1] <= 3.0                # 2nd retry: 2 × base, ±50 % jitter
+    assert limiter._paused_until > 0
+
+
+def test_backoff_gives_up_after_max_retries(clock):
+    def call():
+        raise rate_limit_error(retry_after=1)
+    with pytest.raises(openai.RateLimitError):
+        with_backoff(call, max_retries=2)
+    assert clock.slept == [1.0, 1.0]
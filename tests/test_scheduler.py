@@ -0,0 +1,58 @@
+# tests/test_scheduler.py — SM-2 scheduling and the Game 2 due queue
+import game2_cli
+from card_store import CardStore
+from scheduler import DAY, MIN_EASE, NEW, DueQueue, Review, due_cards, sm2
+
+NOW = 1_700_000_000.0
+
+
+def test_sm2_intervals_grow_on_good_answers():
+    s1 = sm2(NEW, True, NOW)
+    s2 = sm2(s1, True, NOW)
+    s3 = sm2(s2, True, NOW)
+    assert (s1.interval, s2.interval) == (1.0, 6.0)
+    assert s3.interval == round(6.0 * s3.ease, 1)
+    assert s3.reps == 3 and s3.due == NOW + s3.interval * DAY
+
+
+def test_sm2_miss_resets_reps_and_lowers_ease():
+    s = sm2(Review(ease=2.5, interval=15.0, reps=4), False, NOW)
+    assert (s.reps, s.interval, s.lapses, s.due) == (0, 1.0, 1, NOW + DAY)
+    assert s.ease < 2.5
+    for _ in range(20):
+        s = sm2(s, False, NOW)
+    assert s.ease == MIN_EASE
+
+
+def test_due_queue_pops_by_due_time_then_insertion_order():
+    q = DueQueue()
+    for name, due in [("b", 20), ("a", 10), ("c", 20), ("d", 5)]:
+        q.push({"id": name}, due)
+    assert q.next_due() == 5
+    assert [q.pop()["id"] for _ in range(len(q))] == ["d", "a", "b", "c"]
+
+
+def test_due_cards_overdue_first_then_limited_new_ones():
+    cards = [{"id": str(k)} for k in range(5)]
+    states = {"0": Review(due=NOW + DAY), "1": Review(due=NOW - 1)}
+    assert [c["id"] for c in due_cards(cards, states, NOW, new_limit=2)] == ["1", "2", "3"]
+
+
+def test_interrupted_drill_keeps_every_answer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cards = [{"id": "a", "front": "Q1", "back": "A1"}, {"id": "b", "front": "Q2", "back": "A2"}]
+    answers = iter([True])
+
+    def ask(card, *_):
+        try:
+            return next(answers)
+        except StopIteration:
+            raise KeyboardInterrupt
+    game2_cli._drill(cards, ask, "basic", shuffle=False)
+
+    store = CardStore()
+    try:
+        assert store.stats(["a"])["a"]["right"] == 1
+        assert list(store.reviews(["a", "b"])) == ["a"]
+    finally:
+        store.close()
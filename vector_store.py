@@ -0,0 +1,135 @@
+"""
+vector_store.py
+---------------
+Persistent, memory-mapped store of float32 embedding vectors keyed by chunk
+hash.  Two files per store:
+
+* ``<base>.npy``        – ``(rows, dim)`` float32 matrix, opened with mmap
+* ``<base>.index.json`` – ``{"model", "dim", "rows": {chunk_hash: row}}``
+
+Reads never load the whole matrix; ``add`` writes only the new rows at the
+end of the ``.npy`` and then patches its header in place (the whole file is
+rewritten only if the new header would not fit, or on the first ``add``).
+
+Typical usage
+-------------
+>>> store = VectorStore("deposition.vectors", model="text-embedding-3-large")
+>>> vecs = embed_chunks(chunks, store=store)    # only new chunks hit the API
+>>> store.get([chunk_hash(chunks[0])]).shape
+(1, 3072)
+"""
+
+# ── 1. Imports ──────────────────────────────────────────────────────────────
+from __future__ import annotations
+import io, json, os, pathlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# ── 2. Store ───────────────────────────────────────────────────────────────
+
+class VectorStore:
+    """``chunk hash → float32 vector`` with an mmap-backed matrix."""
+
+    def __init__(self, base_path, model: str):
+        base = pathlib.Path(base_path)
+        self.npy_path = base.with_name(base.name + ".npy")
+        self.index_path = base.with_name(base.name + ".index.json")
+        self.model = model
+        self.dim: int | None = None
+        self.rows: Dict[str, int] = {}
+        self._matrix = None
+
+        if self.index_path.exists() and self.npy_path.exists():
+            meta = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if meta.get("model") == model:
+                self.dim, self.rows = meta["dim"], meta["rows"]
+            else:
+                print(f"[vector_store] {self.index_path.name} holds {meta.get('model')!r} "
+                      f"vectors, not {model!r} — starting empty")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map of every stored vector."""
+        if self._matrix is None:
+            if not self.rows:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            self._matrix = np.load(self.npy_path, mmap_mode="r")
+        return self._matrix
+
+    def get(self, keys: Sequence[str]) -> np.ndarray:
+        """Vectors for ``keys`` (all must be present), in the given order."""
+        return np.asarray(self.matrix[[self.rows[k] for k in keys]], dtype=np.float32)
+
+    def add(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Append new ``keys``/``vectors`` (already-known keys are skipped)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        fresh, seen = [], set()
+        for i, k in enumerate(keys):
+            if k not in self.rows and k not in seen:
+                fresh.append(i)
+                seen.add(k)
+        if not fresh:
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"vector dim {vectors.shape[1]} != store dim {self.dim}")
+
+        old = len(self.rows)
+        new = np.ascontiguousarray(vectors[fresh])
+        self._matrix = None                     # drop the old map before writing
+        if not (old and self._append(old, new)):
+            self._rewrite(new)
+
+        for r, i in enumerate(fresh, start=old):
+            self.rows[keys[i]] = r
+        tmp_index = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp_index.write_text(json.dumps({"model": self.model, "dim": self.dim,
+                                         "rows": self.rows}), encoding="utf-8")
+        os.replace(tmp_index, self.index_path)
+
+    def _append(self, old: int, new: np.ndarray) -> bool:
+        """Write ``new`` after the ``old`` indexed rows, then the grown header
+        over the previous one; ``False`` if the file cannot be patched."""
+        fmt = np.lib.format
+        with open(self.npy_path, "r+b") as fh:
+            version = fmt.read_magic(fh)
+            read = fmt.read_array_header_1_0 if version == (1, 0) else fmt.read_array_header_2_0
+            shape, fortran, dtype = read(fh)
+            header_len = fh.tell()
+            if fortran or dtype != np.float32 or shape[1:] != (self.dim,) or shape[0] < old:
+                return False
+            header = io.BytesIO()
+            write = fmt.write_array_header_1_0 if version == (1, 0) else fmt.write_array_header_2_0
+            write(header, {"descr": fmt.dtype_to_descr(dtype), "fortran_order": False,
+                           "shape": (old + len(new), self.dim)})
+            if header.tell() != header_len:
+                return False
+            # rows first: a crash before the header (or index) is written only
+            # leaves unreferenced rows, which the next add overwrites
+            fh.seek(header_len + old * self.dim * dtype.itemsize)
+            fh.write(new.tobytes())
+            fh.flush()
+            fh.seek(0)
+            fh.write(header.getvalue())
+        return True
+
+    def _rewrite(self, new: np.ndarray) -> None:
+        """Write the stored rows plus ``new`` to a fresh ``.npy`` (atomically)."""
+        old = len(self.rows)
+        tmp = self.npy_path.with_name(self.npy_path.name + ".tmp")
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32,
+                                        shape=(old + len(new), self.dim))
+        if old:
+            out[:old] = np.load(self.npy_path, mmap_mode="r")[:old]
+        out[old:] = new
+        out.flush()
+        del out
+        os.replace(tmp, self.npy_path)